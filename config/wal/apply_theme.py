@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+# Pywal Apply Pipeline
+# Runs the whole wallpaper apply sequence in one process: palette extraction
+# with wal, then the wallpaper-set command, the Zed emitter and the iTerm2
+# emitter concurrently, sharing a single parsed palette.
+#
+# Usage: apply_theme.py [--wal-cmd CMD] [--wallpaper-cmd CMD] [--wal-theme-cmd CMD]
+#                       [--no-store] [--json] [-v] <image>
+#
+# Images pre-rendered with theme_store.py are applied from the store: the
+# stored palette is loaded with `wal -f` and the stored artifacts installed.
+# Otherwise, with NumPy and Pillow available, the palette is extracted
+# in-process by extract_palette.py (PYWAL_EXTRACTOR=wal to opt out).
+#
+# External commands are templates where {image} is replaced by the image
+# path; override them (or PYWAL_WAL_CMD / PYWAL_WALLPAPER_CMD) to plug in
+# local stand-ins for testing.
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shlex
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+import shell_loader
+import update_iterm2
+import update_zed
+from artifact_writer import atomic_write
+from palette import Palette, colors_file
+from theme_history import record_installed
+from theme_scheduler import ThemeScheduler, installed_key
+from theme_store import ThemeStore
+from timings import trace
+
+# Optional in-process palette extractor (requires NumPy and Pillow)
+try:
+    import extract_palette
+except ImportError:
+    extract_palette = None
+
+DEFAULT_COMMANDS = {
+    "wal": "wal --backend colorz -i {image} -n --saturate 0.8",
+    # Pre-rendered images: load the stored palette instead of extracting
+    "wal_theme": "wal -f {colors} -n",
+    "wallpaper": "osascript -e 'tell application \"Finder\" to set desktop picture to POSIX file \"{image}\"'",
+}
+
+def default_commands():
+    """External command templates, honouring environment overrides"""
+    return {
+        "wal": os.environ.get("PYWAL_WAL_CMD", DEFAULT_COMMANDS["wal"]),
+        "wal_theme": os.environ.get("PYWAL_WAL_THEME_CMD", DEFAULT_COMMANDS["wal_theme"]),
+        "wallpaper": os.environ.get("PYWAL_WALLPAPER_CMD", DEFAULT_COMMANDS["wallpaper"]),
+    }
+
+def expand_command(template, image, **fields):
+    """Split a command template and substitute the image path (and other fields)"""
+    fields["image"] = image
+    argv = shlex.split(template)
+    for key, value in fields.items():
+        argv = [part.replace("{" + key + "}", value) for part in argv]
+    return argv
+
+async def run_command(name, argv):
+    """Run an external command and return its step result"""
+    start = time.monotonic()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await proc.communicate()
+    except OSError as e:
+        return step_result(name, False, start, str(e))
+    detail = (stderr or stdout).decode('utf-8', 'replace').strip().splitlines()
+    return step_result(name, proc.returncode == 0, start, detail[-1] if detail else "")
+
+async def run_in_thread(name, func, *args):
+    """Run an in-process emitter in a worker thread and return its step result"""
+    start = time.monotonic()
+    loop = asyncio.get_running_loop()
+
+    def traced():
+        # Timings (PYWAL_TIMINGS=1) are recorded in the worker thread
+        with trace(name):
+            func(*args)
+
+    try:
+        await loop.run_in_executor(None, traced)
+    except SystemExit as e:
+        return step_result(name, not e.code, start, f"exit {e.code}")
+    except Exception as e:
+        return step_result(name, False, start, f"{type(e).__name__}: {e}")
+    return step_result(name, True, start, "")
+
+def step_result(name, ok, start, detail):
+    return {
+        "step": name,
+        "ok": ok,
+        "seconds": round(time.monotonic() - start, 4),
+        "detail": detail,
+    }
+
+def emit_zed(palette):
+    """Zed emitter: theme family plus settings"""
+    if not update_zed.install_zed_theme_family(update_zed.cached_theme_family(palette)):
+        raise RuntimeError("failed to write theme family files")
+    update_zed.update_zed_settings()
+
+def emit_iterm(palette):
+    """iTerm2 emitter: dynamic profile plus a push to open terminals (or a reload)"""
+    update_iterm2.create_iterm_profile(palette)
+
+def emit_shell(palette):
+    """Shell emitter: the compiled zsh loader new shells source"""
+    shell_loader.install_loader(palette)
+
+def use_builtin_extractor(commands):
+    """Extract in-process unless unavailable, disabled, or wal was overridden"""
+    if extract_palette is None or os.environ.get("PYWAL_EXTRACTOR") == "wal":
+        return False
+    return commands["wal"] == DEFAULT_COMMANDS["wal"]
+
+def extracted_colors_file():
+    return os.path.join(os.path.dirname(colors_file()), "colors.extracted.json")
+
+def extract_to_file(image):
+    """Built-in extractor: write the palette where `wal -f` can load it"""
+    colors = extract_palette.extract(image)
+    atomic_write(extracted_colors_file(), json.dumps(colors, indent=4).encode('utf-8'))
+
+def prerendered_emitters(entry):
+    """Emitters that install artifacts from a theme store entry"""
+    def emit_zed_entry(palette):
+        if not update_zed.install_zed_theme_family(entry.read("zed")):
+            raise RuntimeError("failed to write theme family files")
+        update_zed.update_zed_settings()
+
+    def emit_iterm_entry(palette):
+        update_iterm2.apply_iterm_profile(entry.read("iterm"), palette)
+
+    return {"zed": emit_zed_entry, "iterm": emit_iterm_entry, "shell": emit_shell}
+
+def rendered_emitters(zed, iterm):
+    """Emitters that install already-rendered bytes"""
+    def emit_zed_bytes(palette):
+        if not update_zed.install_zed_theme_family(zed):
+            raise RuntimeError("failed to write theme family files")
+        update_zed.update_zed_settings()
+
+    def emit_iterm_bytes(palette):
+        update_iterm2.apply_iterm_profile(iterm, palette)
+
+    return {"zed": emit_zed_bytes, "iterm": emit_iterm_bytes, "shell": emit_shell}
+
+async def apply_theme(image, commands=None, emitters=None, use_store=True):
+    """Apply a wallpaper and return (ok, step results)
+
+    Applies run one at a time under the scheduler lock; one that a newer
+    apply has overtaken while waiting is skipped.
+    """
+    scheduler = ThemeScheduler()
+    ticket = scheduler.apply_ticket()
+    start = time.monotonic()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, scheduler.acquire)
+    try:
+        if scheduler.superseded(ticket):
+            return True, [step_result("skipped", True, start, "superseded by a newer apply")]
+        return await apply_locked(image, scheduler, ticket, commands, emitters, use_store)
+    finally:
+        scheduler.release()
+
+async def apply_locked(image, scheduler, ticket, commands, emitters, use_store):
+    commands = dict(default_commands(), **(commands or {}))
+    results = []
+
+    # Pre-rendered wallpapers skip extraction and theme generation
+    entry = ThemeStore().lookup(image) if use_store else None
+    if entry is not None:
+        wal_argv = expand_command(commands["wal_theme"], image, colors=entry.artifact_path("colors"))
+        emitters = emitters or prerendered_emitters(entry)
+    elif use_builtin_extractor(commands):
+        # Extract in-process, then let wal export templates from the result
+        result = await run_in_thread("extract", extract_to_file, image)
+        results.append(result)
+        if not result["ok"]:
+            return False, results
+        wal_argv = expand_command(commands["wal_theme"], image, colors=extracted_colors_file())
+    else:
+        wal_argv = expand_command(commands["wal"], image)
+
+    # Palette extraction has to finish before anything else can start
+    result = await run_command("wal", wal_argv)
+    results.append(result)
+    if not result["ok"]:
+        return False, results
+
+    # Parse the palette once and share it with every emitter
+    start = time.monotonic()
+    try:
+        palette = Palette.load(colors_file())
+    except (OSError, ValueError, KeyError) as e:
+        results.append(step_result("palette", False, start, str(e)))
+        return False, results
+    results.append(step_result("palette", True, start, ""))
+
+    # Overtaken while wal ran: leave the installing to the newer apply
+    if scheduler.superseded(ticket):
+        results.append(step_result("skipped", True, start, "superseded by a newer apply"))
+        return True, results
+
+    steps = await asyncio.gather(
+        run_command("wallpaper", expand_command(commands["wallpaper"], image)),
+        regenerate(palette, emitters),
+    )
+    results += [steps[0]] + steps[1]
+
+    ok = all(r["ok"] for r in results)
+    if ok:
+        scheduler.mark_installed(installed_key(palette))
+        record_installed(palette)
+    return ok, results
+
+async def regenerate(palette, emitters=None):
+    """Run every emitter concurrently against an already-parsed palette"""
+    emitters = emitters or {"zed": emit_zed, "iterm": emit_iterm, "shell": emit_shell}
+    return list(await asyncio.gather(
+        *(run_in_thread(name, emit, palette) for name, emit in emitters.items())
+    ))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a wallpaper and regenerate all pywal themes")
+    parser.add_argument("image", help="wallpaper image path")
+    parser.add_argument("--wal-cmd", help="palette extraction command template ({image} is substituted)")
+    parser.add_argument("--wallpaper-cmd", help="wallpaper-set command template ({image} is substituted)")
+    parser.add_argument("--wal-theme-cmd", help="stored-palette load command template ({colors} is substituted)")
+    parser.add_argument("--no-store", action="store_true", help="ignore pre-rendered themes")
+    parser.add_argument("--json", action="store_true", help="print per-step results as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the emitters' own status output")
+    args = parser.parse_args(argv)
+
+    commands = {}
+    if args.wal_cmd:
+        commands["wal"] = args.wal_cmd
+    if args.wallpaper_cmd:
+        commands["wallpaper"] = args.wallpaper_cmd
+    if args.wal_theme_cmd:
+        commands["wal_theme"] = args.wal_theme_cmd
+
+    start = time.monotonic()
+    # Emitters print status lines; keep them out of the summary unless asked
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        ok, results = asyncio.run(apply_theme(os.path.abspath(args.image), commands,
+                                              use_store=not args.no_store))
+    total = round(time.monotonic() - start, 4)
+
+    if args.json:
+        print(json.dumps({"ok": ok, "seconds": total, "steps": results}, indent=2))
+    else:
+        for r in results:
+            mark = "✅" if r["ok"] else "❌"
+            detail = f"  {r['detail']}" if r["detail"] and not r["ok"] else ""
+            print(f"{mark} {r['step']:<10} {r['seconds'] * 1000:8.1f} ms{detail}")
+        print(f"⏱  Total: {total * 1000:.1f} ms")
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# Atomic, Diff-Aware Artifact Writer
+# Shared by update_zed.py and scripts/update_iterm2.py. Unchanged output is
+# never rewritten (so Zed and iTerm2 do not reload for nothing), changed
+# output is written to a temp file, fsynced and renamed into place, and
+# symlinks that already point at the right target are left alone.
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+_store_lock = threading.Lock()
+
+def digest_store_file():
+    """Where the digests of written artifacts are remembered"""
+    return os.path.expanduser("~/.cache/wal/artifacts.json")
+
+@contextlib.contextmanager
+def _locked_store():
+    """Hold the digest store for a read-modify-write
+
+    Threads take _store_lock; processes (watcher, server, setwal, history)
+    take an flock on artifacts.json.lock, so no update is lost.
+    """
+    path = digest_store_file() + ".lock"
+    with _store_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+def _load_store():
+    try:
+        with open(digest_store_file(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_store(store):
+    path = digest_store_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, json.dumps(store, indent=2, sort_keys=True).encode('utf-8'))
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def atomic_write(path, data):
+    """Write to a temp file in the same directory, fsync, then rename over path"""
+    directory = os.path.dirname(path) or '.'
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = 0o644
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+def is_current(path, data):
+    """True if path already holds exactly these bytes"""
+    path = os.path.realpath(path)
+    digest = hashlib.sha256(data).hexdigest()
+    # The store is replaced atomically, so reading needs no lock
+    entry = _load_store().get(path)
+    stat_key = _stat_key(path)
+    if stat_key is None:
+        return False
+    # Trust the stored digest while the file is untouched since we wrote it
+    if entry and entry.get("stat") == stat_key:
+        return entry.get("digest") == digest
+    try:
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+def write_artifact(path, data):
+    """Atomically write bytes to path unless it already holds them
+
+    Symlinks are followed, so a symlinked artifact is updated in place.
+    Returns True if the file was written, False if it was already current.
+    """
+    path = os.path.realpath(path)
+    if is_current(path, data):
+        return False
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, data)
+
+    with _locked_store():
+        store = _load_store()
+        store[path] = {
+            "digest": hashlib.sha256(data).hexdigest(),
+            "stat": _stat_key(path),
+        }
+        _save_store(store)
+    return True
+
+def ensure_symlink(link, target):
+    """Point link at target, leaving it alone if it already does
+
+    Returns "unchanged", "linked" or "copied" (when symlinks are not
+    possible and the target is copied instead).
+    """
+    link = str(link)
+    target = str(target)
+    if os.path.islink(link) and os.readlink(link) == target:
+        return "unchanged"
+    # Already the same file, e.g. reached through a symlinked config directory
+    if not os.path.islink(link) and os.path.realpath(link) == os.path.realpath(target):
+        return "unchanged"
+
+    os.makedirs(os.path.dirname(link), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(link), f".{os.path.basename(link)}.link.tmp")
+    try:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        os.symlink(target, tmp)
+        # Swap the new link in with a single rename
+        os.replace(tmp, link)
+        return "linked"
+    except OSError:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        if os.path.islink(link):
+            os.unlink(link)
+        with open(target, 'rb') as f:
+            write_artifact(link, f.read())
+        return "copied"
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+# Theme Generator Benchmarks
+# Times every stage of theme generation (Zed theme family, iTerm2 profile,
+# serialization, the artifact write paths, the terminal push to private
+# pseudo-terminals, the iTerm2 reload coordinator and interpreter cold
+# start) over a corpus of synthetic and real palettes, and records
+# allocations per stage.
+# Everything runs inside a throwaway HOME with stub osascript/killall
+# binaries, so it is safe to run on Linux and never touches your themes.
+#
+# Usage: benchmark.py [-n REPEAT] [--cold N] [--stage NAME ...] [--palette FILE ...]
+#                     [--save FILE] [--compare FILE] [--threshold PCT] [--json]
+#
+# Baselines written with --save are plain JSON; --compare reports the change
+# in median time per stage and exits 1 if any stage regressed past the
+# threshold.
+
+import argparse
+import contextlib
+import gc
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from timings import percentile
+
+WAL_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(WAL_DIR, "scripts")
+
+# Stub binaries for the sandbox: every reload "succeeds" instantly
+STUB_BINARIES = ("osascript", "killall")
+
+# Pseudo-terminals the terminal_push stage writes to
+PUSH_TTYS = 8
+
+DEFAULT_REPEAT = 20
+DEFAULT_COLD = 5
+DEFAULT_THRESHOLD = 10.0
+PALETTE_KINDS = ("dark", "light", "low-contrast", "mono")
+
+def random_hex(rng, low, high):
+    return "#%02x%02x%02x" % tuple(rng.randint(low, high) for _ in range(3))
+
+def synthetic_palette(kind, seed):
+    """A pywal colors dict of the given kind, reproducible from seed"""
+    rng = random.Random(f"{kind}:{seed}")
+    if kind == "dark":
+        background, foreground = random_hex(rng, 0, 40), random_hex(rng, 190, 255)
+        accents = [random_hex(rng, 60, 240) for _ in range(16)]
+    elif kind == "light":
+        background, foreground = random_hex(rng, 215, 255), random_hex(rng, 0, 60)
+        accents = [random_hex(rng, 20, 200) for _ in range(16)]
+    elif kind == "low-contrast":
+        base = rng.randint(70, 150)
+        background, foreground = random_hex(rng, base, base + 12), random_hex(rng, base + 8, base + 24)
+        accents = [random_hex(rng, base - 10, base + 30) for _ in range(16)]
+    elif kind == "mono":
+        # Degenerate: one color everywhere (black and white included)
+        color = ["#000000", "#ffffff"][seed] if seed < 2 else random_hex(rng, 0, 255)
+        background = foreground = color
+        accents = [color] * 16
+    else:
+        raise ValueError(f"unknown palette kind: {kind}")
+
+    return {
+        "wallpaper": f"/benchmark/{kind}-{seed}.jpg",
+        "alpha": "100",
+        "special": {"background": background, "foreground": foreground, "cursor": foreground},
+        "colors": {f"color{i}": accents[i] for i in range(16)},
+    }
+
+def real_palettes(paths, limit):
+    """Palettes from explicit files, the live pywal cache and pywal's bundled schemes"""
+    candidates = list(paths)
+    if not paths:
+        candidates.append(os.path.expanduser("~/.cache/wal/colors.json"))
+        try:
+            import pywal
+            schemes = os.path.join(os.path.dirname(pywal.__file__), "colorschemes")
+            candidates += sorted(glob.glob(os.path.join(schemes, "dark", "*.json")))[:limit // 2]
+            candidates += sorted(glob.glob(os.path.join(schemes, "light", "*.json")))[:limit // 2]
+        except ImportError:
+            pass
+
+    palettes = []
+    for path in candidates:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if "special" in data and "colors" in data:
+            label = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+            palettes.append((f"real:{label}", data))
+    return palettes
+
+def build_corpus(per_kind, paths=(), real_limit=8):
+    """(label, colors dict) pairs covering every palette kind plus real palettes"""
+    corpus = [(f"{kind}:{seed}", synthetic_palette(kind, seed))
+              for kind in PALETTE_KINDS for seed in range(per_kind)]
+    return corpus + real_palettes(paths, real_limit)
+
+@contextlib.contextmanager
+def sandbox():
+    """Temporary HOME with stub binaries first on PATH; yields the HOME path"""
+    saved = {key: os.environ.get(key) for key in ("HOME", "PATH", "PYWAL_NO_CACHE", "PYWAL_TERMINAL_PUSH")}
+    home = tempfile.mkdtemp(prefix="wal-bench-")
+    bin_dir = os.path.join(home, "bin")
+    os.makedirs(bin_dir)
+    for name in STUB_BINARIES:
+        stub = os.path.join(bin_dir, name)
+        with open(stub, 'w') as f:
+            f.write("#!/bin/sh\nexit 0\n")
+        os.chmod(stub, 0o755)
+
+    os.environ["HOME"] = home
+    os.environ["PATH"] = bin_dir + os.pathsep + (saved["PATH"] or "")
+    # Measure generation, not theme cache hits
+    os.environ["PYWAL_NO_CACHE"] = "1"
+    # Never write escape sequences to the terminals actually in use
+    os.environ["PYWAL_TERMINAL_PUSH"] = "0"
+    try:
+        yield home
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(home, ignore_errors=True)
+
+def in_process_stages():
+    """Stage name -> callable(BenchPalette) for everything that runs in-process"""
+    sys.path.insert(0, SCRIPTS_DIR)
+    sys.path.insert(0, WAL_DIR)
+    import iterm_reload
+    import terminal_push
+    import update_iterm2
+    import update_zed
+    from contrast import ContrastSolution
+
+    # Background reloads from the write stages stay quiet
+    iterm_reload.coordinator().callback = None
+    # Coordinator overhead against a runner that answers at once
+    reloader = iterm_reload.ReloadCoordinator(runner=iterm_reload.FakeRunner({"applescript": (0, 0)}),
+                                              callback=None)
+
+    state = {"flip": False}
+    # Pseudo-terminals of our own to push to; the master ends are drained
+    ptys = [os.openpty() for _ in range(PUSH_TTYS)]
+    tty_paths = [os.ttyname(slave) for _, slave in ptys]
+
+    def changed(data):
+        # Alternate between two payloads so every call is a real write
+        state["flip"] = not state["flip"]
+        return data + b"\n" if state["flip"] else data
+
+    def zed_write(palette):
+        update_zed.install_zed_theme_family(changed(palette.zed_bytes))
+
+    def push(palette):
+        terminal_push.push(terminal_push.palette_sequences(palette.palette), tty_paths)
+        for master, _ in ptys:
+            os.read(master, 65536)
+
+    def iterm_write(palette):
+        update_iterm2.install_iterm_profile(changed(palette.iterm_bytes))
+
+    return {
+        # Uncached: the emitters share one solution per palette object
+        "contrast_solve": lambda p: ContrastSolution(p.palette),
+        "zed_theme": lambda p: update_zed.create_zed_theme_family(p.palette),
+        "zed_serialize": lambda p: update_zed.serialize_theme_family(p.zed_family),
+        "zed_write": zed_write,
+        "zed_write_unchanged": lambda p: update_zed.install_zed_theme_family(p.zed_bytes),
+        "zed_settings": lambda p: update_zed.update_zed_settings(),
+        "iterm_profile": lambda p: update_iterm2.build_iterm_profile(p.palette),
+        "iterm_serialize": lambda p: update_iterm2.serialize_iterm_profile(p.iterm_profile),
+        "iterm_write": iterm_write,
+        "iterm_create": lambda p: update_iterm2.create_iterm_profile(p.palette),
+        "terminal_push": push,
+        "iterm_reload": lambda p: reloader.reload(),
+    }
+
+class BenchPalette:
+    """A Palette plus the pre-built intermediates the later stages consume"""
+
+    def __init__(self, label, colors):
+        import update_iterm2
+        import update_zed
+        from palette import Palette
+
+        self.label = label
+        self.palette = Palette(colors)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.zed_family = update_zed.create_zed_theme_family(self.palette)
+            self.iterm_profile = update_iterm2.build_iterm_profile(self.palette)
+        self.zed_bytes = update_zed.serialize_theme_family(self.zed_family)
+        self.iterm_bytes = update_iterm2.serialize_iterm_profile(self.iterm_profile)
+
+def time_stage(func, palettes, repeat):
+    """Per-call wall times in seconds across all palettes"""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for bp in palettes:
+            func(bp)  # warm up
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(bp)
+                times.append(time.perf_counter() - start)
+    return times
+
+def measure_allocations(func, palettes):
+    """Peak traced memory and allocated blocks still alive per call"""
+    gc.collect()
+    peaks, blocks = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for bp in palettes:
+            func(bp)  # keep one-time imports and caches out of the numbers
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            func(bp)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks.append(peak)
+            blocks.append(sum(s.count_diff for s in after.compare_to(before, 'filename') if s.count_diff > 0))
+    return max(peaks), int(sum(blocks) / len(blocks))
+
+def cold_start_stages(home, colors):
+    """Stage name -> argv for fresh interpreter runs inside the sandbox"""
+    cache = os.path.join(home, ".cache", "wal")
+    os.makedirs(cache, exist_ok=True)
+    with open(os.path.join(cache, "colors.json"), 'w') as f:
+        json.dump(colors, f, indent=4)
+
+    imports = (f"import sys; sys.path[:0] = [{WAL_DIR!r}, {SCRIPTS_DIR!r}]; "
+               "import update_zed, update_iterm2")
+    return {
+        "cold_python": [sys.executable, "-c", "pass"],
+        "cold_import": [sys.executable, "-c", imports],
+        "cold_update_zed": [sys.executable, os.path.join(WAL_DIR, "update_zed.py")],
+        "cold_update_iterm2": [sys.executable, os.path.join(SCRIPTS_DIR, "update_iterm2.py")],
+    }
+
+def time_process(argv, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+def summarize(times):
+    return {
+        "runs": len(times),
+        "min_ms": round(min(times) * 1000, 4),
+        "median_ms": round(percentile(times, 50) * 1000, 4),
+        "p95_ms": round(percentile(times, 95) * 1000, 4),
+        "mean_ms": round(sum(times) / len(times) * 1000, 4),
+    }
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=WAL_DIR,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+def run_benchmarks(repeat=DEFAULT_REPEAT, cold=DEFAULT_COLD, per_kind=3, paths=(), only=None, progress=None):
+    """Run the suite and return a baseline-shaped result dict"""
+    corpus = build_corpus(per_kind, paths)
+    results = {}
+    with sandbox() as home:
+        stages = in_process_stages()
+        palettes = [BenchPalette(label, colors) for label, colors in corpus]
+
+        for name, func in stages.items():
+            if only and name not in only:
+                continue
+            stats = summarize(time_stage(func, palettes, repeat))
+            stats["peak_kib"], stats["blocks"] = measure_allocations(func, palettes)
+            stats["peak_kib"] = round(stats["peak_kib"] / 1024, 1)
+            results[name] = stats
+            if progress:
+                progress(name, stats)
+
+        # Let background reloads finish before the sandbox goes away
+        import iterm_reload
+        iterm_reload.coordinator().wait(iterm_reload.RELOAD_TIMEOUT)
+
+        if cold:
+            for name, argv in cold_start_stages(home, corpus[0][1]).items():
+                if only and name not in only:
+                    continue
+                stats = summarize(time_process(argv, cold))
+                results[name] = stats
+                if progress:
+                    progress(name, stats)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "repeat": repeat,
+            "cold_runs": cold,
+            "corpus": [label for label, _ in corpus],
+        },
+        "stages": results,
+    }
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_ms=0.0):
+    """Rows of (stage, baseline ms, current ms, change %, regressed)
+
+    A stage only counts as regressed if it also got at least min_ms slower.
+    """
+    rows = []
+    for name, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or not old.get("median_ms"):
+            continue
+        delta = stats["median_ms"] - old["median_ms"]
+        change = delta / old["median_ms"] * 100
+        rows.append((name, old["median_ms"], stats["median_ms"], change, change > threshold and delta >= min_ms))
+    return rows
+
+def format_stats(name, stats):
+    line = (f"{name:<20} median {stats['median_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms"
+            f"  min {stats['min_ms']:9.3f} ms")
+    if "peak_kib" in stats:
+        line += f"  peak {stats['peak_kib']:8.1f} KiB  blocks {stats['blocks']:6d}"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pywal theme generators")
+    parser.add_argument("-n", "--repeat", type=int, default=DEFAULT_REPEAT, help="timed calls per palette and stage")
+    parser.add_argument("--cold", type=int, default=DEFAULT_COLD, help="cold-start runs per command (0 to skip)")
+    parser.add_argument("--per-kind", type=int, default=3, help="synthetic palettes per kind")
+    parser.add_argument("--palette", action="append", default=[], help="real colors.json to include (repeatable)")
+    parser.add_argument("--stage", action="append", help="only run this stage (repeatable)")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="regression threshold in percent (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read baseline: {e}")
+            return 1
+
+    progress = None if args.json else lambda name, stats: print(format_stats(name, stats))
+    if not args.json:
+        print(f"⏱  Benchmarking theme generators (python {platform.python_version()})")
+    results = run_benchmarks(args.repeat, args.cold, args.per_kind, args.palette, args.stage, progress)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        if not args.json:
+            print(f"💾 Baseline saved: {args.save}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if baseline is None:
+        return 0
+
+    rows = compare(results, baseline, args.threshold)
+    revision = baseline.get("meta", {}).get("revision") or "baseline"
+    if not args.json:
+        print(f"\n📊 Compared with {revision}:")
+        for name, old, new, change, regressed in rows:
+            mark = "❌" if regressed else "✅"
+            print(f"{mark} {name:<20} {old:9.3f} → {new:9.3f} ms  ({change:+.1f}%)")
+    return 1 if any(row[4] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# Vectorized Color Derivation Engine
+# Computes every derived color used by the Zed theme in a few NumPy array
+# operations. Requires NumPy; update_zed.py falls back to its scalar helpers
+# when this module cannot be imported.
+
+import numpy as np
+
+from palette import as_color
+
+# Brightness factors and blend ratios used by create_zed_theme_family()
+ADJUST_FACTORS = (0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.05, 1.1, 1.2)
+BLEND_RATIOS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.4)
+
+def hex_array(colors):
+    """Convert a sequence of Colors or hex strings to an (N, 3) float array (0-1 range)"""
+    packed = np.array([as_color(c).value for c in colors], dtype=np.int64)
+    channels = np.stack([(packed >> 16) & 0xff, (packed >> 8) & 0xff, packed & 0xff], axis=-1)
+    return channels / 255.0
+
+def array_hex(rgb):
+    """Convert a float array of shape (..., 3) to a flat list of hex colors"""
+    ints = (rgb * 255).astype(np.int64).reshape(-1, 3)
+    packed = (ints[:, 0] << 16) | (ints[:, 1] << 8) | ints[:, 2]
+    return ['#{:06x}'.format(v) for v in packed.tolist()]
+
+class VectorizedDeriver:
+    """Derived-color tables for one palette, computed in bulk
+
+    Exposes the same operations as the scalar helpers in update_zed.py
+    (adjust, blend) and returns identical hex strings. The readable
+    foreground and accents come from contrast.ContrastSolution.
+    """
+
+    def __init__(self, palette, foreground, accents):
+        self.background = background = palette.background.hex
+        self.foreground = foreground
+        self.accents = list(accents)
+
+        # Sources: background, foreground and every accent (18 rows). Accents
+        # are re-read from their hex form, exactly as the scalar path does.
+        sources = [background, foreground] + self.accents
+        source_rgb = hex_array([palette.intern(c) for c in sources])
+
+        factors = np.array(ADJUST_FACTORS)
+        ratios = np.array(BLEND_RATIOS)
+
+        adjusted = np.clip(source_rgb[:, None, :] * factors[None, :, None], 0.0, 1.0)
+        blended = (source_rgb[0] * (1 - ratios)[:, None])[None, :, :] + \
+            source_rgb[:, None, :] * ratios[None, :, None]
+
+        adjusted_hex = array_hex(adjusted)
+        blended_hex = array_hex(blended)
+
+        self._adjusted = {}
+        self._blended = {}
+        for i, color in enumerate(sources):
+            for j, f in enumerate(ADJUST_FACTORS):
+                self._adjusted[(color, f)] = adjusted_hex[i * len(ADJUST_FACTORS) + j]
+            for j, r in enumerate(BLEND_RATIOS):
+                self._blended[(background, color, r)] = blended_hex[i * len(BLEND_RATIOS) + j]
+
+    def adjust(self, hex_color, factor):
+        """Adjust brightness of a color by factor (0.0-2.0)"""
+        key = (hex_color, factor)
+        if key not in self._adjusted:
+            rgb = hex_array([hex_color])
+            self._adjusted[key] = array_hex(np.clip(rgb * factor, 0.0, 1.0))[0]
+        return self._adjusted[key]
+
+    def blend(self, color1, color2, ratio=0.5):
+        """Blend two colors together"""
+        key = (color1, color2, ratio)
+        if key not in self._blended:
+            rgb = hex_array([color1, color2])
+            self._blended[key] = array_hex(rgb[0] * (1 - ratio) + rgb[1] * ratio)[0]
+        return self._blended[key]
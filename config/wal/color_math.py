@@ -0,0 +1,164 @@
+# Perceptual Color Math
+# OKLab / OKLCH versions of the operations the Zed theme rules use, so
+# tints and shades step evenly in perceived lightness instead of in gamma
+# encoded sRGB. Transfer functions are table lookups: palette colors are
+# 8-bit, so sRGB -> linear is a 256-entry table (palette.SRGB_TO_LINEAR), and
+# linear -> sRGB interpolates a 4096-entry table (under 0.005 of an 8-bit
+# step from the exact curve).
+#
+# ColorMath("srgb", "truncate") reproduces the original helpers in
+# update_zed.py exactly. Select another space or rounding with
+# PYWAL_COLOR_SPACE=oklab and PYWAL_COLOR_ROUNDING=round.
+
+import os
+
+from palette import SRGB_TO_LINEAR, as_color
+
+SPACES = ("srgb", "oklab")
+ROUNDINGS = ("truncate", "round")
+
+ENCODE_STEPS = 4096
+
+# Chroma bisection steps when an OKLCH color falls outside sRGB
+GAMUT_STEPS = 10
+
+def _encode(x):
+    """Exact linear light to sRGB channel (0-1 range)"""
+    if x <= 0.0031308:
+        return 12.92 * x
+    return 1.055 * pow(x, 1 / 2.4) - 0.055
+
+LINEAR_TO_SRGB = [_encode(i / ENCODE_STEPS) for i in range(ENCODE_STEPS + 1)]
+
+def encode(x):
+    """Linear light to sRGB channel through the interpolated table"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    pos = x * ENCODE_STEPS
+    i = int(pos)
+    low = LINEAR_TO_SRGB[i]
+    return low + (LINEAR_TO_SRGB[i + 1] - low) * (pos - i)
+
+def _cbrt(x):
+    return x ** (1 / 3) if x >= 0 else -((-x) ** (1 / 3))
+
+def color_to_oklab(color):
+    """OKLab (L, a, b) of a Color or hex string"""
+    v = as_color(color).value
+    r = SRGB_TO_LINEAR[v >> 16]
+    g = SRGB_TO_LINEAR[(v >> 8) & 0xff]
+    b = SRGB_TO_LINEAR[v & 0xff]
+    l = _cbrt(0.4122214708 * r + 0.5363325363 * g + 0.0514459929 * b)
+    m = _cbrt(0.2119034982 * r + 0.6806995451 * g + 0.1073969566 * b)
+    s = _cbrt(0.0883024619 * r + 0.2817188376 * g + 0.6299787005 * b)
+    return (
+        0.2104542553 * l + 0.7936177850 * m - 0.0040720468 * s,
+        1.9779984951 * l - 2.4285922050 * m + 0.4505937099 * s,
+        0.0259040371 * l + 0.7827717662 * m - 0.8086757660 * s,
+    )
+
+def oklab_to_linear(lab):
+    """Linear-light RGB for an OKLab color (may be outside 0-1)"""
+    L, a, b = lab
+    l = (L + 0.3963377774 * a + 0.2158037573 * b) ** 3
+    m = (L - 0.1055613458 * a - 0.0638541728 * b) ** 3
+    s = (L - 0.0894841775 * a - 1.2914855480 * b) ** 3
+    return (
+        4.0767416621 * l - 3.3077115913 * m + 0.2309699292 * s,
+        -1.2684380046 * l + 2.6097574011 * m - 0.3413193965 * s,
+        -0.0041960863 * l - 0.7034186147 * m + 1.7076147010 * s,
+    )
+
+def _in_gamut(linear, eps=1e-6):
+    return all(-eps <= c <= 1 + eps for c in linear)
+
+def fit_gamut(L, a, b):
+    """Linear RGB for an OKLab color, reducing chroma (hue and lightness kept) until it fits sRGB"""
+    L = min(1.0, max(0.0, L))
+    linear = oklab_to_linear((L, a, b))
+    if _in_gamut(linear):
+        return linear
+    lo, hi = 0.0, 1.0
+    for _ in range(GAMUT_STEPS):
+        mid = (lo + hi) / 2
+        if _in_gamut(oklab_to_linear((L, a * mid, b * mid))):
+            lo = mid
+        else:
+            hi = mid
+    return oklab_to_linear((L, a * lo, b * lo))
+
+class ColorMath:
+    """Theme color operations in one color space, with one rounding mode
+
+    Every operation takes Colors or hex strings and returns a hex string.
+    adjust() and blend() follow the chosen space; lighten, darken, mix and
+    saturate are always perceptual (OKLCH / OKLab).
+    """
+
+    def __init__(self, space="srgb", rounding="truncate"):
+        if space not in SPACES:
+            raise ValueError(f"unknown color space {space!r} (expected one of {', '.join(SPACES)})")
+        if rounding not in ROUNDINGS:
+            raise ValueError(f"unknown rounding {rounding!r} (expected one of {', '.join(ROUNDINGS)})")
+        self.space = space
+        self.rounding = rounding
+        self._half = 0.5 if rounding == "round" else 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("PYWAL_COLOR_SPACE") or "srgb",
+                   os.environ.get("PYWAL_COLOR_ROUNDING") or "truncate")
+
+    @property
+    def is_default(self):
+        return self.space == "srgb" and self.rounding == "truncate"
+
+    @property
+    def name(self):
+        return f"{self.space}-{self.rounding}"
+
+    def to_hex(self, rgb):
+        """Hex for an sRGB tuple (0-1 range), clamped and rounded per this theme"""
+        half = self._half
+        r, g, b = (int(min(1.0, max(0.0, c)) * 255 + half) for c in rgb)
+        return '#{:02x}{:02x}{:02x}'.format(r, g, b)
+
+    def from_oklab(self, L, a, b):
+        return self.to_hex([encode(c) for c in fit_gamut(L, a, b)])
+
+    def adjust(self, color, factor):
+        """Brightness scaled by factor: sRGB channels, or OKLab lightness"""
+        if self.space == "srgb":
+            return self.to_hex([c * factor for c in as_color(color).rgb])
+        L, a, b = color_to_oklab(color)
+        return self.from_oklab(L * factor, a, b)
+
+    def blend(self, color1, color2, ratio=0.5):
+        """Mix of two colors in the chosen space"""
+        if self.space == "srgb":
+            rgb1 = as_color(color1).rgb
+            rgb2 = as_color(color2).rgb
+            return self.to_hex([x * (1 - ratio) + y * ratio for x, y in zip(rgb1, rgb2)])
+        return self.mix(color1, color2, ratio)
+
+    def mix(self, color1, color2, ratio=0.5):
+        """Mix of two colors in OKLab"""
+        lab1 = color_to_oklab(color1)
+        lab2 = color_to_oklab(color2)
+        return self.from_oklab(*(x * (1 - ratio) + y * ratio for x, y in zip(lab1, lab2)))
+
+    def lighten(self, color, amount):
+        """OKLCH lightness raised by amount (0-1)"""
+        L, a, b = color_to_oklab(color)
+        return self.from_oklab(L + amount, a, b)
+
+    def darken(self, color, amount):
+        """OKLCH lightness lowered by amount (0-1)"""
+        return self.lighten(color, -amount)
+
+    def saturate(self, color, factor):
+        """OKLCH chroma scaled by factor (0 gives the gray of equal lightness)"""
+        L, a, b = color_to_oklab(color)
+        return self.from_oklab(L, a * factor, b * factor)
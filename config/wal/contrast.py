@@ -0,0 +1,188 @@
+# WCAG Contrast Matrix and Solver
+# Shared by update_zed.py and scripts/update_iterm2.py. ContrastMatrix holds
+# the WCAG contrast ratio between every pair of palette colors, computed in
+# one pass. solve() finds, for a whole batch of colors at once, the smallest
+# lightness change (a mix towards white or black) that reaches each color's
+# target ratio against the background, by lockstep bisection. Every probe is
+# the 8-bit color that would be emitted, so its luminance is three table
+# reads and the answer needs no fix-up after rounding.
+#
+# The text target defaults to WCAG AA (4.5:1); set PYWAL_MIN_CONTRAST to
+# change it.
+
+import math
+import os
+import weakref
+
+from palette import SRGB_TO_LINEAR
+
+DEFAULT_MIN_CONTRAST = 4.5
+
+# color0 only has to stand apart from the background and color8 is dim
+# text; every other ANSI color is regular text
+ANSI_TARGETS = {0: 1.5, 8: 3.0}
+
+# Mixes are searched in 1/255 steps, so 8 halvings pin one down
+MIX_STEPS = 255
+BISECT_STEPS = 8
+
+def min_contrast():
+    """Target ratio for text colors"""
+    value = os.environ.get("PYWAL_MIN_CONTRAST")
+    return float(value) if value else DEFAULT_MIN_CONTRAST
+
+def contrast_ratio(lum1, lum2):
+    """WCAG contrast ratio between two relative luminances"""
+    if lum1 < lum2:
+        lum1, lum2 = lum2, lum1
+    return (lum1 + 0.05) / (lum2 + 0.05)
+
+def _mix_channels(rgb, toward, t):
+    """8-bit channels of rgb mixed a fraction t of the way to white (1.0) or black (0.0)
+
+    Rounded away from the background, so a probe that meets its target
+    still does once emitted.
+    """
+    if toward:
+        return [min(255, math.ceil((c + (1.0 - c) * t) * 255 - 1e-9)) for c in rgb]
+    return [max(0, math.floor(c * (1.0 - t) * 255 + 1e-9)) for c in rgb]
+
+def mixed_luminance(rgb, toward, t):
+    """Luminance of the 8-bit color _mix_channels() gives"""
+    r, g, b = _mix_channels(rgb, toward, t)
+    return 0.2126 * SRGB_TO_LINEAR[r] + 0.7152 * SRGB_TO_LINEAR[g] + 0.0722 * SRGB_TO_LINEAR[b]
+
+class ContrastMatrix:
+    """Contrast ratios between every pair of background, foreground and color0-15"""
+
+    def __init__(self, palette):
+        self.names = ["background", "foreground"] + [f"color{i}" for i in range(16)]
+        colors = [palette.background, palette.foreground] + palette.colors
+        self.luminance = [c.luminance if c is not None else None for c in colors]
+        self.ratios = [
+            [contrast_ratio(a, b) if a is not None and b is not None else None for b in self.luminance]
+            for a in self.luminance
+        ]
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def ratio(self, name1, name2):
+        return self.ratios[self._index[name1]][self._index[name2]]
+
+    def against(self, name="background"):
+        """{color name: ratio} against one color"""
+        row = self.ratios[self._index[name]]
+        return {n: r for n, r in zip(self.names, row) if n != name}
+
+def _meets(lum, bg_lum, toward, target):
+    # Past the background on the side we are moving to, and far enough
+    on_side = lum >= bg_lum if toward else lum <= bg_lum
+    return on_side and contrast_ratio(lum, bg_lum) >= target
+
+def solve(colors, background, targets, steps=BISECT_STEPS):
+    """Hex colors meeting each target ratio against background with minimal change
+
+    colors and targets are parallel lists; colors already meeting their
+    target (and None entries) come back unchanged. Colors are moved away
+    from the background when that can reach the target, otherwise across
+    it; if neither can, the better of white and black is used.
+    """
+    bg_lum = background.luminance
+    results = [None if c is None else c.hex for c in colors]
+    jobs = []
+    # Identical (color, target) requests share one job
+    seen = {}
+    duplicates = []
+    for i, (color, target) in enumerate(zip(colors, targets)):
+        if color is None or contrast_ratio(color.luminance, bg_lum) >= target:
+            continue
+        key = (color.value, target)
+        if key in seen:
+            duplicates.append((i, seen[key]))
+            continue
+        seen[key] = i
+        away = 1.0 if color.luminance >= bg_lum else 0.0
+        across = 1.0 - away
+        if contrast_ratio(away, bg_lum) >= target:
+            toward = away
+        elif contrast_ratio(across, bg_lum) >= target:
+            toward = across
+        else:
+            best = away if contrast_ratio(away, bg_lum) >= contrast_ratio(across, bg_lum) else across
+            results[i] = "#ffffff" if best else "#000000"
+            continue
+        # [index, rgb, toward, lo, hi, target]
+        jobs.append([i, color.rgb, toward, 0, MIX_STEPS, target])
+
+    # Bisect every unresolved color in lockstep
+    for _ in range(steps):
+        for job in jobs:
+            _, rgb, toward, lo, hi, target = job
+            mid = (lo + hi) // 2
+            if _meets(mixed_luminance(rgb, toward, mid / MIX_STEPS), bg_lum, toward, target):
+                job[4] = mid
+            else:
+                job[3] = mid
+
+    # hi always meets the target (at MIX_STEPS it is pure white or black)
+    for i, rgb, toward, _, hi, _ in jobs:
+        results[i] = '#{:02x}{:02x}{:02x}'.format(*_mix_channels(rgb, toward, hi / MIX_STEPS))
+    for i, first in duplicates:
+        results[i] = results[first]
+    return results
+
+class ContrastSolution:
+    """Readable foreground, accents and ANSI colors for one palette and target"""
+
+    def __init__(self, palette, target=None):
+        self.palette = palette
+        self.target = target or min_contrast()
+        self.matrix = ContrastMatrix(palette)
+
+        # One batch: the foreground, every color as text, and the ANSI roles
+        ansi_targets = [min(ANSI_TARGETS.get(i, self.target), self.target) for i in range(16)]
+        colors = [palette.foreground] + palette.colors + palette.colors
+        targets = [self.target] + [self.target] * 16 + ansi_targets
+        solved = solve(colors, palette.background, targets)
+
+        self.foreground = solved[0]
+        self.accents = solved[1:17]
+        self.ansi = solved[17:33]
+        self._extra = {}
+
+    def accent(self, index, target=None):
+        """Color index as readable text, optionally for another target ratio"""
+        if target is None or target == self.target:
+            return self.accents[index]
+        key = (index, target)
+        if key not in self._extra:
+            self._extra[key] = solve([self.palette.colors[index]], self.palette.background, [target])[0]
+        return self._extra[key]
+
+    def cursor(self):
+        """Best cursor color: the solved foreground, else the palette color that stands out most"""
+        palette = self.palette
+        # The solved foreground meets the target whenever any color can
+        foreground = palette.intern(self.foreground)
+        if contrast_ratio(foreground.luminance, palette.background.luminance) >= self.target:
+            return foreground
+
+        # color0 is often the background itself
+        ratios = self.matrix.against("background")
+        candidates = ["foreground"] + [f"color{i}" for i in range(1, 16)]
+        best = max((name for name in candidates if ratios[name] is not None), key=ratios.get)
+        return palette.foreground if best == "foreground" else palette.colors[int(best[5:])]
+
+    def adjusted(self):
+        """Names of palette colors the solver changed for their ANSI role"""
+        return [f"color{i}" for i, (c, s) in enumerate(zip(self.palette.colors, self.ansi))
+                if c is not None and c.hex != s]
+
+_solutions = weakref.WeakKeyDictionary()
+
+def contrast_solution(palette, target=None):
+    """ContrastSolution for a palette, shared by every emitter that asks"""
+    target = target or min_contrast()
+    per_palette = _solutions.setdefault(palette, {})
+    if target not in per_palette:
+        per_palette[target] = ContrastSolution(palette, target)
+    return per_palette[target]
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+# Built-in Palette Extractor
+# In-process replacement for `wal --backend colorz -i <image> --saturate 0.8`.
+# Decodes a downsampled copy of the image, clusters its colors with
+# vectorized k-means (or Pillow's median cut), applies pywal's colorz
+# adjustments and saturation, and emits the colors.json schema read by
+# update_zed.py and scripts/update_iterm2.py. Results are cached by image
+# hash and parameters. Requires NumPy and Pillow; callers fall back to wal
+# when this module cannot be imported.
+#
+# Usage: extract_palette.py <image> [--saturate 0.8] [--method kmeans|mediancut] [-o FILE]
+
+import argparse
+import colorsys
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+from artifact_writer import atomic_write
+
+# colorz defaults, as used by pywal's colorz backend
+NUM_COLORS = 6
+MIN_V = 170
+MAX_V = 200
+THUMB_SIZE = (200, 200)
+SCALE = 256.0
+
+DEFAULT_SATURATE = 0.8
+DEFAULT_METHOD = "kmeans"
+
+# Bump when the extraction algorithm changes
+EXTRACTOR_VERSION = "1"
+
+def cache_dir():
+    """Directory of cached extraction results"""
+    return os.path.expanduser("~/.cache/wal/extract")
+
+def image_checksum(path):
+    """md5 of the image, the checksum pywal stores in colors.json"""
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_pixels(path):
+    """Decode a downsampled copy of the image as an (N, 3) uint8 array"""
+    with Image.open(path) as img:
+        # Let JPEG decode at reduced scale instead of full resolution
+        img.draft('RGB', (THUMB_SIZE[0] * 2, THUMB_SIZE[1] * 2))
+        img = img.convert('RGB')
+        img.thumbnail(THUMB_SIZE)
+        return np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+
+def unique_colors(pixels):
+    """Distinct colors of a pixel array (colorz clusters distinct colors)"""
+    packed = (pixels[:, 0].astype(np.int64) << 16) | (pixels[:, 1].astype(np.int64) << 8) | pixels[:, 2]
+    packed = np.unique(packed)
+    return np.stack([packed >> 16, (packed >> 8) & 0xff, packed & 0xff], axis=-1)
+
+def clamp_value(colors, min_v=MIN_V, max_v=MAX_V):
+    """Clamp HSV value of every color into [min_v, max_v] (colorz clamp)"""
+    rgb = colors / SCALE
+    v = rgb.max(axis=1)
+    target = np.clip(v, min_v / SCALE, max_v / SCALE)
+    # Same hue and saturation, new value: scale the channels
+    scale = np.divide(target, v, out=np.zeros_like(v), where=v > 0)
+    clamped = np.where((v > 0)[:, None], rgb * scale[:, None], target[:, None])
+    return (clamped * SCALE).astype(np.int64).astype(float)
+
+def kmeans(points, k, iterations=20, restarts=3, seed=0):
+    """Lloyd's k-means with k-means++ seeding; returns the lowest-distortion centroids"""
+    rng = np.random.default_rng(seed)
+    if len(points) <= k:
+        return np.resize(points, (k, points.shape[1]))
+
+    best, best_distortion = None, np.inf
+    for _ in range(restarts):
+        centroids = points[rng.integers(len(points))][None, :]
+        for _ in range(1, k):
+            d2 = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(-1).min(axis=1)
+            total = d2.sum()
+            if total == 0:
+                centroids = np.vstack([centroids, points[rng.integers(len(points))]])
+                continue
+            centroids = np.vstack([centroids, points[rng.choice(len(points), p=d2 / total)]])
+
+        for _ in range(iterations):
+            d2 = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(-1)
+            labels = d2.argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, points)
+            moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
+            if np.allclose(moved, centroids):
+                break
+            centroids = moved
+
+        distortion = np.sqrt(((points[:, None, :] - centroids[None, :, :]) ** 2).sum(-1).min(axis=1)).mean()
+        if distortion < best_distortion:
+            best, best_distortion = centroids, distortion
+    return best
+
+def median_cut(points, k):
+    """Median-cut clusters via Pillow's quantizer"""
+    strip = Image.fromarray(points.astype(np.uint8).reshape(1, -1, 3), 'RGB')
+    quantized = strip.quantize(colors=k, method=Image.Quantize.MEDIANCUT)
+    palette = np.array(quantized.getpalette()[:k * 3], dtype=float).reshape(-1, 3)
+    return np.resize(palette, (k, 3))
+
+def order_by_hue(colors):
+    """Sort colors by hue, round-tripping through HSV like colorz"""
+    hsvs = sorted((colorsys.rgb_to_hsv(*(c / SCALE for c in color)) for color in colors), key=lambda t: t[0])
+    return [tuple(min(255, int(x * SCALE)) for x in colorsys.hsv_to_rgb(*hsv)) for hsv in hsvs]
+
+def rgb_to_hex(rgb):
+    return "#%02x%02x%02x" % tuple(rgb)
+
+def hex_to_rgb(color):
+    return tuple(bytes.fromhex(color.strip("#")))
+
+def darken_color(color, amount):
+    return rgb_to_hex([int(c * (1 - amount)) for c in hex_to_rgb(color)])
+
+def lighten_color(color, amount):
+    return rgb_to_hex([int(c + (255 - c) * amount) for c in hex_to_rgb(color)])
+
+def set_saturation(color, amount, add=False):
+    """Set (or add to) the HLS saturation of a hex color"""
+    r, g, b = [x / 255.0 for x in hex_to_rgb(color)]
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+    s = max(-1.0, min(1.0, s + amount)) if add else amount
+    r, g, b = colorsys.hls_to_rgb(h, l, s)
+    return rgb_to_hex([int(x * 255.0) for x in (r, g, b)])
+
+def adjust_colorz(cols, light=False):
+    """pywal's colorz backend layout plus its generic dark/light adjustment"""
+    colors = [cols[0], *cols, "#FFFFFF", "#000000", *cols, "#FFFFFF"]
+    colors[0] = darken_color(cols[0], 0.80)
+
+    if light:
+        colors[0] = lighten_color(colors[0], 0.95)
+        colors[7] = darken_color(colors[0], 0.75)
+        colors[8] = darken_color(colors[0], 0.25)
+        colors[15] = colors[7]
+        return colors
+
+    if colors[0][1] != "0":  # the color may already be dark enough
+        colors[0] = darken_color(colors[0], 0.40)
+
+    # Any zero high nibble means the color may not be saturated enough
+    if "0" in (colors[0][1], colors[0][3], colors[0][5]):
+        colors[0] = lighten_color(colors[0], 0.03)
+        colors[0] = set_saturation(colors[0], 0.40)
+
+    colors[7] = lighten_color(colors[0], 0.75)
+    colors[8] = lighten_color(colors[0], 0.35)
+    colors[8] = set_saturation(colors[8], 0.10)
+    colors[15] = colors[7]
+    return colors
+
+def saturate_colors(colors, amount):
+    """pywal --saturate: add saturation to everything but color7 and color15"""
+    if not amount or not -1.0 <= float(amount) <= 1.0:
+        return colors
+    return [c if i in (7, 15) else set_saturation(c, float(amount), add=True)
+            for i, c in enumerate(colors)]
+
+def colors_to_dict(colors, image, checksum):
+    """The colors.json schema written by pywal"""
+    return {
+        "checksum": checksum,
+        "wallpaper": image,
+        "alpha": "100",
+        "special": {
+            "background": colors[0],
+            "foreground": colors[15],
+            "cursor": colors[15],
+        },
+        "colors": {f"color{i}": colors[i] for i in range(16)},
+    }
+
+def extract(image, saturate=DEFAULT_SATURATE, method=DEFAULT_METHOD, light=False, use_cache=True):
+    """Extract a pywal colors dict from an image, cached by image hash and parameters"""
+    image = os.path.abspath(image)
+    checksum = image_checksum(image)
+    params = {"version": EXTRACTOR_VERSION, "saturate": saturate, "method": method, "light": light}
+    key = hashlib.sha256((checksum + json.dumps(params, sort_keys=True)).encode('utf-8')).hexdigest()
+    cache_file = os.path.join(cache_dir(), f"{key}.json")
+
+    if use_cache and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                colors = json.load(f)
+            colors["wallpaper"] = image
+            return colors
+        except (OSError, ValueError):
+            pass
+
+    points = clamp_value(unique_colors(load_pixels(image)))
+    if method == "mediancut":
+        clusters = median_cut(points, NUM_COLORS)
+    else:
+        clusters = kmeans(points, NUM_COLORS)
+    cols = [rgb_to_hex(c) for c in order_by_hue(clusters)]
+
+    colors = colors_to_dict(saturate_colors(adjust_colorz(cols, light), saturate), image, checksum)
+
+    if use_cache:
+        os.makedirs(cache_dir(), exist_ok=True)
+        atomic_write(cache_file, json.dumps(colors, indent=4).encode('utf-8'))
+    return colors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract a pywal palette from an image")
+    parser.add_argument("image")
+    parser.add_argument("--saturate", type=float, default=DEFAULT_SATURATE)
+    parser.add_argument("--method", choices=("kmeans", "mediancut"), default=DEFAULT_METHOD)
+    parser.add_argument("-l", "--light", action="store_true", help="generate a light palette")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("-o", "--output", help="write colors.json here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.image):
+        print(f"❌ File not found: {args.image}")
+        return 1
+
+    colors = extract(args.image, args.saturate, args.method, args.light, not args.no_cache)
+    data = json.dumps(colors, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data)
+    else:
+        print(data)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+# iTerm2 Reload Coordinator
+# Asks a running iTerm2 to reload its dynamic profiles without holding up
+# theme generation: request() returns at once and the reload runs in a
+# background thread. The strategy that worked last time (remembered in
+# ~/.cache/wal/iterm_reload.json) goes first; if it has not answered within
+# HEDGE_DELAY, or fails, the next one is started, and the first success
+# cancels everything still running. Last-resort strategies (the USR1
+# signal) are never raced: they start only once every other strategy has
+# failed, and are never remembered. The whole reload is bounded by
+# RELOAD_TIMEOUT, and requests arriving meanwhile collapse into one rerun.
+# Outcomes and latencies are reported through a callback. A process that
+# exits with a reload still running gives it EXIT_WAIT, then cancels it.
+#
+# Commands go through a runner, so the coordinator can be driven by
+# FakeRunner on machines without iTerm2 (--self-test does exactly that).
+#
+# Usage: iterm_reload.py [--forget] [--json]
+#        iterm_reload.py --self-test
+
+import argparse
+import atexit
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from queue import Empty, Queue
+
+from artifact_writer import atomic_write
+
+RELOAD_TIMEOUT = 5.0
+HEDGE_DELAY = 0.75
+POLL_INTERVAL = 0.02
+EXIT_WAIT = 1.0
+
+# last_resort: only tried after every other strategy failed, never remembered
+Strategy = namedtuple("Strategy", "name argv last_resort", defaults=(False,))
+
+STRATEGIES = (
+    Strategy("applescript", ['osascript', '-e', 'tell application "iTerm2"', '-e', 'reload dynamic profiles',
+                             '-e', 'end tell']),
+    Strategy("bundle-id", ['osascript', '-e', 'tell application id "com.googlecode.iterm2" to reload dynamic profiles']),
+    Strategy("signal", ['killall', '-USR1', 'iTerm2'], last_resort=True),  # Signal approach as fallback
+)
+
+def state_file():
+    """Where the last working strategy is remembered"""
+    return os.path.expanduser("~/.cache/wal/iterm_reload.json")
+
+def subprocess_runner(strategy, cancel, timeout):
+    """Run a strategy's command; its exit code, or None if cancelled
+
+    Raises OSError if the command cannot be started and
+    subprocess.TimeoutExpired if it outlives timeout. A cancelled or timed
+    out command is killed.
+    """
+    proc = subprocess.Popen(strategy.argv, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            code = proc.poll()
+            if code is not None:
+                return code
+            if cancel.is_set():
+                return None
+            if time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(strategy.argv, timeout)
+            cancel.wait(POLL_INTERVAL)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+class FakeRunner:
+    """Runner answering from a table instead of running anything
+
+    outcomes maps a strategy name to (seconds, exit code); an exit code that
+    is an exception instance is raised instead. Unknown strategies fail as
+    if the command were missing. Every call is recorded in calls.
+    """
+
+    def __init__(self, outcomes):
+        self.outcomes = dict(outcomes)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, strategy, cancel, timeout):
+        with self._lock:
+            self.calls.append(strategy.name)
+        if strategy.name not in self.outcomes:
+            raise FileNotFoundError(2, "No such file or directory", strategy.argv[0])
+        seconds, code = self.outcomes[strategy.name]
+        if seconds > timeout:
+            cancel.wait(timeout)
+            if cancel.is_set():
+                return None
+            raise subprocess.TimeoutExpired(strategy.argv, timeout)
+        if cancel.wait(seconds):
+            return None
+        if isinstance(code, BaseException):
+            raise code
+        return code
+
+def print_report(report):
+    """Default callback: one line about how the reload went"""
+    if report["ok"]:
+        print(f"Reloaded iTerm2 dynamic profiles ({report['strategy']}, {report['seconds'] * 1000:.0f} ms)")
+    else:
+        print("Note: iTerm2 profile created. You may need to manually reload profiles in iTerm2.")
+
+class ReloadCoordinator:
+    """Runs reload strategies in the background, remembered winner first"""
+
+    def __init__(self, strategies=STRATEGIES, runner=None, callback=print_report, state_path=None,
+                 hedge=HEDGE_DELAY, timeout=RELOAD_TIMEOUT):
+        self.strategies = tuple(strategies)
+        self.runner = runner or subprocess_runner
+        self.callback = callback
+        self.state_path = state_path or state_file()
+        self.hedge = hedge
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = False
+        self._cancel = None
+        self._exit_hook = False
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def remembered(self):
+        """Name of the strategy that last worked, if any"""
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f).get("strategy")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def remember(self, name):
+        if name == self.remembered():
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            atomic_write(self.state_path, json.dumps({"strategy": name}).encode('utf-8'))
+        except OSError:
+            pass
+
+    def forget(self):
+        try:
+            os.unlink(self.state_path)
+        except FileNotFoundError:
+            pass
+
+    def ordered(self):
+        """Strategies in the order they are tried; last-resort ones always come last"""
+        first = self.remembered()
+        return sorted(self.strategies, key=lambda s: (s.last_resort, s.name != first))
+
+    def _attempt(self, strategy, cancel, deadline):
+        start = time.monotonic()
+        try:
+            code = self.runner(strategy, cancel, max(0.0, deadline - start))
+        except FileNotFoundError:
+            status = "missing"
+        except subprocess.TimeoutExpired:
+            status = "timeout"
+        except OSError as e:
+            status = f"error: {e.strerror or e}"
+        else:
+            status = "cancelled" if code is None else "ok" if code == 0 else f"exit {code}"
+        return {"strategy": strategy.name, "status": status, "seconds": round(time.monotonic() - start, 4)}
+
+    def reload(self):
+        """Run the strategies now and return a report; blocks until one works or all are done"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        cancel = self._cancel = threading.Event()
+        queue = list(self.ordered())
+        attempts = []
+        winner = None
+
+        # Plain threads: an executor refuses new work once the interpreter
+        # starts shutting down, which is exactly when a CLI run's reload goes
+        results = Queue()
+        running = 0
+
+        def launch():
+            strategy = queue.pop(0)
+            threading.Thread(target=lambda: results.put(self._attempt(strategy, cancel, deadline)),
+                             name=f"iterm-reload-{strategy.name}", daemon=True).start()
+            return running + 1
+
+        if queue:
+            running = launch()
+        while running:
+            # Start the next strategy early if this one is slow to answer,
+            # unless it is a last resort: that waits for the others to fail
+            hedge = self.hedge if queue and winner is None and not queue[0].last_resort else None
+            try:
+                attempt = results.get(timeout=hedge)
+            except Empty:
+                pass
+            else:
+                running -= 1
+                attempts.append(attempt)
+                if attempt["status"] == "ok" and winner is None:
+                    winner = attempt["strategy"]
+                    cancel.set()
+            if (winner is None and queue and not cancel.is_set() and time.monotonic() < deadline
+                    and not (running and queue[0].last_resort)):
+                running = launch()
+
+        if winner and not any(s.name == winner and s.last_resort for s in self.strategies):
+            self.remember(winner)
+        return {
+            "ok": winner is not None,
+            "strategy": winner,
+            "seconds": round(time.monotonic() - start, 4),
+            "attempts": attempts,
+        }
+
+    def request(self):
+        """Start a background reload and return at once; False if one was already running
+
+        A request made while a reload is in flight is folded into a single
+        rerun once it finishes, so the newest profile always gets picked up.
+        """
+        with self._lock:
+            if self._thread is not None:
+                self._pending = True
+                return False
+            self._idle.clear()
+            # A daemon, so exiting never waits out RELOAD_TIMEOUT; finish()
+            # gives it a short grace period instead
+            if not self._exit_hook:
+                atexit.register(self.finish)
+                self._exit_hook = True
+            self._thread = threading.Thread(target=self._run, name="iterm-reload", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        while True:
+            try:
+                report = self.reload()
+            except Exception as e:
+                report = {"ok": False, "strategy": None, "seconds": 0.0, "attempts": [], "error": str(e)}
+            if self.callback:
+                try:
+                    self.callback(report)
+                except Exception:
+                    pass
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    self._idle.set()
+                    return
+                self._pending = False
+
+    def wait(self, timeout=None):
+        """Block until no reload is running; False on timeout"""
+        return self._idle.wait(timeout)
+
+    def finish(self, timeout=EXIT_WAIT):
+        """Give a running reload up to timeout, then cancel it (and any rerun); True if it finished
+
+        Registered with atexit by request().
+        """
+        if self.wait(timeout):
+            return True
+        with self._lock:
+            self._pending = False
+            if self._cancel is not None:
+                self._cancel.set()
+        # Runners kill their commands within a poll interval of the cancel
+        self.wait(POLL_INTERVAL * 10)
+        return False
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+def coordinator():
+    """The process-wide coordinator used by the generators"""
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            _coordinator = ReloadCoordinator()
+        return _coordinator
+
+def self_test():
+    """Drive ReloadCoordinator through FakeRunner scenarios; [(check, passed, detail)]"""
+    checks = []
+
+    def check(name, passed, detail):
+        checks.append((name, bool(passed), detail))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = os.path.join(tmp, "iterm_reload.json")
+
+        def coordinator_with(outcomes, **kwargs):
+            runner = FakeRunner(outcomes)
+            kwargs.setdefault("callback", None)
+            return ReloadCoordinator(runner=runner, state_path=state, **kwargs), runner
+
+        reloader, runner = coordinator_with({"applescript": (0, 0)})
+        report = reloader.reload()
+        check("first strategy answers", report["ok"] and runner.calls == ["applescript"], runner.calls)
+
+        reloader, runner = coordinator_with({"applescript": (0, 1), "bundle-id": (0, 0)})
+        report = reloader.reload()
+        check("failure falls through", report["strategy"] == "bundle-id" and reloader.remembered() == "bundle-id",
+              [(a["strategy"], a["status"]) for a in report["attempts"]])
+
+        reloader, runner = coordinator_with({name: (0, 0) for name in ("applescript", "bundle-id", "signal")})
+        reloader.reload()
+        check("remembered strategy goes first", runner.calls[:1] == ["bundle-id"], runner.calls)
+
+        reloader.forget()
+        reloader, runner = coordinator_with({"applescript": (2, 0), "bundle-id": (0, 0)}, hedge=0.05)
+        report = reloader.reload()
+        statuses = {a["strategy"]: a["status"] for a in report["attempts"]}
+        check("slow strategy is hedged", report["strategy"] == "bundle-id" and report["seconds"] < 1
+              and statuses.get("applescript") == "cancelled", (report["seconds"], statuses))
+
+        reloader.forget()
+        reloader, runner = coordinator_with({"applescript": (0.3, 0), "bundle-id": (0.3, 0), "signal": (0, 0)},
+                                            hedge=0.05)
+        report = reloader.reload()
+        check("signal is not raced", report["strategy"] == "applescript" and "signal" not in runner.calls,
+              (report["strategy"], runner.calls))
+
+        reloader.forget()
+        reloader, runner = coordinator_with({"applescript": (0, 1), "bundle-id": (0.1, 1), "signal": (0, 0)},
+                                            hedge=0.05)
+        report = reloader.reload()
+        check("signal only after the rest fail, and not remembered",
+              report["strategy"] == "signal" and runner.calls[-1] == "signal" and reloader.remembered() is None,
+              (report["strategy"], runner.calls, reloader.remembered()))
+
+        reloader, runner = coordinator_with({})
+        report = reloader.reload()
+        check("nothing installed", not report["ok"] and len(report["attempts"]) == len(STRATEGIES)
+              and all(a["status"] == "missing" for a in report["attempts"]), report["attempts"])
+
+        reloader, runner = coordinator_with({"applescript": (5, 0)}, hedge=0.05, timeout=0.2)
+        report = reloader.reload()
+        check("bounded by the timeout", not report["ok"] and report["seconds"] < 1,
+              (report["seconds"], [(a["strategy"], a["status"]) for a in report["attempts"]]))
+
+        reports = []
+        reloader, runner = coordinator_with({"applescript": (0.1, 0)}, callback=reports.append)
+        started = [reloader.request() for _ in range(3)]
+        reloader.wait(2)
+        check("requests collapse into one rerun", started == [True, False, False] and len(reports) == 2,
+              (started, len(reports)))
+
+        reports = []
+        reloader, runner = coordinator_with({"applescript": (5, 0)}, callback=reports.append, hedge=10, timeout=10)
+        reloader.request()
+        finished = reloader.finish(0.05)
+        check("exit cancels a slow reload", not finished and reloader.wait(1) and reports
+              and reports[0]["attempts"][0]["status"] == "cancelled", (finished, reports))
+    return checks
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ask iTerm2 to reload its dynamic profiles")
+    parser.add_argument("--forget", action="store_true", help="forget the remembered strategy first")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    parser.add_argument("--self-test", action="store_true",
+                        help="check the coordinator against a fake runner; runs nothing")
+    args = parser.parse_args(argv)
+
+    if args.self_test:
+        checks = self_test()
+        for name, passed, detail in checks:
+            print(f"{'✅' if passed else '❌'} {name}" + ("" if passed else f": {detail}"))
+        return 0 if all(passed for _, passed, _ in checks) else 1
+
+    reloader = ReloadCoordinator(callback=None)
+    if args.forget:
+        reloader.forget()
+    report = reloader.reload()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0 if report["ok"] else 1
+    for attempt in report["attempts"]:
+        mark = "✅" if attempt["status"] == "ok" else "⚠️ "
+        print(f"{mark} {attempt['strategy']:<12} {attempt['status']:<10} {attempt['seconds'] * 1000:7.1f} ms")
+    print_report(report)
+    return 0 if report["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
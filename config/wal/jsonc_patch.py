@@ -0,0 +1,112 @@
+# In-Place JSONC Patcher
+# Zed's settings.json is JSONC (comments and trailing commas allowed), so it
+# cannot go through json.load/json.dumps without losing the user's
+# formatting. set_member() scans the text token by token, stops at the
+# top-level key it is after and splices in a new value, leaving every other
+# byte (comments, indentation, key order) untouched.
+
+import json
+import re
+
+TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<punct>[{}\[\]:,])
+  | (?P<literal>[^\s{}\[\]:,"/]+)
+''', re.VERBOSE | re.DOTALL)
+
+DEFAULT_INDENT = "    "
+
+class JSONCError(ValueError):
+    """Text that is not a JSONC object the patcher can edit"""
+
+def tokens(text, pos=0):
+    """Yield (kind, start, end) for every significant token, skipping whitespace and comments"""
+    end = len(text)
+    while pos < end:
+        match = TOKEN.match(text, pos)
+        if not match:
+            raise JSONCError(f"unexpected {text[pos:pos + 20]!r} at offset {pos}")
+        kind = match.lastgroup
+        if kind not in ("space", "comment"):
+            yield kind, match.start(), match.end()
+        pos = match.end()
+
+def _skip_value(stream, kind, start, end, text):
+    """Consume one value whose first token was just read; returns its end offset"""
+    if kind in ("string", "literal"):
+        return end
+    if text[start] not in "{[":
+        raise JSONCError(f"expected a value at offset {start}")
+    depth = 1
+    for kind, start, end in stream:
+        if kind == "punct" and text[start] in "{[":
+            depth += 1
+        elif kind == "punct" and text[start] in "}]":
+            depth -= 1
+            if depth == 0:
+                return end
+    raise JSONCError("unterminated object or array")
+
+def find_member(text, key):
+    """(start, end) of the value of a top-level key, None if absent, and the opening brace offset"""
+    stream = tokens(text)
+    first = next(stream, None)
+    if first is None or text[first[1]] != "{":
+        raise JSONCError("expected a top-level object")
+
+    expect_key = True
+    for kind, start, end in stream:
+        if kind == "punct" and text[start] == "}":
+            return None, first[1]
+        if kind == "punct" and text[start] == ",":
+            expect_key = True
+            continue
+        if not expect_key or kind != "string":
+            raise JSONCError(f"expected a key at offset {start}")
+        name = json.loads(text[start:end])
+        colon = next(stream, None)
+        if colon is None or text[colon[1]] != ":":
+            raise JSONCError(f"expected ':' after {name!r}")
+        value = next(stream, None)
+        if value is None:
+            break
+        value_end = _skip_value(stream, *value, text)
+        if name == key:
+            return (value[1], value_end), first[1]
+        expect_key = False
+    raise JSONCError("unterminated top-level object")
+
+def _member_indent(text, brace):
+    """Indentation of the first line inside the top-level object"""
+    match = re.compile(r'[ \t]*\n([ \t]*)\S').match(text, brace + 1)
+    return match.group(1) if match and match.group(1) else DEFAULT_INDENT
+
+def set_member(text, key, value):
+    """Text with a top-level key set to value; the same text if it already holds it
+
+    An existing value is replaced in place; a missing key is added as the
+    first member, indented like the others.
+    """
+    span, brace = find_member(text, key)
+    encoded = json.dumps(value)
+    name = json.dumps(key)
+    if span is not None:
+        start, end = span
+        try:
+            if json.loads(text[start:end]) == value:
+                return text
+        except ValueError:
+            pass
+        return text[:start] + encoded + text[end:]
+
+    indent = _member_indent(text, brace)
+    rest = tokens(text, brace + 1)
+    following = next(rest, None)
+    if following is None:
+        raise JSONCError("unterminated top-level object")
+    if text[following[1]] == "}":
+        closing = following[1]
+        return f"{text[:brace + 1]}\n{indent}{name}: {encoded}\n{text[closing:]}"
+    return f"{text[:brace + 1]}\n{indent}{name}: {encoded},{text[brace + 1:]}"
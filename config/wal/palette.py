@@ -0,0 +1,159 @@
+# Shared Pywal Palette Types
+# Compact Color value type and palette loader used by update_zed.py and
+# scripts/update_iterm2.py, so each color is parsed exactly once per run
+
+import json
+import os
+
+def colors_file():
+    """Path of the pywal colors.json cache"""
+    return os.path.expanduser("~/.cache/wal/colors.json")
+
+def linearize(c):
+    """sRGB channel (0-1 range) to linear light"""
+    if c <= 0.03928:
+        return c / 12.92
+    else:
+        return pow((c + 0.055) / 1.055, 2.4)
+
+# Colors are 8-bit, so every channel's linear value comes from this table
+SRGB_TO_LINEAR = [linearize(i / 255.0) for i in range(256)]
+
+class Color:
+    """Immutable sRGB color packed into a single 0xRRGGBB integer
+
+    RGB, linear RGB, luminance and hex forms are computed on first use
+    and cached on the instance.
+    """
+
+    __slots__ = ('value', '_rgb', '_linear', '_luminance', '_hex')
+
+    def __init__(self, value):
+        object.__setattr__(self, 'value', int(value) & 0xffffff)
+        object.__setattr__(self, '_rgb', None)
+        object.__setattr__(self, '_linear', None)
+        object.__setattr__(self, '_luminance', None)
+        object.__setattr__(self, '_hex', None)
+
+    @classmethod
+    def from_hex(cls, hex_color):
+        """Parse '#rrggbb' (an alpha suffix is ignored)"""
+        return cls(int(hex_color.lstrip('#')[:6], 16))
+
+    @classmethod
+    def from_rgb(cls, rgb):
+        """Build from an RGB tuple (0-1 range), truncating like the generators do"""
+        r, g, b = (int(min(1.0, max(0.0, c)) * 255) for c in rgb)
+        return cls((r << 16) | (g << 8) | b)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Color is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Color is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Color) and other.value == self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return f"Color('{self.hex}')"
+
+    def __str__(self):
+        return self.hex
+
+    @property
+    def rgb(self):
+        """RGB tuple (0-1 range)"""
+        if self._rgb is None:
+            v = self.value
+            object.__setattr__(self, '_rgb', ((v >> 16) / 255.0, ((v >> 8) & 0xff) / 255.0, (v & 0xff) / 255.0))
+        return self._rgb
+
+    @property
+    def linear(self):
+        """Linear-light RGB tuple"""
+        if self._linear is None:
+            v = self.value
+            object.__setattr__(self, '_linear', (SRGB_TO_LINEAR[v >> 16], SRGB_TO_LINEAR[(v >> 8) & 0xff],
+                                                 SRGB_TO_LINEAR[v & 0xff]))
+        return self._linear
+
+    @property
+    def luminance(self):
+        """Relative luminance (WCAG)"""
+        if self._luminance is None:
+            r, g, b = self.linear
+            object.__setattr__(self, '_luminance', 0.2126 * r + 0.7152 * g + 0.0722 * b)
+        return self._luminance
+
+    @property
+    def hex(self):
+        """Lowercase '#rrggbb' string"""
+        if self._hex is None:
+            object.__setattr__(self, '_hex', '#{:06x}'.format(self.value))
+        return self._hex
+
+def as_color(value):
+    """Coerce a Color or hex string to a Color"""
+    if isinstance(value, Color):
+        return value
+    return Color.from_hex(value)
+
+class Palette:
+    """Parsed pywal palette with per-palette interned Color instances"""
+
+    def __init__(self, data):
+        self.data = data
+        self._interned = {}
+        self._by_hex = {}
+
+        special = data['special']
+        self.background = self.intern(special['background'])
+        self.foreground = self.intern(special['foreground'])
+        self.cursor = self.intern(special.get('cursor', special['foreground']))
+        # Missing entries stay as None so indices keep matching colorN
+        self.colors = [
+            self.intern(data['colors'][f'color{i}']) if f'color{i}' in data['colors'] else None
+            for i in range(16)
+        ]
+
+    @classmethod
+    def load(cls, path=None):
+        """Read and parse colors.json (defaults to the pywal cache)"""
+        with open(path or colors_file(), 'r') as f:
+            return cls(json.load(f))
+
+    def intern(self, value):
+        """Return the palette's shared Color for a hex string, int or Color"""
+        if isinstance(value, str):
+            color = self._by_hex.get(value)
+            if color is None:
+                color = self.intern(Color.from_hex(value))
+                self._by_hex[value] = color
+            return color
+        key = value.value if isinstance(value, Color) else int(value)
+        color = self._interned.get(key)
+        if color is None:
+            color = value if isinstance(value, Color) else Color(key)
+            self._interned[key] = color
+        return color
+
+    def variant(self, background, foreground):
+        """Palette sharing this one's colors, with another background and foreground"""
+        variant = Palette.__new__(Palette)
+        variant.data = dict(self.data, special=dict(self.data['special'],
+                                                    background=background.hex, foreground=foreground.hex))
+        variant._interned = dict(self._interned)
+        variant._by_hex = dict(self._by_hex)
+        variant.background = variant.intern(background)
+        variant.foreground = variant.intern(foreground)
+        variant.cursor = self.cursor
+        variant.colors = self.colors
+        return variant
+
+    def hex_colors(self):
+        """The 16 palette colors as hex strings"""
+        return [c.hex for c in self.colors]
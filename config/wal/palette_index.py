@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+# Nearest-Palette Index
+# Finds wallpapers by color. Each indexed image keeps its 18-color palette
+# (background, foreground, color0-15) as 54 bytes of sRGB in one NumPy
+# array (~/.cache/wal/palette_index.npz); OKLab coordinates are derived
+# from it in bulk when the index is loaded. Queries are brute-force
+# k-nearest-neighbour scans in OKLab: tens of milliseconds for 50,000
+# images, OKLab derivation included.
+#
+#   near --color HEX ...     images whose accents come closest to every given color
+#   near --palette FILE      images whose palette looks like this colors.json
+#   --dark / --light / --max-luminance / --min-luminance filter on the background
+#
+# The index follows the pre-rendered theme store: `update` adds images
+# theme_store.py has rendered since the last run and drops ones it no longer
+# knows. Requires NumPy.
+#
+# Usage: palette_index.py update
+#        palette_index.py near (--color HEX ... | --palette FILE) [-k N] [--dark | --light]
+#                              [--min-luminance L] [--max-luminance L] [--paths] [--json]
+#        palette_index.py status
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from palette import SRGB_TO_LINEAR, as_color
+
+# Rows: background, foreground, color0-15 (the colors create_zed_theme_family() reads)
+SLOTS = 18
+
+# pywal's hue slots (color1-6); color9-14 repeat them brighter
+HUES = slice(3, 9)
+
+# What --color matches against: the hue slots in both brightnesses.
+# color0/7/8/15 are background and foreground grays, not accents
+ACCENTS = np.r_[3:9, 11:17]
+
+# Relative luminance of a background that counts as dark
+DARK_LUMINANCE = 0.18
+
+_LINEAR = np.array(SRGB_TO_LINEAR, dtype=np.float32)
+_LMS = (
+    (0.4122214708, 0.5363325363, 0.0514459929),
+    (0.2119034982, 0.6806995451, 0.1073969566),
+    (0.0883024619, 0.2817188376, 0.6299787005),
+)
+_LAB = (
+    (0.2104542553, 0.7936177850, -0.0040720468),
+    (1.9779984951, -2.4285922050, 0.4505937099),
+    (0.0259040371, 0.7827717662, -0.8086757660),
+)
+
+def index_file():
+    return os.path.expanduser("~/.cache/wal/palette_index.npz")
+
+def rgb8(color):
+    """(r, g, b) bytes of a Color or hex string"""
+    v = as_color(color).value
+    return v >> 16, (v >> 8) & 0xff, v & 0xff
+
+def palette_rows(colors):
+    """(18, 3) uint8 array for a pywal colors dict"""
+    special = colors["special"]
+    hexes = [special["background"], special["foreground"]] + [colors["colors"][f"color{i}"] for i in range(16)]
+    return np.array([rgb8(h) for h in hexes], dtype=np.uint8)
+
+def _combine(matrix, channels):
+    return [np.float32(row[0]) * channels[0] + np.float32(row[1]) * channels[1] + np.float32(row[2]) * channels[2]
+            for row in matrix]
+
+def oklab(rgb):
+    """OKLab planes (L, a, b) for a uint8 array of shape (..., 3); result has shape (3, ...)
+
+    Planar, with the 3x3 products spelled out: NumPy's matmul is slow for
+    an inner dimension of 3, and every query reads one plane at a time.
+    """
+    linear = _LINEAR.take(np.ascontiguousarray(np.moveaxis(rgb, -1, 0)))
+    lms = [np.cbrt(plane) for plane in _combine(_LMS, linear)]
+    return np.stack(_combine(_LAB, lms))
+
+def luminance(rgb):
+    """WCAG relative luminance for a uint8 array of shape (..., 3)"""
+    r, g, b = _LINEAR.take(np.moveaxis(rgb, -1, 0))
+    return np.float32(0.2126) * r + np.float32(0.7152) * g + np.float32(0.0722) * b
+
+class PaletteIndex:
+    """Image paths and their palettes, array-backed, with k-NN queries"""
+
+    def __init__(self, path=None):
+        self.path = path or index_file()
+        self.paths = []
+        self.digests = []
+        self.colors = np.zeros((0, SLOTS, 3), dtype=np.uint8)
+        self._lab = None
+        self._luminance = None
+        self.load()
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                self.colors = data["colors"]
+                self.paths = bytes(data["paths"]).decode('utf-8').split("\n") if len(data["paths"]) else []
+                self.digests = bytes(data["digests"]).decode('ascii').split("\n") if len(data["digests"]) else []
+        except (OSError, ValueError, KeyError):
+            return
+        if not (len(self.paths) == len(self.digests) == len(self.colors)):
+            self.paths, self.digests = [], []
+            self.colors = np.zeros((0, SLOTS, 3), dtype=np.uint8)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp,
+                 colors=self.colors,
+                 paths=np.frombuffer("\n".join(self.paths).encode('utf-8'), dtype=np.uint8),
+                 digests=np.frombuffer("\n".join(self.digests).encode('ascii'), dtype=np.uint8))
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def lab(self):
+        """(3, N, 18) OKLab planes, derived once per load"""
+        if self._lab is None:
+            self._lab = oklab(self.colors)
+        return self._lab
+
+    @property
+    def background_luminance(self):
+        if self._luminance is None:
+            self._luminance = luminance(self.colors[:, 0])
+        return self._luminance
+
+    def _changed(self):
+        self._lab = None
+        self._luminance = None
+
+    def update(self, entries):
+        """Make the index hold exactly these (path, digest, colors loader) entries
+
+        Paths already indexed with the same digest keep their row; only new
+        or changed images have their colors loaded. Returns (added, removed).
+        """
+        wanted = {path: (digest, loader) for path, digest, loader in entries}
+        keep = [i for i, path in enumerate(self.paths)
+                if path in wanted and wanted[path][0] == self.digests[i]]
+        kept = {self.paths[i] for i in keep}
+        removed = len(self.paths) - len(keep)
+
+        new_paths, new_digests, new_rows = [], [], []
+        for path, (digest, loader) in wanted.items():
+            if path in kept:
+                continue
+            try:
+                rows = palette_rows(loader())
+            except (OSError, ValueError, KeyError):
+                continue
+            new_paths.append(path)
+            new_digests.append(digest)
+            new_rows.append(rows)
+
+        if not removed and not new_rows:
+            return 0, 0
+        self.paths = [self.paths[i] for i in keep] + new_paths
+        self.digests = [self.digests[i] for i in keep] + new_digests
+        self.colors = np.concatenate([self.colors[keep]] + ([np.stack(new_rows)] if new_rows else []))
+        self._changed()
+        return len(new_rows), removed
+
+    def mask(self, min_luminance=None, max_luminance=None):
+        """Rows whose background luminance is within bounds"""
+        lum = self.background_luminance
+        keep = np.ones(len(lum), dtype=bool)
+        if min_luminance is not None:
+            keep &= lum >= min_luminance
+        if max_luminance is not None:
+            keep &= lum <= max_luminance
+        return keep
+
+    def color_distances(self, hex_colors):
+        """Per image: summed OKLab distance from each query color to its closest accent"""
+        query = oklab(np.array([rgb8(h) for h in hex_colors], dtype=np.uint8))  # (3, Q)
+        accents = self.lab[:, :, ACCENTS]  # (3, N, 12)
+        total = np.zeros(len(self), dtype=np.float32)
+        for q in query.T:
+            squared = sum((accents[c] - q[c]) ** 2 for c in range(3))
+            total += np.sqrt(squared.min(axis=1))
+        return total
+
+    def palette_distances(self, colors):
+        """Per image: background and foreground distance plus a symmetric hue-set distance"""
+        target = oklab(palette_rows(colors))  # (3, 18)
+        lab = self.lab
+
+        def distance(slot):
+            return np.sqrt(sum((lab[c][:, slot] - target[c][slot]) ** 2 for c in range(3)))
+
+        # Hue slots are matched as sets: pywal's slot order is not meaningful
+        hues = lab[:, :, HUES]  # (3, N, 6)
+        pairs = np.sqrt(sum((hues[c][:, :, None] - target[c][HUES][None, None, :]) ** 2
+                            for c in range(3)))  # (N, 6, 6)
+        hue_distance = (pairs.min(axis=2).mean(axis=1) + pairs.min(axis=1).mean(axis=1)) / 2
+        return distance(0) + distance(1) + 2 * hue_distance
+
+    def nearest(self, distances, k=10, mask=None):
+        """[(path, distance, row)] for the k smallest distances among rows in mask"""
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(distances))
+        if not len(rows):
+            return []
+        candidates = distances[rows]
+        k = min(k, len(rows))
+        best = np.argpartition(candidates, k - 1)[:k]
+        best = best[np.argsort(candidates[best], kind='stable')]
+        return [(self.paths[rows[i]], float(candidates[i]), rows[i]) for i in best]
+
+def store_entries():
+    """(path, digest, colors loader) for every complete theme store image"""
+    from theme_store import StoreEntry, ThemeStore
+
+    store = ThemeStore()
+    entries = []
+    for path, record in store.index["images"].items():
+        entry = StoreEntry(store.root, record["digest"])
+        if not os.path.exists(entry.artifact_path("colors")):
+            continue
+
+        def loader(entry=entry):
+            return json.loads(entry.read("colors"))
+        entries.append((path, record["digest"], loader))
+    return entries
+
+def update_index(index=None):
+    """Bring the index in line with the theme store; returns (added, removed)"""
+    index = index or PaletteIndex()
+    added, removed = index.update(store_entries())
+    if added or removed:
+        index.save()
+    return added, removed
+
+def swatch(rgb_rows):
+    blocks = [f"\033[48;2;{r};{g};{b}m  \033[0m" for r, g, b in rgb_rows.tolist()]
+    return blocks[0] + " " + "".join(blocks[3:9])
+
+def load_query_palette(path):
+    """colors dict for a colors.json, or a stored/extracted palette for an image"""
+    if path.endswith(".json"):
+        with open(path, 'r') as f:
+            return json.load(f)
+    from theme_store import ThemeStore, extract_colors
+    entry = ThemeStore().lookup(path)
+    if entry is not None:
+        return json.loads(entry.read("colors"))
+    return extract_colors(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find wallpapers by palette")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("update", help="index images the theme store has rendered")
+    near = sub.add_parser("near", help="nearest palettes to colors or a palette")
+    group = near.add_mutually_exclusive_group(required=True)
+    group.add_argument("--color", action="append", help="accent color to look for (repeatable)")
+    group.add_argument("--palette", help="colors.json or image whose palette to match")
+    near.add_argument("-k", type=int, default=10, help="results (default: 10)")
+    shade = near.add_mutually_exclusive_group()
+    shade.add_argument("--dark", action="store_true", help="dark backgrounds only")
+    shade.add_argument("--light", action="store_true", help="light backgrounds only")
+    near.add_argument("--min-luminance", type=float, help="minimum background luminance (0-1)")
+    near.add_argument("--max-luminance", type=float, help="maximum background luminance (0-1)")
+    near.add_argument("--paths", action="store_true", help="print paths only, e.g. for setwal")
+    near.add_argument("--json", action="store_true", help="print results as JSON")
+    sub.add_parser("status", help="summarize the index")
+    args = parser.parse_args(argv)
+
+    index = PaletteIndex()
+
+    if args.command == "update":
+        start = time.monotonic()
+        added, removed = update_index(index)
+        print(f"🗂  {added} added, {removed} removed, {len(index)} images indexed "
+              f"in {(time.monotonic() - start) * 1000:.0f} ms")
+        return 0
+
+    if args.command == "near":
+        if not len(index):
+            print("❌ Palette index is empty (run theme_store.py render, then palette_index.py update)")
+            return 1
+        start = time.monotonic()
+        try:
+            if args.color:
+                distances = index.color_distances(args.color)
+            else:
+                distances = index.palette_distances(load_query_palette(args.palette))
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            print(f"❌ {e}")
+            return 1
+        low, high = args.min_luminance, args.max_luminance
+        if args.dark:
+            high = DARK_LUMINANCE if high is None else min(high, DARK_LUMINANCE)
+        if args.light:
+            low = DARK_LUMINANCE if low is None else max(low, DARK_LUMINANCE)
+        results = index.nearest(distances, args.k, index.mask(low, high))
+        elapsed = time.monotonic() - start
+
+        if args.paths:
+            for path, _, _ in results:
+                print(path)
+        elif args.json:
+            print(json.dumps([{"path": path, "distance": round(d, 4)} for path, d, _ in results], indent=2))
+        else:
+            for rank, (path, distance, row) in enumerate(results, 1):
+                print(f"{rank:>3}. {swatch(index.colors[row])}  {distance:6.3f}  {path}")
+            print(f"⏱  {len(index)} palettes searched in {elapsed * 1000:.1f} ms")
+        return 0 if results else 1
+
+    dark = int((index.background_luminance <= DARK_LUMINANCE).sum()) if len(index) else 0
+    print(f"🗂  Palette index: {index.path}")
+    print(f"   {len(index)} images, {dark} dark / {len(index) - dark} light, "
+          f"{index.colors.nbytes // max(len(index), 1)} bytes of colors each")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+# Pywal Palette Watcher
+# Waits for ~/.cache/wal/colors.json to change and regenerates the Zed theme
+# and iTerm2 profile in-process. Replaces the 5-second osascript polling loop
+# in scripts/wallpaper_monitor.sh. Regeneration goes through
+# theme_scheduler.py, so a burst of changes (or a setwal in progress) costs
+# one run.
+#
+# Event sources (picked automatically, or with --source / PYWAL_WATCH_SOURCE):
+#   inotify  Linux kernel notifications (ctypes, no extra dependencies)
+#   kqueue   macOS/BSD vnode notifications, the stdlib route to FSEvents-style updates
+#   poll     stat() polling with adaptive backoff, works everywhere
+#
+# Usage: palette_watcher.py [--source inotify|kqueue|poll] [--path FILE] [--once] [--dry-run]
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from palette import colors_file
+from timings import append_line
+
+LOG_FILE = os.path.expanduser("~/.cache/wal/monitor.log")
+
+# The log rotates instead of growing forever
+LOG_MAX_BYTES = 256 * 1024
+
+def log_message(message):
+    """Append a timestamped line to the monitor log"""
+    append_line(LOG_FILE, f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", LOG_MAX_BYTES)
+
+def file_signature(path):
+    """Cheap change signature for a file, None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+class PollingSource:
+    """stat() polling with adaptive backoff
+
+    Starts at min_interval, doubles after every quiet poll up to
+    max_interval, and drops back to min_interval after a change.
+    """
+
+    name = "poll"
+
+    def __init__(self, path, min_interval=0.25, max_interval=5.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._last = file_signature(path)
+
+    def wait(self, timeout=None):
+        """Block for one poll interval; True if the file changed"""
+        delay = self.interval if timeout is None else min(self.interval, timeout)
+        time.sleep(delay)
+        current = file_signature(self.path)
+        if current != self._last:
+            self._last = current
+            self.interval = self.min_interval
+            return True
+        self.interval = min(self.interval * 2, self.max_interval)
+        return False
+
+    def close(self):
+        pass
+
+class InotifySource:
+    """Linux inotify watch on the directory holding the file"""
+
+    name = "inotify"
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+
+        self.path = path
+        self.filename = os.path.basename(path).encode()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout=None):
+        """Block until an event for the file arrives; True if one did"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name == self.filename:
+                    changed = True
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class KqueueSource:
+    """kqueue vnode watch on the file and its directory (macOS/BSD)"""
+
+    name = "kqueue"
+
+    # O_EVTONLY lets the watch exist without keeping the volume busy on macOS
+    O_EVTONLY = getattr(os, 'O_EVTONLY', 0x8000 if sys.platform == 'darwin' else os.O_RDONLY)
+
+    def __init__(self, path):
+        if not hasattr(select, 'kqueue'):
+            raise OSError("kqueue is not available")
+
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.kq = select.kqueue()
+        self.dir_fd = os.open(directory, self.O_EVTONLY)
+        self.file_fd = None
+        self._arm()
+
+    def _arm(self):
+        """(Re)register the directory and, if present, the file itself"""
+        if self.file_fd is not None:
+            os.close(self.file_fd)
+            self.file_fd = None
+        try:
+            self.file_fd = os.open(self.path, self.O_EVTONLY)
+        except OSError:
+            pass
+
+        flags = select.KQ_EV_ADD | select.KQ_EV_CLEAR
+        fflags = (select.KQ_NOTE_WRITE | select.KQ_NOTE_DELETE |
+                  select.KQ_NOTE_RENAME | select.KQ_NOTE_EXTEND)
+        events = [select.kevent(self.dir_fd, filter=select.KQ_FILTER_VNODE, flags=flags, fflags=fflags)]
+        if self.file_fd is not None:
+            events.append(select.kevent(self.file_fd, filter=select.KQ_FILTER_VNODE, flags=flags, fflags=fflags))
+        self.kq.control(events, 0)
+
+    def wait(self, timeout=None):
+        """Block until the file or its directory changes; True if it did"""
+        events = self.kq.control(None, 4, timeout)
+        if not events:
+            return False
+        # The file may have been replaced; follow the new inode
+        self._arm()
+        return True
+
+    def close(self):
+        if self.file_fd is not None:
+            os.close(self.file_fd)
+        os.close(self.dir_fd)
+        self.kq.close()
+
+SOURCES = {
+    "inotify": InotifySource,
+    "kqueue": KqueueSource,
+    "poll": PollingSource,
+}
+
+def select_source(path, kind=None):
+    """Create the requested event source, or the best one for this platform"""
+    kind = kind or os.environ.get("PYWAL_WATCH_SOURCE")
+    if kind:
+        if kind not in SOURCES:
+            raise ValueError(f"unknown event source: {kind}")
+        return SOURCES[kind](path)
+
+    candidates = ["kqueue"] if hasattr(select, 'kqueue') else []
+    if sys.platform.startswith('linux'):
+        candidates.append("inotify")
+    for candidate in candidates:
+        try:
+            return SOURCES[candidate](path)
+        except OSError:
+            continue
+    return PollingSource(path)
+
+def watch(path, on_change, source=None, settle=0.1, once=False):
+    """Call on_change() whenever the watched file settles into new content"""
+    source = source or select_source(path)
+    last = file_signature(path)
+    try:
+        while True:
+            if not source.wait(timeout=60):
+                continue
+            # Let the writer finish before reading
+            time.sleep(settle)
+            current = file_signature(path)
+            if current is None or current == last:
+                continue
+            last = current
+            on_change()
+            if once:
+                return
+    finally:
+        source.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate pywal themes when colors.json changes")
+    parser.add_argument("--source", choices=sorted(SOURCES), help="event source (default: best available)")
+    parser.add_argument("--path", help="file to watch (default: ~/.cache/wal/colors.json)")
+    parser.add_argument("--once", action="store_true", help="exit after the first change")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without regenerating")
+    args = parser.parse_args(argv)
+
+    path = args.path or colors_file()
+    source = select_source(path, args.source)
+
+    def on_change():
+        if args.dry_run:
+            print(f"🔔 {path} changed")
+            log_message(f"Change detected ({source.name}): {path}")
+            return
+        from theme_scheduler import ThemeScheduler
+
+        try:
+            result = ThemeScheduler().request()
+        except (OSError, ValueError, KeyError) as e:
+            # Usually a half-written file; the next event will retry
+            log_message(f"Could not read palette: {e}")
+            return
+        if result["status"] != "ran":
+            return
+        summary = ", ".join(f"{r['step']} {'ok' if r['ok'] else 'failed'} ({r['seconds'] * 1000:.0f} ms)"
+                            for r in result["steps"])
+        log_message(f"Palette applied via {source.name} (request {result['request']}): {summary}")
+
+    log_message(f"Starting palette watcher ({source.name}) on {path}")
+    print(f"👀 Watching {path} ({source.name})")
+    try:
+        watch(path, on_change, source=source, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_message("Palette watcher stopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,108 +3,52 @@
 # iTerm2 Dynamic Color Profile Script
 # This script creates an iTerm2 color profile from pywal colors
 
+import argparse
 import json
 import os
 import sys
 
-def hex_to_rgb(hex_color):
-    """Convert hex color to RGB tuple (0-1 range)"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) / 255.0 for i in (0, 2, 4))
-
-def calculate_luminance(rgb):
-    """Calculate the relative luminance of a color"""
-    def linearize(c):
-        if c <= 0.03928:
-            return c / 12.92
-        else:
-            return pow((c + 0.055) / 1.055, 2.4)
-    
-    r, g, b = [linearize(c) for c in rgb]
-    return 0.2126 * r + 0.7152 * g + 0.0722 * b
-
-def find_best_cursor_color(colors, background_rgb):
-    """Find the best cursor color that contrasts well with background"""
-    bg_luminance = calculate_luminance(background_rgb)
-    best_color = None
-    best_contrast = 0
-    
-    # Check all available colors for best contrast
-    candidates = []
-    
-    # Add foreground color as primary candidate
-    if 'foreground' in colors['special']:
-        fg_rgb = hex_to_rgb(colors['special']['foreground'])
-        candidates.append(('foreground', fg_rgb))
-    
-    # Add bright colors (usually better for cursor)
-    for i in range(8, 16):  # Bright colors
-        color_key = f'color{i}'
-        if color_key in colors['colors']:
-            color_rgb = hex_to_rgb(colors['colors'][color_key])
-            candidates.append((color_key, color_rgb))
-    
-    # Add regular colors but skip very dark ones
-    for i in range(1, 8):  # Skip color0 (often black)
-        color_key = f'color{i}'
-        if color_key in colors['colors']:
-            color_rgb = hex_to_rgb(colors['colors'][color_key])
-            color_luminance = calculate_luminance(color_rgb)
-            # Only consider colors that aren't too dark
-            if color_luminance > 0.1:  # Avoid very dark colors
-                candidates.append((color_key, color_rgb))
-    
-    # Find color with best contrast
-    for name, rgb in candidates:
-        luminance = calculate_luminance(rgb)
-        # Calculate contrast ratio
-        if bg_luminance > luminance:
-            contrast = (bg_luminance + 0.05) / (luminance + 0.05)
-        else:
-            contrast = (luminance + 0.05) / (bg_luminance + 0.05)
-        
-        if contrast > best_contrast:
-            best_contrast = contrast
-            best_color = rgb
-    
-    # Fallback to foreground color if no good contrast found
-    if best_color is None and 'foreground' in colors['special']:
-        best_color = hex_to_rgb(colors['special']['foreground'])
-    
-    # Ultimate fallback to white
-    if best_color is None:
-        best_color = (1.0, 1.0, 1.0)
-    
-    return best_color
+# Shared palette types live one level up, next to update_zed.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def create_iterm_profile():
-    """Create iTerm2 dynamic profile from wal colors"""
-    
-    # Read wal colors
-    wal_colors_file = os.path.expanduser("~/.cache/wal/colors.json")
-    
-    if not os.path.exists(wal_colors_file):
-        print("Error: wal colors file not found. Run 'wal -i <image>' first.")
-        sys.exit(1)
-    
-    with open(wal_colors_file, 'r') as f:
-        colors = json.load(f)
+from artifact_writer import write_artifact
+from contrast import contrast_solution
+from iterm_reload import coordinator
+from palette import Palette, colors_file
+from theme_cache import ThemeCache, cache_enabled, palette_digest
+from terminal_push import push_enabled, push_palette
+from theme_variants import theme_variants
+from timings import stage, trace
+
+# Theme variants that also get an iTerm2 profile
+ITERM_VARIANTS = ("dark", "light")
+
+def iterm_profile_file():
+    """Where the iTerm2 dynamic profile is installed"""
+    return os.path.expanduser("~/Library/Application Support/iTerm2/DynamicProfiles/pywal.json")
+
+def build_profile_entry(palette, name="Pywal", guid="pywal-generated", target=None, announce=True):
+    """Build one profile of the dynamic profile file for a palette"""
     
+    # Text colors are lifted to the target contrast ratio against the background
+    solution = contrast_solution(palette, target)
+
     # Convert colors to RGB
-    bg_rgb = hex_to_rgb(colors['special']['background'])
-    fg_rgb = hex_to_rgb(colors['special']['foreground'])
-    
-    # Simple fix: always use foreground color for cursor (never black)
-    cursor_rgb = fg_rgb
-    
-    print(f"📍 Cursor color set to foreground: {colors['special']['foreground']} (always visible)")
+    bg_rgb = palette.background.rgb
+    fg_rgb = palette.intern(solution.foreground).rgb
+
+    cursor = solution.cursor()
+    cursor_rgb = cursor.rgb
+
+    if announce:
+        print(f"📍 Cursor color: {cursor.hex} (contrast {solution.target:g}:1 or best available)")
     
     # Create the profile with transparency and visual effects
     profile = {
         "Profiles": [
             {
-                "Name": "Pywal",
-                "Guid": "pywal-generated",
+                "Name": name,
+                "Guid": guid,
                 "Dynamic Profile Parent Name": "Default",
                 
                 # Window transparency and effects
@@ -158,30 +102,14 @@ def create_iterm_profile():
         ]
     }
     
-    # Add ANSI colors with smart dark color handling
-    for i in range(16):
-        color_key = f"color{i}"
-        if color_key in colors['colors']:
-            rgb = hex_to_rgb(colors['colors'][color_key])
-            
-            # For color0 (often black), check if it's too dark and adjust if needed
-            if i == 0:
-                luminance = calculate_luminance(rgb)
-                bg_luminance = calculate_luminance(bg_rgb)
-                
-                # If color0 is too similar to background, use a slightly lighter version
-                if abs(luminance - bg_luminance) < 0.1:  # Too similar
-                    # Create a slightly lighter version that maintains contrast
-                    if bg_luminance < 0.5:  # Dark background
-                        rgb = (min(rgb[0] + 0.2, 1.0), min(rgb[1] + 0.2, 1.0), min(rgb[2] + 0.2, 1.0))
-                    else:  # Light background  
-                        rgb = (max(rgb[0] - 0.2, 0.0), max(rgb[1] - 0.2, 0.0), max(rgb[2] - 0.2, 0.0))
-                    
-                    adjusted_hex = '#{:02x}{:02x}{:02x}'.format(
-                        int(rgb[0] * 255), int(rgb[1] * 255), int(rgb[2] * 255)
-                    )
-                    print(f"⚠️  Adjusted color0 for better contrast: {adjusted_hex}")
-            
+    # Add ANSI colors, each lifted to the contrast its terminal role needs
+    adjusted = solution.adjusted()
+    if adjusted and announce:
+        print(f"⚠️  Adjusted for contrast: {', '.join(adjusted)}")
+
+    for i, color in enumerate(palette.colors):
+        if color is not None:
+            rgb = palette.intern(solution.ansi[i]).rgb
             profile["Profiles"][0][f"Ansi {i} Color"] = {
                 "Red Component": rgb[0],
                 "Green Component": rgb[1], 
@@ -190,42 +118,105 @@ def create_iterm_profile():
                 "Alpha Component": 1
             }
     
-    # Write the profile
-    iterm_dir = os.path.expanduser("~/Library/Application Support/iTerm2/DynamicProfiles")
-    os.makedirs(iterm_dir, exist_ok=True)
+    return profile["Profiles"][0]
+
+def build_iterm_profile(palette):
+    """Build the iTerm2 dynamic profile dict for a palette
+
+    Besides "Pywal" in the palette's own appearance, the file holds a
+    "Pywal Light" and "Pywal Dark" profile when those theme variants are
+    enabled; they share their palettes with the Zed variants.
+    """
+    profiles = [build_profile_entry(palette)]
+    for variant in theme_variants(palette):
+        if variant.key in ITERM_VARIANTS:
+            profiles.append(build_profile_entry(variant.palette, variant.name, f"pywal-generated-{variant.key}",
+                                                variant.target, announce=False))
+    return {"Profiles": profiles}
+
+
+def serialize_iterm_profile(profile):
+    """Serialize a profile exactly as it is written to disk"""
+    return json.dumps(profile, indent=2).encode('utf-8')
+
+def render_iterm_profile(palette):
+    """Derive and serialize a profile"""
+    with stage("derive"):
+        profile = build_iterm_profile(palette)
+    with stage("serialize"):
+        return serialize_iterm_profile(profile)
+
+def cached_iterm_profile(palette):
+    """Serialized profile for a palette, served from the theme cache when possible"""
+    if not cache_enabled():
+        return render_iterm_profile(palette)
+    
+    cache = ThemeCache()
+    with stage("cache"):
+        digest = palette_digest(palette)
+        data = cache.get(digest, "iterm")
+    if data is not None:
+        print(f"⚡ Using cached iTerm2 profile {digest[:12]}")
+        return data
+    
+    data = render_iterm_profile(palette)
+    cache.put(digest, "iterm", data, {"wallpaper": palette.data.get("wallpaper", "")})
+    return data
+
+def create_iterm_profile(palette=None):
+    """Create iTerm2 dynamic profile from wal colors"""
     
-    profile_file = os.path.join(iterm_dir, "pywal.json")
-    with open(profile_file, 'w') as f:
-        json.dump(profile, f, indent=2)
+    # Read wal colors
+    if palette is None:
+        wal_colors_file = colors_file()
+        
+        if not os.path.exists(wal_colors_file):
+            print("Error: wal colors file not found. Run 'wal -i <image>' first.")
+            sys.exit(1)
+        
+        with stage("palette_load"):
+            palette = Palette.load(wal_colors_file)
+    
+    apply_iterm_profile(cached_iterm_profile(palette), palette)
+
+def apply_iterm_profile(data, palette):
+    """Install profile bytes, then re-theme open terminals
+
+    With pushing on (the default), the palette goes straight to every open
+    terminal as escape sequences and iTerm2 picks the profile file up on
+    its own; otherwise iTerm2 is asked to reload its dynamic profiles.
+    """
+    push = push_enabled()
+    install_iterm_profile(data, reload=not push)
+    if push:
+        with stage("push"):
+            push_palette(palette)
+
+def install_iterm_profile(data, reload=True):
+    """Write serialized profile bytes and ask iTerm2 to reload"""
+    
+    # Write the profile (skipped, along with the reload, when nothing changed)
+    profile_file = iterm_profile_file()
+    with stage("write"):
+        written = write_artifact(profile_file, data)
+    if not written:
+        print(f"iTerm2 profile unchanged: {profile_file}")
+        return
     
     print(f"Created iTerm2 profile with 30% transparency: {profile_file}")
     
-    # Tell iTerm2 to reload (with error handling)
-    try:
-        import subprocess
-        # Try different approaches to reload iTerm2
-        reload_commands = [
-            ['osascript', '-e', 'tell application "iTerm2"', '-e', 'reload dynamic profiles', '-e', 'end tell'],
-            ['osascript', '-e', 'tell application id "com.googlecode.iterm2" to reload dynamic profiles'],
-            ['killall', '-USR1', 'iTerm2']  # Signal approach as fallback
-        ]
-        
-        success = False
-        for cmd in reload_commands:
-            try:
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    print("Reloaded iTerm2 dynamic profiles")
-                    success = True
-                    break
-            except:
-                continue
-        
-        if not success:
-            print("Note: iTerm2 profile created. You may need to manually reload profiles in iTerm2.")
-            
-    except Exception as e:
-        print(f"iTerm2 profile created. Manual reload may be needed: {e}")
+    # Tell iTerm2 to reload, in the background
+    if reload:
+        reload_iterm_profiles()
+
+def reload_iterm_profiles():
+    """Ask a running iTerm2 to pick up the new profile without waiting for it"""
+    coordinator().request()
 
 if __name__ == "__main__":
-    create_iterm_profile()
+    parser = argparse.ArgumentParser(description="Create an iTerm2 dynamic profile from pywal colors")
+    parser.add_argument("--timings", action="store_true", help="print per-stage timings (PYWAL_TIMINGS=1 to only record them)")
+    args = parser.parse_args()
+
+    with trace("iterm", show=args.timings):
+        create_iterm_profile()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Generated zsh Palette Loader
+# Writes ~/.cache/wal/colors.zsh: the terminal escape sequences as one
+# literal `print -n` plus the palette as plain variable assignments (what
+# sequences, colors-tty.sh and colors.sh provide between them), and compiles
+# it with zcompile. A new shell then sources one wordcode file: no `cat`
+# fork and no extra file reads. The file is only rewritten, and recompiled,
+# when the palette changes.
+#
+# Usage: shell_loader.py [--colors FILE]
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from artifact_writer import write_artifact
+from contrast import contrast_solution
+from palette import Palette
+from terminal_push import palette_sequences
+
+COMPILE_TIMEOUT = 5
+
+def loader_file():
+    """Generated loader sourced by load_colors.zsh"""
+    return os.path.expanduser("~/.cache/wal/colors.zsh")
+
+def zsh_quote(value):
+    """Single-quoted zsh word"""
+    return "'" + str(value).replace("'", "'\\''") + "'"
+
+def zsh_ansi_quote(data):
+    """$'...' word printing exactly these bytes"""
+    text = data.decode('ascii')
+    text = text.replace("\\", "\\\\").replace("'", "\\'").replace("\033", "\\e")
+    return f"$'{text}'"
+
+def render_loader(palette):
+    """zsh source for a palette
+
+    The escape sequences, the console palette and the variables all use the
+    contrast-solved colors (contrast.py), so $color1 is the red the terminal
+    actually shows.
+    """
+    solution = contrast_solution(palette)
+    names = ["background", "foreground", "cursor"]
+    values = [palette.background.hex, solution.foreground, solution.cursor().hex]
+    ansi = [None if color is None else solution.ansi[i] for i, color in enumerate(palette.colors)]
+    for i, color in enumerate(ansi):
+        if color is not None:
+            names.append(f"color{i}")
+            values.append(color)
+
+    # The Linux console takes its palette as \e]P<index><rrggbb> (colors-tty.sh)
+    console = "".join(f"\033]P{i:X}{color[1:]}" for i, color in enumerate(ansi) if color is not None) + "\033c"
+
+    lines = [
+        "# Generated by shell_loader.py from the pywal palette; do not edit",
+        f"print -n {zsh_ansi_quote(palette_sequences(palette))}",
+        f"[[ $TERM == linux ]] && print -n {zsh_ansi_quote(console.encode('ascii'))}",
+        "",
+        f"wallpaper={zsh_quote(palette.data.get('wallpaper', ''))}",
+    ]
+    lines += [f"{name}={zsh_quote(value)}" for name, value in zip(names, values)]
+    lines += [
+        "",
+        "export FZF_DEFAULT_OPTS=\"",
+        "    $FZF_DEFAULT_OPTS",
+        "    --color fg:7,bg:0,hl:1,fg+:232,bg+:1,hl+:255",
+        "    --color info:7,prompt:2,spinner:1,pointer:232,marker:1",
+        "\"",
+        "export LS_COLORS=\"${LS_COLORS}:su=30;41:ow=30;42:st=30;44:\"",
+    ]
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+def compile_loader(path):
+    """zcompile path into path.zwc; False if zsh is not available
+
+    Compiled next to a copy in a temp dir and renamed into place, so a
+    shell starting meanwhile never reads a half-written .zwc.
+    """
+    zsh = shutil.which("zsh")
+    if zsh is None:
+        return False
+    directory = os.path.dirname(path)
+    with tempfile.TemporaryDirectory(prefix=".colors-zsh-", dir=directory) as tmp:
+        source = os.path.join(tmp, os.path.basename(path))
+        shutil.copyfile(path, source)
+        result = subprocess.run([zsh, "-f", "-c", 'zcompile "$1"', "zsh", source],
+                                capture_output=True, timeout=COMPILE_TIMEOUT)
+        if result.returncode != 0 or not os.path.exists(source + ".zwc"):
+            return False
+        os.replace(source + ".zwc", path + ".zwc")
+    return True
+
+def install_loader(palette, path=None):
+    """Write and compile the loader if the palette changed; returns True if it was rewritten"""
+    path = path or loader_file()
+    written = write_artifact(path, render_loader(palette))
+    zwc = path + ".zwc"
+    if not written:
+        # load_colors.zsh only trusts the loader while it is newer than
+        # colors.json, which wal may have rewritten with the same palette
+        os.utime(path)
+        if os.path.exists(zwc):
+            os.utime(zwc)
+    # Rewritten, or compiled output missing or stale (e.g. zsh installed since)
+    if written or not os.path.exists(zwc) or os.path.getmtime(zwc) < os.path.getmtime(path):
+        try:
+            compiled = compile_loader(path)
+        except (OSError, subprocess.SubprocessError):
+            compiled = False
+        if not compiled and os.path.exists(zwc):
+            # A stale .zwc would be sourced instead of the new file
+            os.unlink(zwc)
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the zsh palette loader")
+    parser.add_argument("--colors", help="colors.json to use (default: the pywal cache)")
+    args = parser.parse_args(argv)
+
+    try:
+        palette = Palette.load(args.colors)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Cannot load palette: {e}")
+        return 1
+
+    path = loader_file()
+    if install_loader(palette, path):
+        print(f"✅ Shell loader written: {path}")
+    else:
+        print(f"✅ Shell loader unchanged: {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+# Live Terminal Palette Push
+# Re-themes every open terminal in place: the palette is turned into one
+# block of OSC 4 (ANSI colors), 10 (foreground), 11 (background) and 12
+# (cursor) escape sequences, which is written to every pseudo-terminal the
+# user owns at once. No profile reload, no new shell needed.
+#
+# Each tty gets a bounded write (PUSH_TIMEOUT); ttys whose terminal has gone
+# away are skipped, and one stuck terminal cannot hold up the others.
+# PYWAL_TERMINAL_PUSH=0 turns pushing off (iTerm2 profiles are then
+# reloaded as before).
+#
+# Usage: terminal_push.py [--tty PATH ...] [--colors FILE] [--timeout SECONDS] [--dry-run]
+
+import argparse
+import errno
+import glob
+import os
+import select
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from contrast import contrast_solution
+from palette import Palette, colors_file
+
+PUSH_TIMEOUT = 0.25
+MAX_WORKERS = 16
+
+# String terminator ending every OSC sequence, and how long a tty that timed
+# out mid-sequence gets to take one
+ST = b"\033\\"
+TERMINATE_GRACE = 0.05
+
+# Pseudo-terminal slaves on Linux and macOS
+TTY_PATTERNS = ("/dev/pts/[0-9]*", "/dev/ttys[0-9]*")
+
+# Errors meaning nobody is on the other end any more
+DEAD_TTY_ERRORS = (errno.EIO, errno.ENXIO, errno.ENOENT, errno.ENODEV, errno.EACCES, errno.EPERM)
+
+def push_enabled():
+    """Pushing is on unless PYWAL_TERMINAL_PUSH=0"""
+    return os.environ.get("PYWAL_TERMINAL_PUSH", "1") != "0"
+
+def osc(code, value):
+    return f"\033]{code};{value}\033\\"
+
+def palette_sequences(palette):
+    """OSC 4/10/11/12 block for a palette, with the same contrast-solved colors as the profiles"""
+    solution = contrast_solution(palette)
+    parts = [osc(4, f"{i};{color}") for i, color in enumerate(solution.ansi)
+             if palette.colors[i] is not None]
+    parts.append(osc(10, solution.foreground))
+    parts.append(osc(11, palette.background.hex))
+    parts.append(osc(12, solution.cursor().hex))
+    return "".join(parts).encode('ascii')
+
+def user_ttys():
+    """Pseudo-terminals owned by the current user"""
+    uid = os.getuid()
+    ttys = []
+    for pattern in TTY_PATTERNS:
+        for path in glob.glob(pattern):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if stat.S_ISCHR(st.st_mode) and st.st_uid == uid:
+                ttys.append(path)
+    return sorted(ttys)
+
+def terminate_sequence(fd, written):
+    """End the OSC sequence a timed-out write stopped in the middle of
+
+    written is what already went out. Otherwise the terminal would take
+    whatever is printed next as part of the sequence. One bounded attempt;
+    failures are ignored.
+    """
+    if not written or written.endswith(ST):
+        return
+    # A trailing ESC may be the first half of a terminator
+    tail = ST[1:] if written.endswith(ST[:1]) else ST
+    try:
+        _, writable, _ = select.select([], [fd], [], TERMINATE_GRACE)
+        if writable:
+            os.write(fd, tail)
+    except OSError:
+        pass
+
+def write_tty(path, data, timeout=PUSH_TIMEOUT):
+    """Write data to one tty within timeout; returns "ok", "dead" or "timeout"
+
+    A write that times out part way through still ends on a string
+    terminator (see terminate_sequence()).
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno in DEAD_TTY_ERRORS:
+            return "dead"
+        raise
+    try:
+        view = memoryview(data)
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                terminate_sequence(fd, data[:len(data) - len(view)])
+                return "timeout"
+            _, writable, _ = select.select([], [fd], [], remaining)
+            if not writable:
+                terminate_sequence(fd, data[:len(data) - len(view)])
+                return "timeout"
+            try:
+                view = view[os.write(fd, view):]
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                if e.errno in DEAD_TTY_ERRORS:
+                    return "dead"
+                raise
+        return "ok"
+    finally:
+        os.close(fd)
+
+def push(data, ttys=None, timeout=PUSH_TIMEOUT):
+    """Write one sequence block to every tty concurrently; returns a result per tty"""
+    ttys = user_ttys() if ttys is None else list(ttys)
+
+    def one(path):
+        start = time.monotonic()
+        try:
+            status = write_tty(path, data, timeout)
+        except OSError as e:
+            status = f"error: {e.strerror or e}"
+        return {"tty": path, "status": status, "seconds": round(time.monotonic() - start, 4)}
+
+    if not ttys:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(ttys))) as pool:
+        return list(pool.map(one, ttys))
+
+def push_palette(palette, ttys=None, timeout=PUSH_TIMEOUT):
+    """Push a palette to every open terminal and print a one-line summary"""
+    results = push(palette_sequences(palette), ttys, timeout)
+    pushed = sum(1 for r in results if r["status"] == "ok")
+    skipped = len(results) - pushed
+    print(f"🖥  Pushed colors to {pushed} terminal{'s' if pushed != 1 else ''}"
+          + (f" ({skipped} skipped)" if skipped else ""))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Push the pywal palette to every open terminal")
+    parser.add_argument("--tty", action="append", help="push to this tty only (repeatable)")
+    parser.add_argument("--colors", help=f"colors.json to push (default: {colors_file()})")
+    parser.add_argument("--timeout", type=float, default=PUSH_TIMEOUT, help="per-tty write timeout in seconds")
+    parser.add_argument("--dry-run", action="store_true", help="print the escape sequences instead")
+    args = parser.parse_args(argv)
+
+    try:
+        palette = Palette.load(args.colors)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Cannot load palette: {e}")
+        return 1
+
+    data = palette_sequences(palette)
+    if args.dry_run:
+        print(repr(data.decode('ascii')))
+        return 0
+
+    start = time.monotonic()
+    results = push(data, args.tty, args.timeout)
+    for r in results:
+        mark = "✅" if r["status"] == "ok" else "⚠️ "
+        print(f"{mark} {r['tty']:<14} {r['status']:<8} {r['seconds'] * 1000:6.1f} ms")
+    print(f"⏱  {len(results)} ttys in {(time.monotonic() - start) * 1000:.1f} ms")
+    return 0 if all(r["status"] in ("ok", "dead") for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# Content-Addressed Theme Cache
+# Stores rendered Zed theme families and iTerm2 profiles keyed by a digest of
+# the normalized palette, so cycling back to a known wallpaper skips
+# derivation and serialization entirely.
+#
+# Usage: theme_cache.py [list | info <digest> | invalidate [<digest>...] | clear | prune]
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+from contrast import min_contrast
+from theme_variants import variant_names
+
+# Bump whenever update_zed.py or update_iterm2.py change their output
+GENERATOR_VERSION = "3"
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+USAGE = "Usage: theme_cache.py [list | info <digest> | invalidate [<digest>...] | clear | prune]"
+
+def cache_dir():
+    """Root directory of the theme cache"""
+    return os.path.expanduser("~/.cache/wal/themes")
+
+def cache_enabled():
+    """The cache can be bypassed with PYWAL_NO_CACHE=1"""
+    return not os.environ.get("PYWAL_NO_CACHE")
+
+def palette_digest(palette):
+    """Digest of the normalized palette plus the generator version, contrast target and variants"""
+    normalized = {
+        "version": GENERATOR_VERSION,
+        "min_contrast": min_contrast(),
+        "variants": list(variant_names()),
+        "background": palette.background.hex,
+        "foreground": palette.foreground.hex,
+        "colors": [c.hex if c is not None else None for c in palette.colors],
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ThemeCache:
+    """Directory-per-digest artifact store with size-bounded LRU eviction
+
+    Each entry is ~/.cache/wal/themes/<digest>/ holding one file per
+    artifact (e.g. zed.json, iterm.json) and a meta.json. The entry
+    directory's mtime records its last use.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or cache_dir()
+        if max_bytes is None:
+            max_mb = os.environ.get("PYWAL_CACHE_MAX_MB")
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, digest):
+        return os.path.join(self.root, digest)
+
+    def get(self, digest, name):
+        """Return the cached artifact bytes, or None on a miss"""
+        path = os.path.join(self._entry_dir(digest), f"{name}.json")
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Mark as recently used
+        try:
+            os.utime(self._entry_dir(digest))
+        except OSError:
+            pass
+        return data
+
+    def put(self, digest, name, data, meta=None):
+        """Store an artifact and evict old entries if over budget"""
+        entry = self._entry_dir(digest)
+        os.makedirs(entry, exist_ok=True)
+
+        tmp = os.path.join(entry, f".{name}.json.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(entry, f"{name}.json"))
+
+        meta_file = os.path.join(entry, "meta.json")
+        info = {}
+        if os.path.exists(meta_file):
+            try:
+                with open(meta_file, 'r') as f:
+                    info = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                info = {}
+        info.update(meta or {})
+        info.setdefault("created", time.time())
+        info["version"] = GENERATOR_VERSION
+        info.setdefault("artifacts", [])
+        if name not in info["artifacts"]:
+            info["artifacts"].append(name)
+        with open(meta_file, 'w') as f:
+            json.dump(info, f, indent=2)
+
+        self.evict(keep=digest)
+
+    def entries(self):
+        """List entries as dicts, most recently used first"""
+        if not os.path.isdir(self.root):
+            return []
+
+        result = []
+        for digest in os.listdir(self.root):
+            entry = self._entry_dir(digest)
+            if not os.path.isdir(entry):
+                continue
+            size = 0
+            for name in os.listdir(entry):
+                try:
+                    size += os.path.getsize(os.path.join(entry, name))
+                except OSError:
+                    pass
+            meta = {}
+            try:
+                with open(os.path.join(entry, "meta.json"), 'r') as f:
+                    meta = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                pass
+            result.append({
+                "digest": digest,
+                "size": size,
+                "last_used": os.path.getmtime(entry),
+                "meta": meta,
+            })
+
+        result.sort(key=lambda e: e["last_used"], reverse=True)
+        return result
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = self.entries()
+        total = sum(e["size"] for e in entries)
+        removed = []
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry["digest"] == keep:
+                continue
+            shutil.rmtree(self._entry_dir(entry["digest"]), ignore_errors=True)
+            total -= entry["size"]
+            removed.append(entry["digest"])
+        return removed
+
+    def invalidate(self, prefixes=None):
+        """Remove entries matching digest prefixes (all entries if none given)"""
+        removed = []
+        for entry in self.entries():
+            digest = entry["digest"]
+            if prefixes and not any(digest.startswith(p) for p in prefixes):
+                continue
+            shutil.rmtree(self._entry_dir(digest), ignore_errors=True)
+            removed.append(digest)
+        return removed
+
+def format_size(size):
+    """Human readable byte count"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GB"
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "list"
+    cache = ThemeCache()
+
+    if command == "list":
+        entries = cache.entries()
+        total = sum(e["size"] for e in entries)
+        print(f"🗂  Theme cache: {cache.root}")
+        print(f"   {len(entries)} entries, {format_size(total)} of {format_size(cache.max_bytes)}")
+        for e in entries:
+            used = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e["last_used"]))
+            artifacts = ",".join(e["meta"].get("artifacts", []))
+            wallpaper = e["meta"].get("wallpaper", "")
+            print(f"   {e['digest'][:12]}  {used}  {format_size(e['size']):>7}  {artifacts:<10} {wallpaper}")
+        return True
+
+    if command == "info":
+        if len(args) < 2:
+            print("Usage: theme_cache.py info <digest>")
+            return False
+        for e in cache.entries():
+            if e["digest"].startswith(args[1]):
+                print(json.dumps(e, indent=2))
+                return True
+        print(f"❌ No cache entry matching {args[1]}")
+        return False
+
+    if command == "invalidate" and len(args) < 2:
+        print("Usage: theme_cache.py invalidate <digest>...")
+        return False
+
+    if command in ("invalidate", "clear"):
+        removed = cache.invalidate(args[1:] if command == "invalidate" else None)
+        print(f"🧹 Removed {len(removed)} cache entries")
+        return True
+
+    if command == "prune":
+        removed = cache.evict()
+        print(f"🧹 Evicted {len(removed)} cache entries")
+        return True
+
+    print(USAGE)
+    return False
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
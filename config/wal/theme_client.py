@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+# Theme Server Client
+# Sends one request to theme_server.py over its Unix socket and prints the
+# reply. When the server is not running, apply/regenerate/preview run
+# in-process instead, so setwal works the same either way (just slower).
+# Deliberately imports nothing heavy: the fast path is a connect, a write
+# and a read.
+#
+# Usage: theme_client.py apply <image> [--no-store]
+#        theme_client.py regenerate
+#        theme_client.py preview <image|colors.json>
+#        theme_client.py status
+#        theme_client.py stop
+
+import json
+import os
+import socket
+import sys
+
+CONNECT_TIMEOUT = 0.5
+# apply may wait on wal; everything else answers in milliseconds
+REPLY_TIMEOUT = 120
+
+def socket_path():
+    """Unix socket the theme server listens on"""
+    return os.environ.get("PYWAL_SOCKET") or os.path.expanduser("~/.cache/wal/theme.sock")
+
+def send_request(request, path=None, timeout=REPLY_TIMEOUT):
+    """Send a request dict and return the reply dict; raises OSError if the server is down"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(path or socket_path())
+        sock.settimeout(timeout)
+        sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if chunk.endswith(b"\n"):
+                break
+    finally:
+        sock.close()
+    if not chunks:
+        raise ConnectionError("theme server closed the connection")
+    return json.loads(b"".join(chunks))
+
+def run_locally(request):
+    """Handle a request in this process, as the server would"""
+    import asyncio
+    import contextlib
+    import io
+
+    from theme_server import ThemeServer
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(ThemeServer().handle(request))
+
+def swatch(colors):
+    """Truecolor blocks for a preview reply"""
+    def block(hex_color):
+        r, g, b = bytes.fromhex(hex_color.lstrip('#'))
+        return f"\033[48;2;{r};{g};{b}m   \033[0m"
+
+    rows = [colors["colors"][f"color{i}"] for i in range(16)]
+    special = colors["special"]
+    return "\n".join([
+        "".join(block(c) for c in rows[:8]),
+        "".join(block(c) for c in rows[8:]),
+        f"{block(special['background'])} background {special['background']}   "
+        f"{block(special['foreground'])} foreground {special['foreground']}",
+    ])
+
+def print_reply(command, reply):
+    if not reply.get("ok") and reply.get("error"):
+        print(f"❌ {reply['error']}")
+        return
+
+    for r in reply.get("steps", []):
+        mark = "✅" if r["ok"] else "❌"
+        detail = f"  {r['detail']}" if r["detail"] and not r["ok"] else ""
+        print(f"{mark} {r['step']:<10} {r['seconds'] * 1000:8.1f} ms{detail}")
+
+    if command == "preview":
+        print(swatch(reply["colors"]))
+        print(f"🎨 {reply['source']} palette {reply['digest'][:12]}")
+    elif command == "status":
+        print(f"🟢 Theme server pid {reply['pid']}, up {reply['uptime']:.0f}s, "
+              f"{reply['requests']} requests served")
+        print(f"   socket:  {reply['socket']}")
+        print(f"   palette: {reply['palette'] or 'not loaded'}, {reply['rendered']} palettes rendered in memory")
+    elif command == "stop":
+        print("🛑 Theme server stopping")
+
+    if "seconds" in reply:
+        where = "server" if reply.get("server") else "local"
+        print(f"⏱  Total: {reply['seconds'] * 1000:.1f} ms ({where})")
+
+USAGE = "Usage: theme_client.py apply <image> [--no-store] | regenerate | preview <image> | status | stop"
+
+# Command -> whether it takes a path argument
+COMMANDS = {"apply": True, "preview": True, "regenerate": False, "status": False, "stop": False}
+
+def parse_request(args):
+    """Request dict for a command line, or None if it is malformed
+
+    Parsed by hand: argparse alone costs more than a round trip to the server.
+    """
+    flags = [a for a in args[1:] if a.startswith('-')]
+    positional = [a for a in args[1:] if not a.startswith('-')]
+    if not args or args[0] not in COMMANDS or len(positional) != int(COMMANDS[args[0]]):
+        return None
+    if set(flags) - {"--no-store"}:
+        return None
+
+    request = {"cmd": args[0]}
+    if positional:
+        request["image" if args[0] == "apply" else "path"] = os.path.abspath(positional[0])
+    if flags:
+        request["store"] = False
+    return request
+
+def main(argv=None):
+    request = parse_request(list(sys.argv[1:] if argv is None else argv))
+    if request is None:
+        print(USAGE)
+        return 2
+    command = request["cmd"]
+
+    try:
+        reply = send_request(request)
+        reply["server"] = True
+    except (FileNotFoundError, ConnectionRefusedError):
+        # No server listening: fall back to doing the work here
+        if command in ("status", "stop"):
+            print("❌ Theme server is not running")
+            return 1
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        reply = run_locally(request)
+    except (OSError, ValueError) as e:
+        print(f"❌ Theme server request failed: {e}")
+        return 1
+
+    print_reply(command, reply)
+    return 0 if reply.get("ok") else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+# Applied Theme History
+# Every palette that gets installed (setwal, the palette watcher, the theme
+# server) is appended to a SQLite history (~/.cache/wal/history.db): when,
+# from which image (path and sha256), and the colors.json, Zed theme family
+# and iTerm2 profile that were installed. The artifacts themselves are kept
+# once each, content-addressed, under ~/.cache/wal/history/objects/.
+#
+# undo, redo and apply <id> reinstall a recorded theme from those bytes:
+# no extraction, no generation, just the install (under the scheduler lock).
+# History is capped at PYWAL_HISTORY_MAX entries (default 200); the oldest
+# go first, along with artifacts nothing refers to any more.
+#
+# Usage: theme_history.py list [-n N]
+#        theme_history.py undo | redo
+#        theme_history.py apply <id>
+#        theme_history.py record
+#        theme_history.py prune [--keep N]
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from artifact_writer import atomic_write
+from palette import Palette, colors_file
+from theme_cache import palette_digest
+
+DEFAULT_MAX_ENTRIES = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    image TEXT,
+    image_digest TEXT,
+    palette_digest TEXT NOT NULL,
+    colors TEXT NOT NULL,
+    zed TEXT NOT NULL,
+    iterm TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Artifacts each entry refers to, by object digest
+ARTIFACTS = ("colors", "zed", "iterm")
+
+def history_dir():
+    return os.path.expanduser("~/.cache/wal/history")
+
+def history_db():
+    return os.path.expanduser("~/.cache/wal/history.db")
+
+def max_entries():
+    """Retention limit, from PYWAL_HISTORY_MAX"""
+    try:
+        return max(1, int(os.environ.get("PYWAL_HISTORY_MAX", DEFAULT_MAX_ENTRIES)))
+    except ValueError:
+        return DEFAULT_MAX_ENTRIES
+
+def installed_artifacts():
+    """Paths of the installed colors.json, Zed theme family and iTerm2 profile"""
+    from update_iterm2 import iterm_profile_file
+    from update_zed import zed_theme_file
+    return {
+        "colors": colors_file(),
+        "zed": str(zed_theme_file()),
+        "iterm": iterm_profile_file(),
+    }
+
+class HistoryEntry:
+    """One applied theme"""
+
+    __slots__ = ('id', 'created', 'image', 'image_digest', 'palette_digest', 'colors', 'zed', 'iterm')
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+
+class ThemeHistory:
+    """Append-only history of applied themes with an undo/redo cursor"""
+
+    def __init__(self, path=None, objects=None):
+        self.path = path or history_db()
+        self.objects = objects or os.path.join(history_dir(), "objects")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=5)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # Content-addressed artifact objects
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def put_object(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        return digest
+
+    def read_object(self, digest):
+        with open(self.object_path(digest), 'rb') as f:
+            return f.read()
+
+    # Entries and the cursor
+
+    def entry(self, entry_id):
+        row = self.db.execute(f"SELECT {', '.join(HistoryEntry.__slots__)} FROM entries WHERE id = ?",
+                              (entry_id,)).fetchone()
+        return HistoryEntry(row) if row else None
+
+    def entries(self, limit=None):
+        """Newest first"""
+        query = f"SELECT {', '.join(HistoryEntry.__slots__)} FROM entries ORDER BY id DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return [HistoryEntry(row) for row in self.db.execute(query)]
+
+    def current(self):
+        """Id of the entry that is installed now, if it is in the history"""
+        row = self.db.execute("SELECT value FROM state WHERE key = 'current'").fetchone()
+        return int(row[0]) if row else None
+
+    def set_current(self, entry_id):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('current', ?)", (str(entry_id),))
+
+    def neighbour(self, step):
+        """Id of the entry before (step=-1) or after (step=1) the current one"""
+        current = self.current()
+        if current is None:
+            row = self.db.execute("SELECT MAX(id) FROM entries").fetchone()
+            return row[0] if step < 0 else None
+        if step < 0:
+            row = self.db.execute("SELECT MAX(id) FROM entries WHERE id < ?", (current,)).fetchone()
+        else:
+            row = self.db.execute("SELECT MIN(id) FROM entries WHERE id > ?", (current,)).fetchone()
+        return row[0]
+
+    def record(self, palette, zed, iterm, colors=None, image_digest=None):
+        """Append an applied theme and make it current; returns its id
+
+        Recording the theme that is already current is a no-op. Callers hold
+        the scheduler lock, which also keeps the prune from collecting objects
+        another process's record() has just written.
+        """
+        colors = colors if colors is not None else json.dumps(palette.data, indent=4).encode('utf-8')
+        refs = {"colors": self.put_object(colors), "zed": self.put_object(zed), "iterm": self.put_object(iterm)}
+
+        current = self.entry(self.current()) if self.current() is not None else None
+        if current is not None and all(getattr(current, name) == refs[name] for name in ARTIFACTS):
+            return current.id
+
+        image = palette.data.get("wallpaper") or None
+        if image and image_digest is None and os.path.isfile(image):
+            from theme_store import ThemeStore, image_digest as hash_image
+            image_digest = ThemeStore().known_digest(image) or hash_image(image)
+
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO entries (created, image, image_digest, palette_digest, colors, zed, iterm) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), image, image_digest, palette_digest(palette),
+                 refs["colors"], refs["zed"], refs["iterm"]))
+        entry_id = cursor.lastrowid
+        self.set_current(entry_id)
+        self.prune()
+        return entry_id
+
+    def prune(self, keep=None):
+        """Drop the oldest entries beyond keep (never the current one) and unreferenced objects
+
+        Run under the scheduler lock (see record()).
+        """
+        if keep is None:
+            keep = max_entries()
+        current = self.current()
+        with self.db:
+            removed = self.db.execute(
+                "DELETE FROM entries WHERE id NOT IN (SELECT id FROM entries ORDER BY id DESC LIMIT ?) "
+                "AND id IS NOT ?", (keep, current)).rowcount
+        if removed:
+            self.collect_objects()
+        return removed
+
+    def collect_objects(self):
+        """Delete artifact objects no entry refers to"""
+        live = set()
+        for row in self.db.execute("SELECT colors, zed, iterm FROM entries"):
+            live.update(row)
+        if not os.path.isdir(self.objects):
+            return 0
+        removed = 0
+        for prefix in os.scandir(self.objects):
+            if not prefix.is_dir():
+                continue
+            for obj in os.scandir(prefix.path):
+                if obj.name not in live and not obj.name.startswith('.'):
+                    with contextlib.suppress(OSError):
+                        os.unlink(obj.path)
+                        removed += 1
+        return removed
+
+    def install(self, entry_id, set_wallpaper=True):
+        """Reinstall a recorded theme from its stored artifacts; returns step results"""
+        import apply_theme
+        from theme_scheduler import ThemeScheduler, installed_key
+
+        entry = self.entry(entry_id)
+        if entry is None:
+            raise ValueError(f"No history entry {entry_id}")
+        colors, zed, iterm = (self.read_object(getattr(entry, name)) for name in ARTIFACTS)
+        palette = Palette(json.loads(colors))
+
+        async def install_all():
+            emitters = apply_theme.rendered_emitters(zed, iterm)
+            jobs = [apply_theme.regenerate(palette, emitters)]
+            if set_wallpaper and entry.image and os.path.isfile(entry.image):
+                command = apply_theme.default_commands()["wallpaper"]
+                jobs.append(apply_theme.run_command("wallpaper", apply_theme.expand_command(command, entry.image)))
+            done = await asyncio.gather(*jobs)
+            return done[0] + list(done[1:])
+
+        scheduler = ThemeScheduler()
+        with scheduler.locked():
+            # colors.json first, so the watcher sees this palette as already installed
+            start = time.monotonic()
+            atomic_write(colors_file(), colors)
+            scheduler.mark_installed(installed_key(palette))
+            steps = [apply_theme.step_result("colors", True, start, "")]
+            steps += asyncio.run(install_all())
+        self.set_current(entry.id)
+        return steps
+
+def record_installed(palette):
+    """Record the theme that was just installed for palette, read back from where it was installed
+
+    Called by the installers with the scheduler lock held. Errors only warn:
+    a history that cannot be written never fails an apply.
+    """
+    try:
+        installed = {}
+        for name, path in installed_artifacts().items():
+            with open(path, 'rb') as f:
+                installed[name] = f.read()
+        history = ThemeHistory()
+        try:
+            return history.record(palette, installed["zed"], installed["iterm"], installed["colors"])
+        finally:
+            history.close()
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️  Theme history not updated: {e}")
+        return None
+
+def describe(entry, current):
+    mark = "▶" if entry.id == current else " "
+    when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.created))
+    image = os.path.basename(entry.image) if entry.image else "(no image)"
+    return f"{mark} {entry.id:>5}  {when}  {entry.palette_digest[:12]}  {image}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Browse and restore previously applied pywal themes")
+    sub = parser.add_subparsers(dest="command")
+    listing = sub.add_parser("list", help="show the history, newest first")
+    listing.add_argument("-n", type=int, default=20, help="entries to show (default: 20)")
+    sub.add_parser("undo", help="reinstall the theme before the current one")
+    sub.add_parser("redo", help="reinstall the theme after the current one")
+    apply = sub.add_parser("apply", help="reinstall a theme by id")
+    apply.add_argument("id", type=int)
+    sub.add_parser("record", help="record the currently installed theme")
+    prune = sub.add_parser("prune", help="apply the retention limit now")
+    prune.add_argument("--keep", type=int, help=f"entries to keep (default: PYWAL_HISTORY_MAX or {DEFAULT_MAX_ENTRIES})")
+    args = parser.parse_args(argv)
+
+    from theme_scheduler import ThemeScheduler
+
+    history = ThemeHistory()
+    try:
+        if args.command in (None, "list"):
+            current = history.current()
+            entries = history.entries(getattr(args, "n", 20))
+            if not entries:
+                print("No themes recorded yet")
+            for entry in entries:
+                print(describe(entry, current))
+            return 0
+
+        if args.command == "record":
+            try:
+                palette = Palette.load()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"❌ Cannot load palette: {e}")
+                return 1
+            with ThemeScheduler().locked():
+                entry_id = record_installed(palette)
+            if entry_id is None:
+                return 1
+            print(f"📝 Recorded as {entry_id}")
+            return 0
+
+        if args.command == "prune":
+            with ThemeScheduler().locked():
+                removed = history.prune(args.keep)
+            print(f"🧹 Removed {removed} entries")
+            return 0
+
+        if args.command == "apply":
+            target = args.id
+        else:
+            target = history.neighbour(-1 if args.command == "undo" else 1)
+            if target is None:
+                print(f"Nothing to {args.command}")
+                return 1
+
+        start = time.monotonic()
+        try:
+            # The emitters' status lines would bury the summary
+            with contextlib.redirect_stdout(io.StringIO()):
+                steps = history.install(target)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            return 1
+        ok = all(s["ok"] for s in steps)
+        for s in steps:
+            mark = "✅" if s["ok"] else "❌"
+            detail = f"  {s['detail']}" if s["detail"] and not s["ok"] else ""
+            print(f"{mark} {s['step']:<10} {s['seconds'] * 1000:8.1f} ms{detail}")
+        print(describe(history.entry(target), history.current()))
+        print(f"⏱  Total: {(time.monotonic() - start) * 1000:.1f} ms")
+        return 0 if ok else 1
+    finally:
+        history.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
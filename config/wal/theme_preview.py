@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+# Theme Preview Gallery
+# Shows what setwal would produce for a set of wallpapers or palettes
+# without applying anything: each candidate's Zed theme and iTerm2 profile
+# are generated in a worker process (pre-rendered library entries are read
+# as they are), and the gallery draws them side by side with truecolor
+# escapes: the terminal's 16 colors and a snippet of code highlighted with
+# the theme's syntax colors. Nothing under ~/.config or ~/Library is written.
+#
+# Usage: theme_preview.py <image|colors.json|directory>... [-j JOBS] [--theme NAME]
+#                         [--columns N] [--json]
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from palette import Palette
+from theme_cache import palette_digest
+from theme_store import ThemeStore, extract_colors, find_images, render_palette
+
+DEFAULT_THEME = "Pywal"
+
+# Visible width of one gallery cell, and the gap between cells
+CELL_WIDTH = 44
+GUTTER = 2
+
+# A few lines of Python as (syntax scope, text) runs; plain strings use the
+# editor foreground
+SAMPLE_CODE = (
+    (("keyword", "def"), " ", ("function", "greet"), ("punctuation.bracket", "("), ("variable", "name"),
+     ("punctuation.delimiter", ":"), " ", ("type", "str"), ("punctuation.delimiter", ","), " ",
+     ("variable", "n"), ("operator", "="), ("number", "3"), ("punctuation.bracket", ")"),
+     ("punctuation.delimiter", ":")),
+    ("    ", ("comment.doc", '"""Say hello n times."""')),
+    ("    ", ("keyword", "for"), " ", ("variable", "i"), " ", ("keyword", "in"), " ", ("function", "range"),
+     ("punctuation.bracket", "("), ("variable", "n"), ("punctuation.bracket", ")"),
+     ("punctuation.delimiter", ":")),
+    ("        ", ("function", "print"), ("punctuation.bracket", "("), ("string", 'f"hi '),
+     ("string.escape", "{name}"), ("string", '!"'), ("punctuation.bracket", ")"), "  ", ("comment", "# :)")),
+    ("    ", ("keyword", "return"), " ", ("boolean", "True")),
+)
+
+def iterm_hex(color):
+    """#rrggbb for an iTerm2 color dict"""
+    return "#" + "".join(f"{round(color[f'{c} Component'] * 255):02x}" for c in ("Red", "Green", "Blue"))
+
+def summarize(zed, iterm, theme=DEFAULT_THEME):
+    """The colors a preview draws, taken from serialized Zed and iTerm2 artifacts"""
+    themes = {t["name"]: t for t in json.loads(zed)["themes"]}
+    if theme not in themes:
+        raise ValueError(f"no Zed theme named {theme!r} (have: {', '.join(themes)})")
+    style = themes[theme]["style"]
+
+    # iTerm2 only has the plain, dark and light profiles
+    profiles = {p["Name"]: p for p in json.loads(iterm)["Profiles"]}
+    profile = profiles.get(theme.replace(" High Contrast", ""), profiles[DEFAULT_THEME])
+    return {
+        "theme": theme,
+        "appearance": themes[theme].get("appearance"),
+        "editor": {
+            "background": style["editor.background"],
+            "foreground": style["editor.foreground"],
+            "line_number": style.get("editor.line_number", style["editor.foreground"]),
+        },
+        "syntax": style.get("syntax", {}),
+        "terminal": {
+            "background": iterm_hex(profile["Background Color"]),
+            "foreground": iterm_hex(profile["Foreground Color"]),
+            "ansi": [iterm_hex(profile[f"Ansi {i} Color"]) for i in range(16)],
+        },
+    }
+
+def preview_source(source, theme=DEFAULT_THEME):
+    """Worker: generate (never install) the themes for one image or colors.json"""
+    start = time.monotonic()
+    try:
+        if source.lower().endswith(".json"):
+            with open(source, 'r') as f:
+                palette, zed, iterm = render_palette(json.load(f))
+            origin = "palette"
+        else:
+            entry = ThemeStore().lookup(source)
+            if entry is not None:
+                palette = Palette(json.loads(entry.read("colors")))
+                zed, iterm = entry.read("zed"), entry.read("iterm")
+                origin = "library"
+            else:
+                colors = extract_colors(source)
+                colors["wallpaper"] = source
+                palette, zed, iterm = render_palette(colors)
+                origin = "extracted"
+        return {"source": source, "ok": True, "origin": origin, "digest": palette_digest(palette),
+                **summarize(zed, iterm, theme), "seconds": round(time.monotonic() - start, 4)}
+    except Exception as e:
+        return {"source": source, "ok": False, "error": f"{type(e).__name__}: {e}",
+                "seconds": round(time.monotonic() - start, 4)}
+
+def preview_all(sources, theme=DEFAULT_THEME, jobs=None):
+    """Preview results for sources, in order; several run in parallel"""
+    if len(sources) <= 1:
+        return [preview_source(s, theme) for s in sources]
+    workers = jobs or min(len(sources), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(preview_source, sources, repeat(theme)))
+
+# Drawing
+
+def rgb(hex_color, under=None):
+    """(r, g, b) for #rrggbb, or #rrggbbaa composited over the under color"""
+    value = hex_color.lstrip('#')
+    r, g, b = bytes.fromhex(value[:6])
+    if len(value) == 8 and under is not None:
+        alpha = int(value[6:], 16) / 255
+        ur, ug, ub = rgb(under)
+        r, g, b = (round(c * alpha + u * (1 - alpha)) for c, u in ((r, ur), (g, ug), (b, ub)))
+    return r, g, b
+
+def paint(text, fg=None, bg=None, italic=False, bold=False):
+    codes = []
+    if bold:
+        codes.append("1")
+    if italic:
+        codes.append("3")
+    if fg:
+        codes.append("38;2;{};{};{}".format(*fg))
+    if bg:
+        codes.append("48;2;{};{};{}".format(*bg))
+    return f"\033[{';'.join(codes)}m{text}\033[0m" if codes else text
+
+def fit(text, width=CELL_WIDTH):
+    """text cut or padded to exactly width characters"""
+    return text[:width - 1] + "…" if len(text) > width else text.ljust(width)
+
+def render_cell(result):
+    """One candidate's gallery lines, each exactly CELL_WIDTH wide"""
+    title = fit(os.path.basename(result["source"]) or result["source"])
+    if not result["ok"]:
+        return [paint(title, bold=True), fit(f"❌ {result['error']}", CELL_WIDTH - 1) + " "]
+
+    lines = [paint(title, bold=True),
+             paint(fit(f"{result['digest'][:12]}  {result['origin']}  {result['seconds'] * 1000:.0f} ms"),
+                   italic=True)]
+
+    # Terminal: background/foreground, then the normal and bright colors
+    terminal = result["terminal"]
+    bg, fg = rgb(terminal["background"]), rgb(terminal["foreground"])
+    lines.append(paint(fit(" $ ls --color"), fg=fg, bg=bg))
+    for row in (terminal["ansi"][:8], terminal["ansi"][8:]):
+        blocks = "".join(paint("     ", bg=rgb(c)) for c in row)
+        lines.append(blocks + paint(" " * (CELL_WIDTH - 5 * len(row)), bg=bg))
+
+    # Editor: the sample code in the Zed theme's syntax colors
+    editor = result["editor"]
+    background = editor["background"]
+    bg = rgb(background)
+    default = {"color": editor["foreground"]}
+    for number, runs in enumerate(SAMPLE_CODE, 1):
+        line = paint(f"{number:>2} ", fg=rgb(editor["line_number"], background), bg=bg)
+        width = 3
+        for run in runs:
+            scope, text = ("", run) if isinstance(run, str) else run
+            # comment.doc falls back to comment, then to the editor foreground
+            style = result["syntax"].get(scope) or result["syntax"].get(scope.split(".")[0]) or default
+            line += paint(text, fg=rgb(style.get("color") or editor["foreground"], background), bg=bg,
+                          italic=style.get("font_style") == "italic", bold=(style.get("font_weight") or 0) >= 700)
+            width += len(text)
+        lines.append(line + paint(" " * max(0, CELL_WIDTH - width), bg=bg))
+    return lines
+
+def render_gallery(results, columns=None):
+    """The gallery as one string, candidates laid out in rows of columns"""
+    if columns is None:
+        width = shutil.get_terminal_size().columns
+        columns = max(1, (width + GUTTER) // (CELL_WIDTH + GUTTER))
+    blank = " " * CELL_WIDTH
+    rows = []
+    for i in range(0, len(results), columns):
+        cells = [render_cell(r) for r in results[i:i + columns]]
+        height = max(len(c) for c in cells)
+        for n in range(height):
+            rows.append((" " * GUTTER).join(c[n] if n < len(c) else blank for c in cells).rstrip())
+        rows.append("")
+    return "\n".join(rows)
+
+def expand_sources(paths):
+    """Images and palettes to preview; directories contribute their images"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(find_images(path))
+        else:
+            sources.append(os.path.abspath(path))
+    return sources
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preview the themes for images or palettes without applying them")
+    parser.add_argument("sources", nargs="+", help="images, colors.json files or directories of images")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--theme", default=DEFAULT_THEME,
+                        help=f"theme variant to show, e.g. 'Pywal Light' (default: {DEFAULT_THEME})")
+    parser.add_argument("--columns", type=int, help="candidates per row (default: fit the terminal)")
+    parser.add_argument("--json", action="store_true", help="print the preview colors as JSON instead")
+    args = parser.parse_args(argv)
+
+    missing = [p for p in args.sources if not os.path.exists(p)]
+    if missing:
+        print(f"❌ Not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    sources = expand_sources(args.sources)
+    if not sources:
+        print("❌ No images found", file=sys.stderr)
+        return 1
+
+    start = time.monotonic()
+    results = preview_all(sources, args.theme, args.jobs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(render_gallery(results, args.columns), end="")
+        failed = sum(1 for r in results if not r["ok"])
+        print(f"🎨 {len(results) - failed} previewed{f', {failed} failed' if failed else ''} "
+              f"in {(time.monotonic() - start) * 1000:.0f} ms (nothing applied)")
+    return 0 if all(r["ok"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
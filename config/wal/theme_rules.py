@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+# Declarative Theme Rules
+# A theme is described as a table mapping each key to a small color
+# expression. The table is compiled once into a plan that evaluates every
+# distinct sub-expression exactly once, then fills in every key, so
+# generation cost follows the number of distinct derivations rather than
+# the number of keys.
+#
+# Expressions:
+#   bg, fg                    palette background / foreground (fg lifted to the text contrast target)
+#   color0 .. color15         raw palette colors
+#   accent(4)                 color4 as readable text (accent(4, 7) for at least 7:1 instead)
+#   ansi(4)                   color4 for its terminal role (color0 and color8 need less contrast)
+#   adjust(fg, 0.7)           brightness scaled by a factor
+#   blend(bg, accent(4), 0.2) mix of two colors
+#   lighten(bg, 0.05)         OKLCH lightness raised (darken() lowers it)
+#   mix(bg, accent(4), 0.2)   mix in OKLab
+#   saturate(accent(4), 1.3)  OKLCH chroma scaled by a factor
+#   ifdark(1.05, 0.95)        first value for dark themes, second for light ones
+#   #00000000, transparent, 'italic', 700   literals
+#
+# Operands are checked when the table is compiled: palette indices are
+# integers 0-15, contrast targets 1-21, blend/mix ratios and lighten/darken
+# amounts 0-1, other factors non-negative numbers, and colors are bg, fg,
+# colorN, #rrggbb(aa) or an expression giving one.
+#
+# Non-string values (numbers, booleans) in a table are copied as-is.
+#
+# Usage: theme_rules.py show [--rules FILE]
+#        theme_rules.py check FILE
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+# Operations and the number of arguments they accept
+OPERATIONS = {
+    "accent": (1, 2),
+    "adjust": (2, 2),
+    "ansi": (1, 1),
+    "blend": (3, 3),
+    "darken": (2, 2),
+    "ifdark": (2, 2),
+    "lighten": (2, 2),
+    "mix": (3, 3),
+    "saturate": (2, 2),
+}
+
+# Operand kinds per operation (accent's target is optional)
+OPERANDS = {
+    "accent": ("index", "target"),
+    "adjust": ("color", "factor"),
+    "ansi": ("index",),
+    "blend": ("color", "color", "fraction"),
+    "darken": ("color", "fraction"),
+    "ifdark": ("any", "any"),
+    "lighten": ("color", "fraction"),
+    "mix": ("color", "color", "fraction"),
+    "saturate": ("color", "factor"),
+}
+
+# Accepted literal values per numeric operand kind: (description, test)
+NUMERIC_OPERANDS = {
+    "index": ("a palette index 0-15", lambda v: isinstance(v, int) and 0 <= v <= 15),
+    "target": ("a contrast ratio 1-21", lambda v: 1 <= v <= 21),
+    "fraction": ("a number 0-1", lambda v: 0 <= v <= 1),
+    "factor": ("a non-negative number", lambda v: v >= 0),
+}
+
+TOKEN = re.compile(r"\s*(?:(?P<number>-?\d+(?:\.\d+)?)|(?P<hex>#[0-9a-fA-F]{3,8})|"
+                   r"'(?P<string>[^']*)'|(?P<name>[A-Za-z_][A-Za-z0-9_]*)|(?P<punct>[(),]))")
+
+class RuleError(ValueError):
+    """An expression or override table that cannot be compiled"""
+
+class Ref:
+    """Placeholder in a compiled template for the value of plan node `index`"""
+
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+def tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = TOKEN.match(expression, pos)
+        if not match:
+            raise RuleError(f"unexpected {expression[pos:]!r} in {expression!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+def outcomes(node):
+    """What a parsed expression can evaluate to: a set of literal values, or {"color"}
+
+    ifdark() can give either argument. Hex literals only count as colors in
+    their full #rrggbb / #rrggbbaa form; other strings stay literal values.
+    """
+    if node[0] == "lit":
+        value = node[1]
+        if isinstance(value, str) and value.startswith('#') and len(value) in (7, 9):
+            return {"color"}
+        return {value}
+    if node[0] == "ifdark":
+        return outcomes(node[1]) | outcomes(node[2])
+    return {"color"}
+
+def check_operands(op, args, expression):
+    """Raise RuleError unless every argument of op is of the kind it needs"""
+    for position, (kind, arg) in enumerate(zip(OPERANDS[op], args), 1):
+        values = outcomes(arg)
+        if kind == "any":
+            continue
+        if kind == "color":
+            ok, wanted = values == {"color"}, "a color"
+        else:
+            wanted, test = NUMERIC_OPERANDS[kind]
+            ok = all(isinstance(v, (int, float)) and not isinstance(v, bool) and test(v) for v in values)
+        if not ok:
+            raise RuleError(f"{op}() argument {position} must be {wanted} in {expression!r}")
+
+def parse(expression):
+    """Parse an expression into a nested tuple: ('lit', v), ('bg',), ('color', n) or (op, *args)"""
+    tokens = tokenize(expression)
+    pos = 0
+
+    def take(kind=None, value=None):
+        nonlocal pos
+        if pos >= len(tokens):
+            raise RuleError(f"unexpected end of {expression!r}")
+        token = tokens[pos]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise RuleError(f"expected {value or kind} in {expression!r}, got {token[1]!r}")
+        pos += 1
+        return token
+
+    def term():
+        kind, value = take()
+        if kind == "number":
+            return ("lit", float(value) if "." in value else int(value))
+        if kind == "hex":
+            return ("lit", value)
+        if kind == "string":
+            return ("lit", value)
+        if kind != "name":
+            raise RuleError(f"unexpected {value!r} in {expression!r}")
+
+        if value in ("bg", "fg"):
+            return (value,)
+        if value == "transparent":
+            return ("lit", "transparent")
+        color = re.fullmatch(r"color(\d+)", value)
+        if color:
+            index = int(color.group(1))
+            if index > 15:
+                raise RuleError(f"{value} is not a palette color")
+            return ("color", ("lit", index))
+        if value not in OPERATIONS:
+            raise RuleError(f"unknown name {value!r} in {expression!r}")
+
+        take("punct", "(")
+        args = [term()]
+        while pos < len(tokens) and tokens[pos] == ("punct", ","):
+            take()
+            args.append(term())
+        take("punct", ")")
+        low, high = OPERATIONS[value]
+        if not low <= len(args) <= high:
+            raise RuleError(f"{value}() takes {low}-{high} arguments in {expression!r}")
+        check_operands(value, args, expression)
+        return (value, *args)
+
+    node = term()
+    if pos != len(tokens):
+        raise RuleError(f"trailing {tokens[pos][1]!r} in {expression!r}")
+    return node
+
+class Plan:
+    """Deduplicated evaluation order for a rule table
+
+    nodes holds (op, args) in dependency order; args index earlier nodes,
+    except for "lit" nodes whose args is the literal itself.
+    """
+
+    def __init__(self, nodes, template, keys):
+        self.nodes = nodes
+        self.template = template
+        self.keys = keys
+        self._split = {}
+
+    def evaluate(self, operations):
+        """Evaluate every node once with the given op callables and fill the table"""
+        values = []
+        append = values.append
+        for op, args in self.nodes:
+            if op == "lit":
+                append(args)
+            else:
+                append(operations[op](*[values[i] for i in args]))
+        return fill(self.template, values)
+
+    def split(self, varying):
+        """(shared, varying) node indices: whether a node depends on any op in varying"""
+        key = frozenset(varying)
+        if key not in self._split:
+            depends = []
+            for op, args in self.nodes:
+                depends.append(op in key or (op != "lit" and any(depends[i] for i in args)))
+            self._split[key] = ([i for i, d in enumerate(depends) if not d],
+                                [i for i, d in enumerate(depends) if d])
+        return self._split[key]
+
+    def evaluate_many(self, operation_sets, varying):
+        """Evaluate several op sets that differ only in the ops named in varying
+
+        Nodes that depend on none of those ops are evaluated once, with the
+        first set, and shared by every result.
+        """
+        shared, per_set = self.split(varying)
+        nodes = self.nodes
+        values = [None] * len(nodes)
+        first = operation_sets[0]
+        for i in shared:
+            op, args = nodes[i]
+            values[i] = args if op == "lit" else first[op](*[values[j] for j in args])
+
+        results = []
+        for operations in operation_sets:
+            for i in per_set:
+                op, args = nodes[i]
+                values[i] = operations[op](*[values[j] for j in args])
+            results.append(fill(self.template, values))
+        return results
+
+    def stats(self):
+        derived = sum(1 for op, _ in self.nodes if op not in ("lit", "bg", "fg", "color"))
+        return {"keys": self.keys, "nodes": len(self.nodes), "derivations": derived}
+
+def fill(template, values):
+    if isinstance(template, Ref):
+        return values[template.index]
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(value, values) for value in template]
+    return template
+
+def compile_rules(table):
+    """Compile a rule table into a Plan"""
+    nodes = []
+    index = {}
+    keys = 0
+
+    def intern(node):
+        # Children first, so every node only refers to earlier ones
+        if node[0] == "lit":
+            key = ("lit", type(node[1]).__name__, node[1])
+            args = node[1]
+        else:
+            args = tuple(intern(child) for child in node[1:])
+            key = (node[0], args)
+        if key not in index:
+            index[key] = len(nodes)
+            nodes.append((node[0], args))
+        return index[key]
+
+    def walk(value, path):
+        nonlocal keys
+        if isinstance(value, dict):
+            return {k: walk(v, f"{path}.{k}" if path else k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [walk(v, f"{path}[{i}]") for i, v in enumerate(value)]
+        if isinstance(value, str):
+            keys += 1
+            try:
+                return Ref(intern(parse(value)))
+            except RuleError as e:
+                raise RuleError(f"{path}: {e}") from None
+        return value
+
+    template = walk(table, "")
+    return Plan(nodes, template, keys)
+
+def merge_rules(base, overrides):
+    """Deep-merge an override table into a base table; None removes a key"""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_rules(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def load_overrides(path):
+    """Override table from a JSON file, {} if there is none"""
+    try:
+        with open(path, 'r') as f:
+            overrides = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        raise RuleError(f"{path}: {e}") from None
+    if not isinstance(overrides, dict):
+        raise RuleError(f"{path}: expected a JSON object")
+    return overrides
+
+def fingerprint(path):
+    """Short digest of an override file, "" when there is none"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return ""
+
+_plans = {}
+
+def cached_plan(base, overrides_path):
+    """Compiled plan for base plus overrides, recompiled only when the file changes
+
+    overrides_path None means the base table alone.
+    """
+    try:
+        st = os.stat(overrides_path) if overrides_path else None
+        stamp = st and (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    key = (id(base), overrides_path, stamp)
+    plan = _plans.get(key)
+    if plan is None:
+        table = merge_rules(base, load_overrides(overrides_path)) if stamp else base
+        plan = _plans[key] = compile_rules(table)
+    return plan
+
+def main(argv=None):
+    import update_zed
+
+    parser = argparse.ArgumentParser(description="Inspect the declarative Zed theme rules")
+    sub = parser.add_subparsers(dest="command")
+    show = sub.add_parser("show", help="summarize the compiled plan")
+    show.add_argument("--rules", help=f"override table (default: {update_zed.zed_rules_file()})")
+    check = sub.add_parser("check", help="validate an override table")
+    check.add_argument("file")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    path = args.file if args.command == "check" else (args.rules or update_zed.zed_rules_file())
+    try:
+        plan = cached_plan(update_zed.STYLE_RULES, path)
+    except RuleError as e:
+        print(f"❌ {e}")
+        return 1
+
+    stats = plan.stats()
+    source = path if os.path.exists(path) else "built-in rules only"
+    print(f"✅ {source}")
+    print(f"   {stats['keys']} keys, {stats['nodes']} distinct expressions, {stats['derivations']} derived colors")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+# Theme Regeneration Scheduler
+# Puts every theme install behind one lock file (~/.cache/wal/regenerate.lock),
+# so overlapping setwal runs, the palette watcher and the theme server never
+# race on the same symlinks and settings file.
+#
+# Regeneration requests are debounced: each one is numbered in a small
+# ledger (~/.cache/wal/regenerate.json), and the process that gets the lock
+# waits until no new request has come in for the window (PYWAL_DEBOUNCE_MS,
+# default 150), then renders the newest colors.json once. Requests it
+# covered return without doing anything. If colors.json changes again while
+# it renders, that render is dropped before anything is installed and the
+# newer palette is rendered instead. A palette that is already installed is
+# not installed again.
+#
+# Wallpaper applies take a ticket and wait for the lock; an apply that a
+# newer one has overtaken meanwhile is skipped.
+#
+# Usage: theme_scheduler.py [request] [--force] [--window MS]
+#        theme_scheduler.py status
+
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import sys
+import time
+
+from palette import Palette, colors_file
+from palette_watcher import file_signature
+from theme_cache import palette_digest
+
+DEFAULT_WINDOW_MS = 150
+
+# A steady stream of requests postpones a run by at most this many windows
+MAX_DEFER = 10
+
+def lock_file():
+    return os.path.expanduser("~/.cache/wal/regenerate.lock")
+
+def ledger_file():
+    return os.path.expanduser("~/.cache/wal/regenerate.json")
+
+def debounce_window():
+    """Debounce window in seconds, from PYWAL_DEBOUNCE_MS"""
+    try:
+        return max(0.0, float(os.environ.get("PYWAL_DEBOUNCE_MS", DEFAULT_WINDOW_MS)) / 1000)
+    except ValueError:
+        return DEFAULT_WINDOW_MS / 1000
+
+def installed_key(palette):
+    """What an install is keyed by: the palette plus the Zed rule set it was rendered with"""
+    import update_zed
+    return f"{palette_digest(palette)}:{update_zed.zed_cache_name()}"
+
+def regenerate_current(scheduler, render=None):
+    """Render and install themes for the newest colors.json
+
+    The default ThemeScheduler job. Returns the emitter step results,
+    "unchanged" if that palette is already installed, or None if
+    colors.json changed before the install and the work was dropped.
+    render(palette) -> (zed bytes, iterm bytes) defaults to the
+    theme-cache-backed generators.
+    """
+    import asyncio
+
+    import apply_theme
+    import update_iterm2
+    import update_zed
+    from theme_history import record_installed
+
+    path = colors_file()
+    signature = file_signature(path)
+    palette = Palette.load(path)
+    key = installed_key(palette)
+    if not scheduler.forced and key == scheduler.ledger().get("installed"):
+        return "unchanged"
+
+    if render is None:
+        zed, iterm = update_zed.cached_theme_family(palette), update_iterm2.cached_iterm_profile(palette)
+    else:
+        zed, iterm = render(palette)
+    # A newer palette arrived while rendering: nothing of this one gets installed
+    if file_signature(path) != signature:
+        return None
+
+    steps = asyncio.run(apply_theme.regenerate(palette, apply_theme.rendered_emitters(zed, iterm)))
+    if all(s["ok"] for s in steps):
+        scheduler.mark_installed(key)
+        record_installed(palette)
+    return steps
+
+class ThemeScheduler:
+    """Single-flight, debounced theme regeneration shared by every process"""
+
+    def __init__(self, job=None, window=None, lock_path=None, ledger_path=None):
+        self.job = job or regenerate_current
+        self.window = debounce_window() if window is None else window
+        self.lock_path = lock_path or lock_file()
+        self.ledger_path = ledger_path or ledger_file()
+        self.forced = False
+        self._lock_fd = None
+
+    # Ledger: request counters, read and updated under their own short flock
+
+    def _update(self, change=None):
+        os.makedirs(os.path.dirname(self.ledger_path), exist_ok=True)
+        fd = os.open(self.ledger_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                ledger = json.loads(os.read(fd, 65536) or b"{}")
+            except ValueError:
+                ledger = {}
+            if change is not None:
+                change(ledger)
+                data = json.dumps(ledger, sort_keys=True).encode('utf-8')
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            return ledger
+        finally:
+            os.close(fd)
+
+    def ledger(self):
+        """Current counters: requested, handled, applies, installed, runs, collapsed"""
+        return self._update()
+
+    def _bump(self, counter):
+        def change(ledger):
+            ledger[counter] = ledger.get(counter, 0) + 1
+        return self._update(change)[counter]
+
+    def mark_installed(self, key):
+        def change(ledger):
+            ledger["installed"] = key
+        self._update(change)
+
+    # The run lock
+
+    def acquire(self, blocking=True):
+        """Take the run lock; False if blocking=False and another process holds it"""
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @contextlib.contextmanager
+    def locked(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    # Regeneration requests
+
+    def _settle(self):
+        """Wait until no request has come in for one window; the newest request number"""
+        target = self.ledger().get("requested", 0)
+        deadline = time.monotonic() + self.window * MAX_DEFER
+        while self.window and time.monotonic() < deadline:
+            time.sleep(self.window)
+            newest = self.ledger().get("requested", 0)
+            if newest == target:
+                break
+            target = newest
+        return target
+
+    def request(self, force=False):
+        """Ask for a regeneration and wait until it is covered; returns a result dict
+
+        status is "ran", "unchanged" (palette already installed) or
+        "collapsed" (a run that started after this request did the work).
+        """
+        number = self._bump("requested")
+        self.acquire()
+        try:
+            if self.ledger().get("handled", 0) >= number:
+                # A run that started after this request already covered it
+                self._bump("collapsed")
+                return {"ok": True, "status": "collapsed", "request": number}
+
+            self.forced = force
+            while True:
+                target = self._settle()
+                result = self.job(self)
+                self.forced = False
+                if result is not None:
+                    break
+                # Dropped for a newer palette; settle again and render that one
+
+            def change(ledger):
+                ledger["handled"] = max(ledger.get("handled", 0), target)
+                ledger["runs"] = ledger.get("runs", 0) + 1
+            self._update(change)
+        finally:
+            self.forced = False
+            self.release()
+
+        if result == "unchanged":
+            return {"ok": True, "status": "unchanged", "request": number}
+        return {"ok": all(s["ok"] for s in result), "status": "ran", "request": number, "steps": result}
+
+    # Wallpaper applies
+
+    def apply_ticket(self):
+        """Number this apply; a later ticket supersedes it"""
+        return self._bump("applies")
+
+    def superseded(self, ticket):
+        """True if a newer apply has been requested since this ticket"""
+        return self.ledger().get("applies", 0) > ticket
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Request a debounced, single-flight theme regeneration")
+    parser.add_argument("command", nargs="?", default="request", choices=("request", "status"))
+    parser.add_argument("--force", action="store_true", help="reinstall even if the palette is already installed")
+    parser.add_argument("--window", type=float, help=f"debounce window in ms (default: {DEFAULT_WINDOW_MS})")
+    args = parser.parse_args(argv)
+
+    window = None if args.window is None else args.window / 1000
+    scheduler = ThemeScheduler(window=window)
+    if args.command == "status":
+        ledger = scheduler.ledger()
+        busy = not scheduler.acquire(blocking=False)
+        scheduler.release()
+        print(f"{'🔒 Regeneration running' if busy else '🟢 Idle'}: {ledger.get('requested', 0)} requests, "
+              f"{ledger.get('runs', 0)} runs, {ledger.get('collapsed', 0)} collapsed, "
+              f"{ledger.get('applies', 0)} applies")
+        print(f"   installed: {ledger.get('installed') or 'nothing yet'}")
+        return 0
+
+    start = time.monotonic()
+    result = scheduler.request(force=args.force)
+    for r in result.get("steps", []):
+        mark = "✅" if r["ok"] else "❌"
+        print(f"{mark} {r['step']:<10} {r['seconds'] * 1000:8.1f} ms")
+    print(f"⏱  Request {result['request']} {result['status']} in {(time.monotonic() - start) * 1000:.1f} ms")
+    return 0 if result["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
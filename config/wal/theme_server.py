@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+# Resident Theme Server
+# Keeps the generators imported, the parsed palette loaded and recently
+# rendered themes in memory, and serves requests from theme_client.py over
+# a Unix domain socket (~/.cache/wal/theme.sock, or PYWAL_SOCKET). With the
+# server running, setwal skips interpreter start-up and imports entirely.
+#
+# Protocol: one JSON object per line in each direction.
+#   {"cmd": "apply", "image": PATH, "store": true}   apply a wallpaper
+#   {"cmd": "regenerate"}                            re-emit themes for colors.json
+#   {"cmd": "preview", "path": IMAGE_OR_COLORS}      palette for an image, nothing installed
+#   {"cmd": "status"}                                server state
+#   {"cmd": "stop"}                                  shut down
+#
+# Usage: theme_server.py [--socket PATH] [-v]
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+import apply_theme
+import update_iterm2
+import update_zed
+from palette import Palette, colors_file
+from palette_watcher import file_signature
+from theme_cache import palette_digest
+from theme_client import send_request, socket_path
+from theme_scheduler import ThemeScheduler, regenerate_current
+from theme_store import ThemeStore
+
+# Optional in-process palette extractor (requires NumPy and Pillow)
+try:
+    import extract_palette
+except ImportError:
+    extract_palette = None
+
+# Rendered palettes kept in memory
+MAX_RENDERED = 16
+
+class ThemeServer:
+    """Request handlers plus the state kept warm between requests"""
+
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.started = time.time()
+        self.requests = 0
+        self.palette = None
+        self.palette_signature = None
+        self.rendered = OrderedDict()
+        self.last_apply = None
+        self.stopping = None
+        self._lock = None
+
+    def current_palette(self):
+        """Parsed colors.json, reloaded only when the file changed"""
+        path = colors_file()
+        signature = file_signature(path)
+        if self.palette is None or signature != self.palette_signature:
+            self.palette = Palette.load(path)
+            self.palette_signature = signature
+        return self.palette
+
+    def artifacts(self, palette):
+        """Serialized (zed, iterm) bytes for a palette, memoized by digest"""
+        # Keyed by the rule overrides too, so edits to them take effect
+        digest = (palette_digest(palette), update_zed.zed_cache_name())
+        if digest in self.rendered:
+            self.rendered.move_to_end(digest)
+            return self.rendered[digest]
+
+        rendered = (update_zed.cached_theme_family(palette), update_iterm2.cached_iterm_profile(palette))
+        self.rendered[digest] = rendered
+        while len(self.rendered) > MAX_RENDERED:
+            self.rendered.popitem(last=False)
+        return rendered
+
+    async def handle(self, request):
+        """Dispatch one request and return the reply"""
+        start = time.monotonic()
+        self.requests += 1
+        handler = getattr(self, f"do_{request.get('cmd')}", None)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command: {request.get('cmd')}"}
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        try:
+            # Requests that touch the live theme run one at a time
+            if request.get("cmd") in ("apply", "regenerate"):
+                async with self._lock:
+                    reply = await handler(request)
+            else:
+                reply = await handler(request)
+        except Exception as e:
+            # Always answer: a client left without a reply cannot fall back to running locally
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        reply["seconds"] = round(time.monotonic() - start, 4)
+        return reply
+
+    async def do_apply(self, request):
+        image = request.get("image")
+        if not image or not os.path.isfile(image):
+            return {"ok": False, "error": f"File not found: {image}"}
+        ok, steps = await apply_theme.apply_theme(image, use_store=request.get("store", True))
+        self.last_apply = {"image": image, "ok": ok, "at": time.time()}
+        return {"ok": ok, "steps": steps}
+
+    async def do_regenerate(self, request):
+        # Through the scheduler, so it never overlaps a watcher run or another process
+        scheduler = ThemeScheduler(job=lambda s: regenerate_current(s, render=self.artifacts), window=0)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, lambda: scheduler.request(force=True))
+        return {"ok": result["ok"], "steps": result.get("steps", [])}
+
+    async def do_preview(self, request):
+        path = request.get("path")
+        if not path or not os.path.isfile(path):
+            return {"ok": False, "error": f"File not found: {path}"}
+
+        loop = asyncio.get_running_loop()
+        colors, source = await loop.run_in_executor(None, self.preview_colors, path)
+        if colors is None:
+            return {"ok": False, "error": "No pre-rendered theme and no built-in extractor for this image"}
+        palette = Palette(colors)
+        # Render now so applying this palette next is a memory hit
+        await loop.run_in_executor(None, self.artifacts, palette)
+        return {
+            "ok": True,
+            "source": source,
+            "digest": palette_digest(palette),
+            "colors": {"special": colors["special"], "colors": colors["colors"]},
+        }
+
+    def preview_colors(self, path):
+        """(colors dict, source) for a colors.json or an image"""
+        if path.endswith(".json"):
+            with open(path, 'r') as f:
+                return json.load(f), "file"
+        entry = ThemeStore().lookup(path)
+        if entry is not None:
+            return json.loads(entry.read("colors")), "pre-rendered"
+        if extract_palette is not None:
+            return extract_palette.extract(path), "extracted"
+        return None, None
+
+    async def do_status(self, request):
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "socket": self.path,
+            "palette": palette_digest(self.palette)[:12] if self.palette else None,
+            "rendered": len(self.rendered),
+            "last_apply": self.last_apply,
+        }
+
+    async def do_stop(self, request):
+        if self.stopping is not None:
+            self.stopping.set()
+        return {"ok": True}
+
+    async def handle_client(self, reader, writer):
+        try:
+            line = await reader.readline()
+            if line:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if isinstance(request, dict):
+                    reply = await self.handle(request)
+                else:
+                    reply = {"ok": False, "error": "malformed request"}
+                writer.write(json.dumps(reply).encode('utf-8') + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Listen on the socket until stopped"""
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        # Warm up: parse the current palette and render it before the first request
+        with contextlib.suppress(OSError, ValueError, KeyError):
+            await loop.run_in_executor(None, lambda: self.artifacts(self.current_palette()))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Owner-only from the moment it exists, not after a chmod
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle_client, path=self.path)
+        finally:
+            os.umask(umask)
+        print(f"🟢 Theme server listening on {self.path} (pid {os.getpid()})", file=sys.stderr)
+        try:
+            async with server:
+                await self.stopping.wait()
+        finally:
+            with contextlib.suppress(OSError):
+                os.unlink(self.path)
+            print("🛑 Theme server stopped", file=sys.stderr)
+
+def server_running(path):
+    """True if something already answers on the socket"""
+    try:
+        return send_request({"cmd": "status"}, path, timeout=2).get("ok", False)
+    except (OSError, ValueError):
+        return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve pywal theme requests over a Unix socket")
+    parser.add_argument("--socket", help="socket path (default: ~/.cache/wal/theme.sock)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the emitters' own status output")
+    args = parser.parse_args(argv)
+
+    path = args.socket or socket_path()
+    if server_running(path):
+        print(f"Theme server is already running on {path}")
+        return 1
+    # Left over from a server that did not shut down cleanly
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = ThemeServer(path)
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            # Emitters print status lines; a daemon has nobody to show them to
+            devnull = stack.enter_context(open(os.devnull, 'w'))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        asyncio.run(server.serve())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
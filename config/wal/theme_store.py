@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+# Pre-Rendered Theme Store
+# Walks a wallpaper directory and renders the palette, Zed theme family and
+# iTerm2 profile for every image with a process pool. Results live under
+# ~/.cache/wal/library/<image sha256>/, so applying a pre-rendered wallpaper
+# is a lookup plus an install. Re-running only processes new or changed
+# images.
+#
+# Usage: theme_store.py render [DIR] [-j N]
+#        theme_store.py lookup <image>
+#        theme_store.py status
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from artifact_writer import atomic_write
+from contrast import min_contrast
+from palette import Palette
+from theme_cache import GENERATOR_VERSION, palette_digest
+from theme_variants import variant_names
+from update_zed import zed_cache_name
+from wallpaper_catalog import IMAGE_EXTENSIONS
+
+# Optional in-process palette extractor (requires NumPy and Pillow)
+try:
+    import extract_palette
+except ImportError:
+    extract_palette = None
+
+# Without the built-in extractor, palette extraction runs wal against a
+# private cache dir so workers never touch ~/.cache/wal/colors.json;
+# {image} and {cache} are substituted
+DEFAULT_EXTRACT_CMD = "wal -i {image} -n -s -t -e -q --backend colorz --saturate 0.8"
+
+ARTIFACTS = ("colors", "zed", "iterm")
+
+def store_dir():
+    """Root directory of the pre-rendered theme store"""
+    return os.path.expanduser("~/.cache/wal/library")
+
+def default_wallpaper_dir():
+    return os.path.expanduser("~/Pictures/Wallpapers")
+
+def extract_command():
+    """Extraction command, or the built-in extractor's id when it is used"""
+    command = os.environ.get("PYWAL_EXTRACT_CMD")
+    if command:
+        return command
+    if extract_palette is not None and os.environ.get("PYWAL_EXTRACTOR") != "wal":
+        return f"builtin:{extract_palette.EXTRACTOR_VERSION}"
+    return DEFAULT_EXTRACT_CMD
+
+def image_digest(path):
+    """sha256 of the image file contents"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def find_images(directory):
+    """All wallpaper images below directory, sorted"""
+    images = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.'):
+                images.append(os.path.join(root, name))
+    return sorted(images)
+
+def extract_colors(image, command=None):
+    """Extract a pywal colors dict for image without touching the live cache"""
+    command = command or extract_command()
+    if command.startswith("builtin:"):
+        return extract_palette.extract(image)
+
+    with tempfile.TemporaryDirectory(prefix="wal-extract-") as cache:
+        argv = [part.replace("{image}", image).replace("{cache}", cache)
+                for part in shlex.split(command)]
+        env = dict(os.environ, PYWAL_CACHE_DIR=cache)
+        result = subprocess.run(argv, env=env, capture_output=True, text=True)
+        colors_path = os.path.join(cache, "colors.json")
+        if result.returncode != 0 or not os.path.exists(colors_path):
+            detail = (result.stderr or result.stdout).strip().splitlines()
+            raise RuntimeError(detail[-1] if detail else f"exit {result.returncode}")
+        with open(colors_path, 'r') as f:
+            return json.load(f)
+
+def render_palette(colors):
+    """Render serialized Zed and iTerm2 artifacts for a colors dict"""
+    import update_iterm2
+    import update_zed
+
+    palette = Palette(colors)
+    # The generators print status lines; workers keep quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        zed = update_zed.serialize_theme_family(update_zed.create_zed_theme_family(palette))
+        iterm = update_iterm2.serialize_iterm_profile(update_iterm2.build_iterm_profile(palette))
+    return palette, zed, iterm
+
+def render_settings():
+    """Everything besides the image that decides what gets rendered"""
+    return {
+        "version": GENERATOR_VERSION,
+        "zed": zed_cache_name(),
+        "min_contrast": min_contrast(),
+        "variants": list(variant_names()),
+    }
+
+class StoreEntry:
+    """One pre-rendered image in the store"""
+
+    def __init__(self, root, digest):
+        self.digest = digest
+        self.path = os.path.join(root, digest)
+
+    def artifact_path(self, name):
+        return os.path.join(self.path, f"{name}.json")
+
+    def read(self, name):
+        with open(self.artifact_path(name), 'rb') as f:
+            return f.read()
+
+    def meta(self):
+        try:
+            with open(self.artifact_path("meta"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_complete(self, command=None):
+        """All artifacts present and rendered by the current generators"""
+        meta = self.meta()
+        return (all(meta.get(key) == value for key, value in render_settings().items()) and
+                meta.get("extract") == (command or extract_command()) and
+                all(os.path.exists(self.artifact_path(n)) for n in ARTIFACTS))
+
+def render_image(image, root, command=None, digest=None):
+    """Worker: extract and render one image into the store"""
+    start = time.monotonic()
+    try:
+        digest = digest or image_digest(image)
+        entry = StoreEntry(root, digest)
+        if entry.is_complete(command):
+            return {"image": image, "digest": digest, "ok": True, "skipped": True, "seconds": 0.0}
+
+        colors = extract_colors(image, command)
+        colors["wallpaper"] = image
+        palette, zed, iterm = render_palette(colors)
+
+        os.makedirs(entry.path, exist_ok=True)
+        atomic_write(entry.artifact_path("colors"), json.dumps(colors, indent=4).encode('utf-8'))
+        atomic_write(entry.artifact_path("zed"), zed)
+        atomic_write(entry.artifact_path("iterm"), iterm)
+        meta = {
+            "image": image,
+            "palette_digest": palette_digest(palette),
+            **render_settings(),
+            "extract": command or extract_command(),
+            "rendered": time.time(),
+        }
+        atomic_write(entry.artifact_path("meta"), json.dumps(meta, indent=2).encode('utf-8'))
+        return {"image": image, "digest": digest, "ok": True, "skipped": False,
+                "seconds": round(time.monotonic() - start, 4)}
+    except Exception as e:
+        return {"image": image, "digest": digest, "ok": False, "error": f"{type(e).__name__}: {e}",
+                "seconds": round(time.monotonic() - start, 4)}
+
+class ThemeStore:
+    """Image-hash indexed store of pre-rendered palettes and themes
+
+    index.json maps absolute image paths to their size, mtime and content
+    hash, so unchanged images are not even re-hashed on the next run.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or store_dir()
+        self.index_file = os.path.join(self.root, "index.json")
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("images", {})
+        return index
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write(self.index_file, json.dumps(self.index, indent=2, sort_keys=True).encode('utf-8'))
+
+    def known_digest(self, image):
+        """Content hash from the index if the file is unchanged since indexing"""
+        record = self.index["images"].get(os.path.abspath(image))
+        try:
+            st = os.stat(image)
+        except OSError:
+            return None
+        if record and record["size"] == st.st_size and record["mtime_ns"] == st.st_mtime_ns:
+            return record["digest"]
+        return None
+
+    def record(self, image, digest):
+        st = os.stat(image)
+        self.index["images"][os.path.abspath(image)] = {
+            "digest": digest,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+
+    def lookup(self, image, command=None):
+        """Complete StoreEntry for image, or None if it was never pre-rendered"""
+        if not os.path.isfile(image):
+            return None
+        digest = self.known_digest(image) or image_digest(image)
+        entry = StoreEntry(self.root, digest)
+        return entry if entry.is_complete(command) else None
+
+    def render(self, directory, jobs=None, command=None, progress=None):
+        """Render every new or changed image below directory; returns results"""
+        pending = []
+        results = []
+        for image in find_images(directory):
+            digest = self.known_digest(image)
+            if digest and StoreEntry(self.root, digest).is_complete(command):
+                results.append({"image": image, "digest": digest, "ok": True, "skipped": True, "seconds": 0.0})
+                continue
+            pending.append((image, digest))
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(render_image, image, self.root, command, digest)
+                           for image, digest in pending]
+                for done, future in enumerate(as_completed(futures), 1):
+                    result = future.result()
+                    results.append(result)
+                    if result["ok"]:
+                        self.record(result["image"], result["digest"])
+                    if progress:
+                        progress(done, len(pending), result)
+                    # Persist progress regularly so an interrupted batch resumes
+                    if done % 25 == 0:
+                        self.save()
+        self.save()
+        return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render pywal themes for a wallpaper library")
+    sub = parser.add_subparsers(dest="command")
+    render = sub.add_parser("render", help="render new or changed images")
+    render.add_argument("directory", nargs="?", default=default_wallpaper_dir())
+    render.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    lookup = sub.add_parser("lookup", help="print the store entry for an image")
+    lookup.add_argument("image")
+    sub.add_parser("status", help="summarize the store")
+    args = parser.parse_args(argv)
+
+    store = ThemeStore()
+
+    if args.command == "render":
+        if not os.path.isdir(args.directory):
+            print(f"❌ Not a directory: {args.directory}")
+            return 1
+
+        def progress(done, total, result):
+            mark = "✅" if result["ok"] else "❌"
+            detail = result.get("error", f"{result['seconds'] * 1000:.0f} ms")
+            print(f"{mark} [{done}/{total}] {os.path.basename(result['image'])}  {detail}")
+
+        start = time.monotonic()
+        results = store.render(args.directory, jobs=args.jobs, progress=progress)
+        rendered = sum(1 for r in results if r["ok"] and not r["skipped"])
+        skipped = sum(1 for r in results if r.get("skipped"))
+        failed = sum(1 for r in results if not r["ok"])
+        print(f"🎨 {rendered} rendered, {skipped} up to date, {failed} failed "
+              f"in {time.monotonic() - start:.1f}s → {store.root}")
+
+        # Keep the color search index (palette_index.py, needs NumPy) in step
+        try:
+            import palette_index
+        except ImportError:
+            palette_index = None
+        if palette_index is not None:
+            added, removed = palette_index.update_index()
+            if added or removed:
+                print(f"🗂  Palette index: {added} added, {removed} removed")
+        return 1 if failed else 0
+
+    if args.command == "lookup":
+        entry = store.lookup(args.image)
+        if entry is None:
+            print(f"❌ Not pre-rendered: {args.image}")
+            return 1
+        print(entry.path)
+        return 0
+
+    images = store.index["images"]
+    digests = {r["digest"] for r in images.values()}
+    print(f"🗂  Theme store: {store.root}")
+    print(f"   {len(images)} images indexed, {len(digests)} distinct")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
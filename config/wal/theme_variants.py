@@ -0,0 +1,115 @@
+# Theme Variants
+# Dark, light and high-contrast versions of one palette, shared by
+# update_zed.py and scripts/update_iterm2.py. The palette's own appearance
+# keeps its background and foreground; the opposite one mirrors their OKLab
+# lightness (with softened chroma). The high-contrast variants also keep the
+# background at least as deep as a mirrored one and raise the text contrast
+# target to WCAG AAA. The contrast solver does the rest.
+#
+# PYWAL_THEME_VARIANTS picks which variants are emitted (comma separated,
+# default: dark,light,dark-hc,light-hc; "none" for only the base theme).
+
+import os
+import weakref
+
+from color_math import ColorMath, color_to_oklab
+from contrast import min_contrast
+
+# key: (theme name, appearance, high contrast)
+VARIANTS = {
+    "dark": ("Pywal Dark", "dark", False),
+    "light": ("Pywal Light", "light", False),
+    "dark-hc": ("Pywal Dark High Contrast", "dark", True),
+    "light-hc": ("Pywal Light High Contrast", "light", True),
+}
+
+HIGH_CONTRAST = 7.0
+
+# OKLab lightness bounds for a mirrored background and foreground
+LIGHT_BACKGROUND = 0.96
+DARK_BACKGROUND = 0.22
+LIGHT_FOREGROUND = 0.35
+DARK_FOREGROUND = 0.85
+MIRRORED_CHROMA = 0.5
+
+_math = ColorMath("oklab", "round")
+
+def variant_names():
+    """Variants to emit, from PYWAL_THEME_VARIANTS"""
+    value = os.environ.get("PYWAL_THEME_VARIANTS")
+    if value is None:
+        return tuple(VARIANTS)
+    names = tuple(name.strip() for name in value.split(",") if name.strip() not in ("", "none"))
+    unknown = [name for name in names if name not in VARIANTS]
+    if unknown:
+        raise ValueError(f"unknown theme variant {unknown[0]!r} (expected {', '.join(VARIANTS)})")
+    return names
+
+def appearance(palette):
+    """Either "dark" or "light", from the palette's background"""
+    return "dark" if palette.background.luminance < 0.5 else "light"
+
+class Variant:
+    """One variant: its palette, appearance and text contrast target"""
+
+    __slots__ = ('key', 'name', 'appearance', 'palette', 'target')
+
+    def __init__(self, key, name, appearance, palette, target):
+        self.key = key
+        self.name = name
+        self.appearance = appearance
+        self.palette = palette
+        self.target = target
+
+    @property
+    def is_dark(self):
+        return self.appearance == "dark"
+
+def _relight(palette, color, lightness, chroma):
+    L, a, b = color_to_oklab(color)
+    return palette.intern(_math.from_oklab(lightness, a * chroma, b * chroma))
+
+def mode_palette(palette, mode):
+    """The palette itself for its own appearance, else one with mirrored background and foreground"""
+    if appearance(palette) == mode:
+        return palette
+    bg = color_to_oklab(palette.background)[0]
+    fg = color_to_oklab(palette.foreground)[0]
+    if mode == "light":
+        bg, fg = max(LIGHT_BACKGROUND, 1 - bg), min(LIGHT_FOREGROUND, 1 - fg)
+    else:
+        bg, fg = min(DARK_BACKGROUND, 1 - bg), max(DARK_FOREGROUND, 1 - fg)
+    return palette.variant(_relight(palette, palette.background, bg, MIRRORED_CHROMA),
+                           _relight(palette, palette.foreground, fg, MIRRORED_CHROMA))
+
+def high_contrast_palette(palette, mode):
+    """The palette with its background deepened to a mirrored one's lightness, if it is not already"""
+    # Mid-tone backgrounds cannot reach AAA against any text color
+    bg = color_to_oklab(palette.background)[0]
+    if (bg <= DARK_BACKGROUND) if mode == "dark" else (bg >= LIGHT_BACKGROUND):
+        return palette
+    limit = DARK_BACKGROUND if mode == "dark" else LIGHT_BACKGROUND
+    return palette.variant(_relight(palette, palette.background, limit, 1.0), palette.foreground)
+
+_variants = weakref.WeakKeyDictionary()
+
+def theme_variants(palette, names=None):
+    """Variants of a palette, built once and shared by every emitter that asks"""
+    names = variant_names() if names is None else tuple(names)
+    target = min_contrast()
+    per_palette = _variants.setdefault(palette, {})
+    key = (names, target)
+    if key not in per_palette:
+        modes = {}
+        variants = []
+        for name in names:
+            title, mode, high_contrast = VARIANTS[name]
+            if mode not in modes:
+                modes[mode] = mode_palette(palette, mode)
+            if high_contrast and (mode, True) not in modes:
+                modes[mode, True] = high_contrast_palette(modes[mode], mode)
+            variant_palette = modes[mode, True] if high_contrast else modes[mode]
+            variants.append(Variant(name, title, mode, variant_palette,
+                                    max(HIGH_CONTRAST, target) if high_contrast else target))
+        per_palette[key] = variants
+    return per_palette[key]
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# Theme Update Timings
+# Shared instrumentation for update_zed.py and scripts/update_iterm2.py.
+# Generators mark their stages with `with stage("derive"):`; a run opened with
+# trace() times them on the monotonic clock and appends one JSON record per
+# run to ~/.cache/wal/trace.jsonl, rotated once it outgrows
+# PYWAL_TRACE_MAX_KB (default 512 KB, two old files kept).
+#
+# Tracing is off unless a generator runs with --timings or PYWAL_TIMINGS=1
+# is set, in which case stage() is a no-op costing one attribute lookup.
+#
+# Usage: timings.py report [--tool NAME] [--last N]
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 512 * 1024
+BACKUPS = 2
+
+_local = threading.local()
+
+def trace_file():
+    """Where run records are appended"""
+    return os.path.expanduser("~/.cache/wal/trace.jsonl")
+
+def enabled():
+    """Tracing can be switched on for every run with PYWAL_TIMINGS=1"""
+    return bool(os.environ.get("PYWAL_TIMINGS"))
+
+def max_bytes():
+    size = os.environ.get("PYWAL_TRACE_MAX_KB")
+    return int(float(size) * 1024) if size else DEFAULT_MAX_BYTES
+
+def append_line(path, line, limit, backups=BACKUPS):
+    """Append a line to path, rotating path -> path.1 -> ... once it exceeds limit"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        if os.path.getsize(path) >= limit:
+            for i in range(backups, 0, -1):
+                older = f"{path}.{i - 1}" if i > 1 else path
+                if os.path.exists(older):
+                    os.replace(older, f"{path}.{i}")
+    except OSError:
+        pass
+    # One write on an O_APPEND file, so concurrent runs do not interleave
+    with open(path, 'a') as f:
+        f.write(line.rstrip("\n") + "\n")
+
+class Trace:
+    """Stage timings for one generator run"""
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.started = time.time()
+        self.start = time.monotonic()
+        self.stages = {}
+        # Set by the caller to report a failure that did not raise
+        self.ok = None
+
+    def record(self, name, seconds):
+        # A stage entered twice (e.g. two symlinks) accumulates
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def as_record(self, ok):
+        return {
+            "ts": round(self.started, 3),
+            "tool": self.tool,
+            "pid": os.getpid(),
+            "ok": ok if self.ok is None else self.ok,
+            "total_ms": round((time.monotonic() - self.start) * 1000, 3),
+            "stages": {name: round(s * 1000, 3) for name, s in self.stages.items()},
+        }
+
+    def summary(self):
+        """Printable per-stage breakdown"""
+        lines = [f"⏱  {self.tool} timings:"]
+        for name, seconds in self.stages.items():
+            lines.append(f"   {name:<14} {seconds * 1000:8.2f} ms")
+        lines.append(f"   {'total':<14} {(time.monotonic() - self.start) * 1000:8.2f} ms")
+        return "\n".join(lines)
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a block against the run traced in this thread, if any"""
+    current = getattr(_local, "trace", None)
+    if current is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        current.record(name, time.monotonic() - start)
+
+@contextlib.contextmanager
+def trace(tool, show=False):
+    """Trace one run of a generator in this thread
+
+    Records only when show is set (--timings) or PYWAL_TIMINGS is on;
+    show also prints the breakdown when the run ends.
+    """
+    if not (show or enabled()) or getattr(_local, "trace", None) is not None:
+        yield None
+        return
+
+    current = _local.trace = Trace(tool)
+    ok = False
+    try:
+        yield current
+        ok = True
+    except SystemExit as e:
+        ok = not e.code
+        raise
+    finally:
+        _local.trace = None
+        try:
+            append_line(trace_file(), json.dumps(current.as_record(ok)), max_bytes())
+        except OSError:
+            pass
+        if show:
+            print(current.summary())
+
+def read_records(path=None):
+    """All records in the trace file and its rotated predecessors, oldest first"""
+    path = path or trace_file()
+    records = []
+    for candidate in [f"{path}.{i}" for i in range(BACKUPS, 0, -1)] + [path]:
+        try:
+            with open(candidate, 'r') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return records
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(records):
+    """{tool: {stage: [ms, ...]}} including a "total" stage per run"""
+    by_tool = {}
+    for record in records:
+        stages = by_tool.setdefault(record.get("tool", "?"), {})
+        for name, ms in record.get("stages", {}).items():
+            stages.setdefault(name, []).append(ms)
+        stages.setdefault("total", []).append(record.get("total_ms", 0.0))
+    return by_tool
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize theme update timings")
+    sub = parser.add_subparsers(dest="command")
+    report = sub.add_parser("report", help="p50/p95 latency per stage")
+    report.add_argument("--tool", help="only this generator (e.g. zed, iterm)")
+    report.add_argument("--last", type=int, help="only the most recent N runs")
+    args = parser.parse_args(argv)
+
+    if args.command != "report":
+        parser.print_help()
+        return 1
+
+    records = read_records()
+    if args.tool:
+        records = [r for r in records if r.get("tool") == args.tool]
+    if args.last:
+        records = records[-args.last:]
+    if not records:
+        print(f"No timings recorded yet in {trace_file()} (run with --timings or PYWAL_TIMINGS=1)")
+        return 1
+
+    for tool, stages in sorted(summarize(records).items()):
+        runs = len(stages["total"])
+        failed = sum(1 for r in records if r.get("tool") == tool and not r.get("ok", True))
+        print(f"⏱  {tool}: {runs} runs" + (f", {failed} failed" if failed else ""))
+        print(f"   {'stage':<14} {'p50':>9} {'p95':>9} {'max':>9}")
+        for name, values in stages.items():
+            if name == "total":
+                continue
+            print(f"   {name:<14} {percentile(values, 50):7.2f}ms {percentile(values, 95):7.2f}ms {max(values):7.2f}ms")
+        values = stages["total"]
+        print(f"   {'total':<14} {percentile(values, 50):7.2f}ms {percentile(values, 95):7.2f}ms {max(values):7.2f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
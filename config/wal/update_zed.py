@@ -3,27 +3,42 @@
 # Zed Theme Generator for Pywal (Correct Schema v0.2.0)
 # Generates a proper Zed theme family from pywal colors
 
+import argparse
 import json
 import os
 from pathlib import Path
 
+from artifact_writer import ensure_symlink, write_artifact
+from color_math import ColorMath
+from contrast import contrast_solution
+from jsonc_patch import JSONCError, set_member
+from palette import Palette, as_color, colors_file
+from theme_cache import ThemeCache, cache_enabled, palette_digest
+from theme_rules import RuleError, cached_plan, fingerprint
+from theme_variants import VARIANTS, appearance as theme_appearance, theme_variants, variant_names
+from timings import stage, trace
+
+def vectorized_deriver():
+    """Optional NumPy engine, used only with PYWAL_VECTORIZED=1
+
+    The rule plan derives each distinct color once, which leaves too little
+    work for NumPy's batching to pay for its own set-up (or its import).
+    """
+    if not os.environ.get("PYWAL_VECTORIZED"):
+        return None
+    try:
+        from color_engine import VectorizedDeriver
+    except ImportError:
+        return None
+    return VectorizedDeriver
+
 def hex_to_rgb(hex_color):
     """Convert hex color to RGB tuple (0-1 range)"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) / 255.0 for i in (0, 2, 4))
+    return as_color(hex_color).rgb
 
 def calculate_luminance(hex_color):
     """Calculate relative luminance of a color"""
-    rgb = hex_to_rgb(hex_color)
-
-    def linearize(c):
-        if c <= 0.03928:
-            return c / 12.92
-        else:
-            return pow((c + 0.055) / 1.055, 2.4)
-
-    r, g, b = [linearize(c) for c in rgb]
-    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+    return as_color(hex_color).luminance
 
 def adjust_color_brightness(hex_color, factor):
     """Adjust brightness of a color by factor (0.0-2.0)"""
@@ -51,48 +66,492 @@ def blend_colors(color1, color2, ratio=0.5):
         int(blended[2] * 255)
     )
 
-def create_zed_theme_family():
-    """Create Zed theme family from pywal colors"""
-
-    # Read pywal colors
-    colors_file = os.path.expanduser("~/.cache/wal/colors.json")
+def zed_rules_file():
+    """User override table for STYLE_RULES"""
+    return os.environ.get("PYWAL_ZED_RULES") or os.path.expanduser("~/.config/wal/zed_rules.json")
+
+def zed_theme_file():
+    """Where the Zed theme family is installed (in dotfiles, symlinked into Zed's config)"""
+    return Path.home() / "dotfiles" / "config" / "zed" / "themes" / "pywal.json"
+
+def zed_cache_name(math=None):
+    """Theme cache artifact name, distinct per override table and color math"""
+    math = math or ColorMath.from_env()
+    name = "zed"
+    rules = fingerprint(zed_rules_file())
+    if rules:
+        name += f"-{rules}"
+    if not math.is_default:
+        name += f"-{math.name}"
+    return name
+
+_rejected_rules = set()
+
+def style_plan():
+    """Compiled STYLE_RULES with the user's overrides, or without them if they do not compile"""
+    path = zed_rules_file()
+    try:
+        return cached_plan(STYLE_RULES, path)
+    except RuleError as e:
+        # Said once per broken file version, not on every render
+        if (path, fingerprint(path)) not in _rejected_rules:
+            _rejected_rules.add((path, fingerprint(path)))
+            print(f"⚠️  Ignoring Zed rule overrides ({e}); using the built-in rules")
+        return cached_plan(STYLE_RULES, None)
+
+# Theme style as a rule table: each key maps to a color expression over the
+# palette (see theme_rules.py for the syntax). Entries in zed_rules_file()
+# are merged over this table.
+STYLE_RULES = {
+    # Basic colors
+    "background": "bg",
+    "text": "fg",
+    "text.muted": "adjust(fg, 0.7)",
+    "text.placeholder": "adjust(fg, 0.5)",
+    "text.disabled": "adjust(fg, 0.4)",
+    "text.accent": "accent(4)",
+
+    # Icon colors
+    "icon": "fg",
+    "icon.muted": "adjust(fg, 0.6)",
+    "icon.disabled": "adjust(fg, 0.4)",
+    "icon.placeholder": "adjust(fg, 0.5)",
+    "icon.accent": "accent(4)",
+
+    # Border colors
+    "border": "adjust(fg, 0.2)",
+    "border.variant": "adjust(fg, 0.15)",
+    "border.focused": "accent(4)",
+    "border.selected": "accent(4)",
+    "border.transparent": "#00000000",
+    "border.disabled": "adjust(fg, 0.1)",
+
+    # Surface colors
+    "surface.background": "bg",
+    "elevated_surface.background": "adjust(bg, ifdark(1.05, 0.95))",
+
+    # Element colors
+    "element.background": "transparent",
+    "element.hover": "blend(bg, fg, 0.1)",
+    "element.active": "blend(bg, accent(4), 0.2)",
+    "element.selected": "blend(bg, accent(4), 0.15)",
+    "element.disabled": "adjust(bg, ifdark(0.9, 1.1))",
+
+    # Ghost element (subtle interactive)
+    "ghost_element.background": "transparent",
+    "ghost_element.hover": "blend(bg, fg, 0.05)",
+    "ghost_element.active": "blend(bg, fg, 0.1)",
+    "ghost_element.selected": "blend(bg, accent(4), 0.1)",
+    "ghost_element.disabled": "transparent",
+
+    # Drop target
+    "drop_target.background": "blend(bg, accent(4), 0.3)",
+
+    # Status colors
+    "status_bar.background": "adjust(bg, ifdark(0.95, 1.05))",
+    "title_bar.background": "bg",
+    "title_bar.inactive_background": "adjust(bg, ifdark(0.9, 1.1))",
+    "toolbar.background": "bg",
+
+    # Panel
+    "panel.background": "bg",
+    "panel.focused_border": "accent(4)",
+
+    # Pane
+    "pane.focused_border": "accent(4)",
+    "pane_group.border": "adjust(fg, 0.2)",
+
+    # Tab colors
+    "tab_bar.background": "adjust(bg, ifdark(0.95, 1.05))",
+    "tab.inactive_background": "transparent",
+    "tab.active_background": "bg",
+
+    # Editor colors
+    "editor.background": "bg",
+    "editor.foreground": "fg",
+    "editor.gutter.background": "bg",
+    "editor.subheader.background": "adjust(bg, ifdark(0.95, 1.05))",
+    "editor.active_line.background": "blend(bg, fg, 0.05)",
+    "editor.highlighted_line.background": "blend(bg, accent(3), 0.1)",
+    "editor.line_number": "adjust(fg, 0.4)",
+    "editor.active_line_number": "fg",
+    "editor.invisible": "adjust(fg, 0.3)",
+    "editor.wrap_guide": "adjust(fg, 0.2)",
+    "editor.active_wrap_guide": "adjust(fg, 0.4)",
+    "editor.indent_guide": "adjust(fg, 0.2)",
+    "editor.indent_guide_active": "adjust(fg, 0.4)",
+    "editor.document_highlight.read_background": "blend(bg, accent(3), 0.2)",
+    "editor.document_highlight.write_background": "blend(bg, accent(1), 0.2)",
+    "editor.document_highlight.bracket_background": "blend(bg, accent(4), 0.2)",
+
+    # Terminal
+    "terminal.background": "bg",
+    "terminal.foreground": "fg",
+    "terminal.bright_foreground": "fg",
+    "terminal.dim_foreground": "adjust(fg, 0.7)",
+    "terminal.ansi.background": "bg",
+    "terminal.ansi.black": "ansi(0)",
+    "terminal.ansi.red": "ansi(1)",
+    "terminal.ansi.green": "ansi(2)",
+    "terminal.ansi.yellow": "ansi(3)",
+    "terminal.ansi.blue": "ansi(4)",
+    "terminal.ansi.magenta": "ansi(5)",
+    "terminal.ansi.cyan": "ansi(6)",
+    "terminal.ansi.white": "ansi(7)",
+    "terminal.ansi.bright_black": "ansi(8)",
+    "terminal.ansi.bright_red": "ansi(9)",
+    "terminal.ansi.bright_green": "ansi(10)",
+    "terminal.ansi.bright_yellow": "ansi(11)",
+    "terminal.ansi.bright_blue": "ansi(12)",
+    "terminal.ansi.bright_magenta": "ansi(13)",
+    "terminal.ansi.bright_cyan": "ansi(14)",
+    "terminal.ansi.bright_white": "ansi(15)",
+
+    # Search
+    "search.match_background": "blend(bg, accent(3), 0.4)",
+
+    # Scrollbar
+    "scrollbar.track.background": "transparent",
+    "scrollbar.track.border": "transparent",
+    "scrollbar.thumb.background": "adjust(fg, 0.3)",
+    "scrollbar.thumb.border": "transparent",
+    "scrollbar.thumb.hover_background": "adjust(fg, 0.4)",
+
+    # Status indicators
+    "success": "accent(2)",
+    "success.background": "blend(bg, accent(2), 0.2)",
+    "success.border": "accent(2)",
+
+    "warning": "accent(3)",
+    "warning.background": "blend(bg, accent(3), 0.2)",
+    "warning.border": "accent(3)",
+
+    "error": "accent(1)",
+    "error.background": "blend(bg, accent(1), 0.2)",
+    "error.border": "accent(1)",
+
+    "info": "accent(4)",
+    "info.background": "blend(bg, accent(4), 0.2)",
+    "info.border": "accent(4)",
+
+    "hint": "adjust(fg, 0.6)",
+    "hint.background": "blend(bg, fg, 0.1)",
+    "hint.border": "adjust(fg, 0.6)",
+
+    # Git status colors
+    "created": "accent(2)",
+    "created.background": "blend(bg, accent(2), 0.2)",
+    "created.border": "accent(2)",
+
+    "modified": "accent(3)",
+    "modified.background": "blend(bg, accent(3), 0.2)",
+    "modified.border": "accent(3)",
+
+    "deleted": "accent(1)",
+    "deleted.background": "blend(bg, accent(1), 0.2)",
+    "deleted.border": "accent(1)",
+
+    "renamed": "accent(4)",
+    "renamed.background": "blend(bg, accent(4), 0.2)",
+    "renamed.border": "accent(4)",
+
+    "conflict": "accent(5)",
+    "conflict.background": "blend(bg, accent(5), 0.2)",
+    "conflict.border": "accent(5)",
+
+    "ignored": "adjust(fg, 0.5)",
+    "ignored.background": "blend(bg, fg, 0.05)",
+    "ignored.border": "adjust(fg, 0.5)",
+
+    "hidden": "adjust(fg, 0.4)",
+    "hidden.background": "transparent",
+    "hidden.border": "adjust(fg, 0.4)",
+
+    "predictive": "adjust(fg, 0.5)",
+    "predictive.background": "blend(bg, fg, 0.05)",
+    "predictive.border": "adjust(fg, 0.5)",
+
+    "unreachable": "adjust(fg, 0.3)",
+    "unreachable.background": "adjust(bg, ifdark(0.8, 1.2))",
+    "unreachable.border": "adjust(fg, 0.3)",
+
+    # Link colors
+    "link_text.hover": "accent(4)",
+
+    # Syntax highlighting (proper v0.2.0 format)
+    "syntax": {
+        # Comments
+        "comment": {
+            "color": "adjust(fg, 0.6)",
+            "font_style": "'italic'"
+        },
+        "comment.doc": {
+            "color": "adjust(fg, 0.7)",
+            "font_style": "'italic'"
+        },
+
+        # Keywords
+        "keyword": {
+            "color": "accent(1)"
+        },
+
+        # Strings
+        "string": {
+            "color": "accent(2)"
+        },
+        "string.escape": {
+            "color": "accent(6)"
+        },
+        "string.regex": {
+            "color": "accent(6)"
+        },
+
+        # Numbers and constants
+        "number": {
+            "color": "accent(3)"
+        },
+        "constant": {
+            "color": "accent(3)"
+        },
+        "boolean": {
+            "color": "accent(5)"
+        },
+
+        # Functions
+        "function": {
+            "color": "accent(4)"
+        },
+        "constructor": {
+            "color": "accent(4)"
+        },
+
+        # Types
+        "type": {
+            "color": "accent(5)"
+        },
+        "enum": {
+            "color": "accent(5)"
+        },
+
+        # Variables
+        "variable": {
+            "color": "fg"
+        },
+        "variable.special": {
+            "color": "accent(5)"
+        },
+
+        # Properties and attributes
+        "property": {
+            "color": "accent(4)"
+        },
+        "attribute": {
+            "color": "accent(3)"
+        },
+
+        # Operators
+        "operator": {
+            "color": "accent(6)"
+        },
+
+        # Punctuation
+        "punctuation": {
+            "color": "adjust(fg, 0.8)"
+        },
+        "punctuation.bracket": {
+            "color": "adjust(fg, 0.9)"
+        },
+        "punctuation.delimiter": {
+            "color": "adjust(fg, 0.8)"
+        },
+
+        # Tags (HTML/XML)
+        "tag": {
+            "color": "accent(1)"
+        },
+
+        # Labels
+        "label": {
+            "color": "accent(4)"
+        },
+
+        # Text and literals
+        "text.literal": {
+            "color": "accent(2)"
+        },
+
+        # Titles and headings
+        "title": {
+            "color": "accent(4)",
+            "font_weight": 700
+        },
+
+        # Links
+        "link_text": {
+            "color": "accent(4)",
+            "font_style": "'italic'"
+        },
+        "link_uri": {
+            "color": "accent(6)"
+        },
+
+        # Emphasis
+        "emphasis": {
+            "font_style": "'italic'"
+        },
+        "emphasis.strong": {
+            "font_weight": 700
+        },
+
+        # Special elements
+        "embedded": {
+            "color": "fg"
+        },
+        "preproc": {
+            "color": "accent(1)"
+        },
+        "primary": {
+            "color": "fg"
+        },
+        "variant": {
+            "color": "accent(5)"
+        },
+
+        # Editor hints and diagnostics
+        "hint": {
+            "color": "adjust(fg, 0.6)",
+            "font_weight": 700
+        },
+        "predictive": {
+            "color": "adjust(fg, 0.5)",
+            "font_style": "'italic'"
+        },
+    },
+
+    # Players (for collaborative editing)
+    "players": [
+        {
+            "cursor": "accent(4)",
+            "background": "accent(4)",
+            "selection": "blend(bg, accent(4), 0.3)"
+        },
+        {
+            "cursor": "accent(2)",
+            "background": "accent(2)",
+            "selection": "blend(bg, accent(2), 0.3)"
+        },
+        {
+            "cursor": "accent(3)",
+            "background": "accent(3)",
+            "selection": "blend(bg, accent(3), 0.3)"
+        },
+        {
+            "cursor": "accent(5)",
+            "background": "accent(5)",
+            "selection": "blend(bg, accent(5), 0.3)"
+        }
+    ]
+}
 
-    if not os.path.exists(colors_file):
+def load_palette():
+    """Load the pywal palette, or None if wal has not run yet"""
+    if not os.path.exists(colors_file()):
         print("❌ No pywal colors found. Run 'walupdate' first.")
-        return False
+        return None
+    with stage("palette_load"):
+        return Palette.load()
 
-    with open(colors_file, 'r') as f:
-        colors = json.load(f)
+# Rule ops whose results differ between theme variants
+VARIANT_OPS = ("bg", "fg", "accent", "ansi", "ifdark")
 
-    # Extract key colors
-    background = colors['special']['background']
-    foreground = colors['special']['foreground']
+def create_zed_theme_family(palette=None, math=None):
+    """Create Zed theme family from pywal colors
+
+    The family holds the "Pywal" theme in the palette's own appearance plus
+    the variants from theme_variants.py. math is the ColorMath for derived
+    colors (default: from the environment).
+    """
+
+    # Read pywal colors
+    if palette is None:
+        palette = load_palette()
+        if palette is None:
+            return False
+
+    # Extract key colors; text colors are lifted to the target contrast ratio
+    solution = contrast_solution(palette)
+    background = palette.background.hex
+    foreground = solution.foreground
 
     # Determine if theme is dark or light
-    bg_luminance = calculate_luminance(background)
-    is_dark = bg_luminance < 0.5
-    appearance = "dark" if is_dark else "light"
+    appearance = theme_appearance(palette)
+    variants = theme_variants(palette)
 
     print(f"🎨 Creating {appearance} theme from wallpaper colors")
     print(f"   Background: {background}")
     print(f"   Foreground: {foreground}")
+    if variants:
+        print(f"   Variants: {', '.join(v.key for v in variants)}")
 
     # Smart color assignment for syntax highlighting
-    color_palette = [colors['colors'][f'color{i}'] for i in range(16)]
-
-    # Find best colors for different syntax elements
-    def get_accent_color(index, fallback_brightness=1.2):
-        """Get an accent color, adjusting brightness if needed"""
-        if index < len(color_palette):
-            color = color_palette[index]
-            # Ensure good contrast with background
-            color_lum = calculate_luminance(color)
-            if abs(color_lum - bg_luminance) < 0.3:
-                # Adjust brightness for better contrast
-                factor = fallback_brightness if is_dark else 0.8
-                return adjust_color_brightness(color, factor)
-            return color
-        return foreground
+    color_palette = palette.hex_colors()
+    math = math or ColorMath.from_env()
+
+    def operations(variant_palette, is_dark, target=None):
+        """Rule ops for one variant; only VARIANT_OPS differ between variants"""
+        solution = contrast_solution(variant_palette, target)
+        background = variant_palette.background.hex
+        foreground = solution.foreground
+
+        # Pick the color derivation engine: the scalar helpers above, batched
+        # NumPy tables when asked for (identical output either way), or the
+        # perceptual / rounded ColorMath
+        VectorizedDeriver = vectorized_deriver() if math.is_default else None
+        if not math.is_default:
+            def adjust(hex_color, factor):
+                return math.adjust(palette.intern(hex_color), factor)
+
+            def blend(color1, color2, ratio=0.5):
+                return math.blend(palette.intern(color1), palette.intern(color2), ratio)
+        elif VectorizedDeriver is not None:
+            deriver = VectorizedDeriver(variant_palette, foreground, solution.accents)
+            adjust, blend = deriver.adjust, deriver.blend
+        else:
+            # Route hex strings through the palette so each one is parsed once
+            def adjust(hex_color, factor):
+                return adjust_color_brightness(palette.intern(hex_color), factor)
+
+            def blend(color1, color2, ratio=0.5):
+                return blend_colors(palette.intern(color1), palette.intern(color2), ratio)
+
+        return {
+            "bg": lambda: background,
+            "fg": lambda: foreground,
+            "color": lambda index: color_palette[index],
+            "accent": solution.accent,
+            "ansi": lambda index: solution.ansi[index],
+            "adjust": adjust,
+            "blend": blend,
+            "lighten": lambda color, amount: math.lighten(palette.intern(color), amount),
+            "darken": lambda color, amount: math.darken(palette.intern(color), amount),
+            "mix": lambda color1, color2, ratio: math.mix(palette.intern(color1), palette.intern(color2), ratio),
+            "saturate": lambda color, factor: math.saturate(palette.intern(color), factor),
+            "ifdark": lambda dark, light: dark if is_dark else light,
+        }
+
+    # One op set per distinct (palette, contrast target); the variant
+    # matching the palette's own appearance shares the base theme's style
+    themes = [("Pywal", appearance, (palette, solution.target))]
+    themes += [(v.name, v.appearance, (v.palette, v.target)) for v in variants]
+    distinct = {}
+    for _, mode, key in themes:
+        if key not in distinct:
+            distinct[key] = operations(key[0], mode == "dark", key[1])
+
+    # Every distinct expression in the rule table is derived exactly once,
+    # and once across variants unless it depends on the background
+    plan = style_plan()
+    styles = dict(zip(distinct, plan.evaluate_many(list(distinct.values()), VARIANT_OPS)))
 
     # Create the theme family (proper Zed v0.2.0 format)
     theme_family = {
@@ -100,490 +559,182 @@ def create_zed_theme_family():
         "name": "Pywal",
         "themes": [
             {
-                "name": "Pywal",
-                "appearance": appearance,
-                "style": {
-                    # Basic colors
-                    "background": background,
-                    "text": foreground,
-                    "text.muted": adjust_color_brightness(foreground, 0.7),
-                    "text.placeholder": adjust_color_brightness(foreground, 0.5),
-                    "text.disabled": adjust_color_brightness(foreground, 0.4),
-                    "text.accent": get_accent_color(4),
-
-                    # Icon colors
-                    "icon": foreground,
-                    "icon.muted": adjust_color_brightness(foreground, 0.6),
-                    "icon.disabled": adjust_color_brightness(foreground, 0.4),
-                    "icon.placeholder": adjust_color_brightness(foreground, 0.5),
-                    "icon.accent": get_accent_color(4),
-
-                    # Border colors
-                    "border": adjust_color_brightness(foreground, 0.2),
-                    "border.variant": adjust_color_brightness(foreground, 0.15),
-                    "border.focused": get_accent_color(4),
-                    "border.selected": get_accent_color(4),
-                    "border.transparent": "#00000000",
-                    "border.disabled": adjust_color_brightness(foreground, 0.1),
-
-                    # Surface colors
-                    "surface.background": background,
-                    "elevated_surface.background": adjust_color_brightness(background, 1.05 if is_dark else 0.95),
-
-                    # Element colors
-                    "element.background": "transparent",
-                    "element.hover": blend_colors(background, foreground, 0.1),
-                    "element.active": blend_colors(background, get_accent_color(4), 0.2),
-                    "element.selected": blend_colors(background, get_accent_color(4), 0.15),
-                    "element.disabled": adjust_color_brightness(background, 0.9 if is_dark else 1.1),
-
-                    # Ghost element (subtle interactive)
-                    "ghost_element.background": "transparent",
-                    "ghost_element.hover": blend_colors(background, foreground, 0.05),
-                    "ghost_element.active": blend_colors(background, foreground, 0.1),
-                    "ghost_element.selected": blend_colors(background, get_accent_color(4), 0.1),
-                    "ghost_element.disabled": "transparent",
-
-                    # Drop target
-                    "drop_target.background": blend_colors(background, get_accent_color(4), 0.3),
-
-                    # Status colors
-                    "status_bar.background": adjust_color_brightness(background, 0.95 if is_dark else 1.05),
-                    "title_bar.background": background,
-                    "title_bar.inactive_background": adjust_color_brightness(background, 0.9 if is_dark else 1.1),
-                    "toolbar.background": background,
-
-                    # Panel
-                    "panel.background": background,
-                    "panel.focused_border": get_accent_color(4),
-
-                    # Pane
-                    "pane.focused_border": get_accent_color(4),
-                    "pane_group.border": adjust_color_brightness(foreground, 0.2),
-
-                    # Tab colors
-                    "tab_bar.background": adjust_color_brightness(background, 0.95 if is_dark else 1.05),
-                    "tab.inactive_background": "transparent",
-                    "tab.active_background": background,
-
-                    # Editor colors
-                    "editor.background": background,
-                    "editor.foreground": foreground,
-                    "editor.gutter.background": background,
-                    "editor.subheader.background": adjust_color_brightness(background, 0.95 if is_dark else 1.05),
-                    "editor.active_line.background": blend_colors(background, foreground, 0.05),
-                    "editor.highlighted_line.background": blend_colors(background, get_accent_color(3), 0.1),
-                    "editor.line_number": adjust_color_brightness(foreground, 0.4),
-                    "editor.active_line_number": foreground,
-                    "editor.invisible": adjust_color_brightness(foreground, 0.3),
-                    "editor.wrap_guide": adjust_color_brightness(foreground, 0.2),
-                    "editor.active_wrap_guide": adjust_color_brightness(foreground, 0.4),
-                    "editor.indent_guide": adjust_color_brightness(foreground, 0.2),
-                    "editor.indent_guide_active": adjust_color_brightness(foreground, 0.4),
-                    "editor.document_highlight.read_background": blend_colors(background, get_accent_color(3), 0.2),
-                    "editor.document_highlight.write_background": blend_colors(background, get_accent_color(1), 0.2),
-                    "editor.document_highlight.bracket_background": blend_colors(background, get_accent_color(4), 0.2),
-
-                    # Terminal
-                    "terminal.background": background,
-                    "terminal.foreground": foreground,
-                    "terminal.bright_foreground": foreground,
-                    "terminal.dim_foreground": adjust_color_brightness(foreground, 0.7),
-                    "terminal.ansi.background": background,
-                    "terminal.ansi.black": color_palette[0],
-                    "terminal.ansi.red": color_palette[1],
-                    "terminal.ansi.green": color_palette[2],
-                    "terminal.ansi.yellow": color_palette[3],
-                    "terminal.ansi.blue": color_palette[4],
-                    "terminal.ansi.magenta": color_palette[5],
-                    "terminal.ansi.cyan": color_palette[6],
-                    "terminal.ansi.white": color_palette[7],
-                    "terminal.ansi.bright_black": color_palette[8],
-                    "terminal.ansi.bright_red": color_palette[9],
-                    "terminal.ansi.bright_green": color_palette[10],
-                    "terminal.ansi.bright_yellow": color_palette[11],
-                    "terminal.ansi.bright_blue": color_palette[12],
-                    "terminal.ansi.bright_magenta": color_palette[13],
-                    "terminal.ansi.bright_cyan": color_palette[14],
-                    "terminal.ansi.bright_white": color_palette[15],
-
-                    # Search
-                    "search.match_background": blend_colors(background, get_accent_color(3), 0.4),
-
-                    # Scrollbar
-                    "scrollbar.track.background": "transparent",
-                    "scrollbar.track.border": "transparent",
-                    "scrollbar.thumb.background": adjust_color_brightness(foreground, 0.3),
-                    "scrollbar.thumb.border": "transparent",
-                    "scrollbar.thumb.hover_background": adjust_color_brightness(foreground, 0.4),
-
-                    # Status indicators
-                    "success": get_accent_color(2),
-                    "success.background": blend_colors(background, get_accent_color(2), 0.2),
-                    "success.border": get_accent_color(2),
-
-                    "warning": get_accent_color(3),
-                    "warning.background": blend_colors(background, get_accent_color(3), 0.2),
-                    "warning.border": get_accent_color(3),
-
-                    "error": get_accent_color(1),
-                    "error.background": blend_colors(background, get_accent_color(1), 0.2),
-                    "error.border": get_accent_color(1),
-
-                    "info": get_accent_color(4),
-                    "info.background": blend_colors(background, get_accent_color(4), 0.2),
-                    "info.border": get_accent_color(4),
-
-                    "hint": adjust_color_brightness(foreground, 0.6),
-                    "hint.background": blend_colors(background, foreground, 0.1),
-                    "hint.border": adjust_color_brightness(foreground, 0.6),
-
-                    # Git status colors
-                    "created": get_accent_color(2),
-                    "created.background": blend_colors(background, get_accent_color(2), 0.2),
-                    "created.border": get_accent_color(2),
-
-                    "modified": get_accent_color(3),
-                    "modified.background": blend_colors(background, get_accent_color(3), 0.2),
-                    "modified.border": get_accent_color(3),
-
-                    "deleted": get_accent_color(1),
-                    "deleted.background": blend_colors(background, get_accent_color(1), 0.2),
-                    "deleted.border": get_accent_color(1),
-
-                    "renamed": get_accent_color(4),
-                    "renamed.background": blend_colors(background, get_accent_color(4), 0.2),
-                    "renamed.border": get_accent_color(4),
-
-                    "conflict": get_accent_color(5),
-                    "conflict.background": blend_colors(background, get_accent_color(5), 0.2),
-                    "conflict.border": get_accent_color(5),
-
-                    "ignored": adjust_color_brightness(foreground, 0.5),
-                    "ignored.background": blend_colors(background, foreground, 0.05),
-                    "ignored.border": adjust_color_brightness(foreground, 0.5),
-
-                    "hidden": adjust_color_brightness(foreground, 0.4),
-                    "hidden.background": "transparent",
-                    "hidden.border": adjust_color_brightness(foreground, 0.4),
-
-                    "predictive": adjust_color_brightness(foreground, 0.5),
-                    "predictive.background": blend_colors(background, foreground, 0.05),
-                    "predictive.border": adjust_color_brightness(foreground, 0.5),
-
-                    "unreachable": adjust_color_brightness(foreground, 0.3),
-                    "unreachable.background": adjust_color_brightness(background, 0.8 if is_dark else 1.2),
-                    "unreachable.border": adjust_color_brightness(foreground, 0.3),
-
-                    # Link colors
-                    "link_text.hover": get_accent_color(4),
-
-                    # Syntax highlighting (proper v0.2.0 format)
-                    "syntax": {
-                        # Comments
-                        "comment": {
-                            "color": adjust_color_brightness(foreground, 0.6),
-                            "font_style": "italic"
-                        },
-                        "comment.doc": {
-                            "color": adjust_color_brightness(foreground, 0.7),
-                            "font_style": "italic"
-                        },
-
-                        # Keywords
-                        "keyword": {
-                            "color": get_accent_color(1)
-                        },
-
-                        # Strings
-                        "string": {
-                            "color": get_accent_color(2)
-                        },
-                        "string.escape": {
-                            "color": get_accent_color(6)
-                        },
-                        "string.regex": {
-                            "color": get_accent_color(6)
-                        },
-
-                        # Numbers and constants
-                        "number": {
-                            "color": get_accent_color(3)
-                        },
-                        "constant": {
-                            "color": get_accent_color(3)
-                        },
-                        "boolean": {
-                            "color": get_accent_color(5)
-                        },
-
-                        # Functions
-                        "function": {
-                            "color": get_accent_color(4)
-                        },
-                        "constructor": {
-                            "color": get_accent_color(4)
-                        },
-
-                        # Types
-                        "type": {
-                            "color": get_accent_color(5)
-                        },
-                        "enum": {
-                            "color": get_accent_color(5)
-                        },
-
-                        # Variables
-                        "variable": {
-                            "color": foreground
-                        },
-                        "variable.special": {
-                            "color": get_accent_color(5)
-                        },
-
-                        # Properties and attributes
-                        "property": {
-                            "color": get_accent_color(4)
-                        },
-                        "attribute": {
-                            "color": get_accent_color(3)
-                        },
-
-                        # Operators
-                        "operator": {
-                            "color": get_accent_color(6)
-                        },
-
-                        # Punctuation
-                        "punctuation": {
-                            "color": adjust_color_brightness(foreground, 0.8)
-                        },
-                        "punctuation.bracket": {
-                            "color": adjust_color_brightness(foreground, 0.9)
-                        },
-                        "punctuation.delimiter": {
-                            "color": adjust_color_brightness(foreground, 0.8)
-                        },
-
-                        # Tags (HTML/XML)
-                        "tag": {
-                            "color": get_accent_color(1)
-                        },
-
-                        # Labels
-                        "label": {
-                            "color": get_accent_color(4)
-                        },
-
-                        # Text and literals
-                        "text.literal": {
-                            "color": get_accent_color(2)
-                        },
-
-                        # Titles and headings
-                        "title": {
-                            "color": get_accent_color(4),
-                            "font_weight": 700
-                        },
-
-                        # Links
-                        "link_text": {
-                            "color": get_accent_color(4),
-                            "font_style": "italic"
-                        },
-                        "link_uri": {
-                            "color": get_accent_color(6)
-                        },
-
-                        # Emphasis
-                        "emphasis": {
-                            "font_style": "italic"
-                        },
-                        "emphasis.strong": {
-                            "font_weight": 700
-                        },
-
-                        # Special elements
-                        "embedded": {
-                            "color": foreground
-                        },
-                        "preproc": {
-                            "color": get_accent_color(1)
-                        },
-                        "primary": {
-                            "color": foreground
-                        },
-                        "variant": {
-                            "color": get_accent_color(5)
-                        },
-
-                        # Editor hints and diagnostics
-                        "hint": {
-                            "color": adjust_color_brightness(foreground, 0.6),
-                            "font_weight": 700
-                        },
-                        "predictive": {
-                            "color": adjust_color_brightness(foreground, 0.5),
-                            "font_style": "italic"
-                        },
-                    },
-
-                    # Players (for collaborative editing)
-                    "players": [
-                        {
-                            "cursor": get_accent_color(4),
-                            "background": get_accent_color(4),
-                            "selection": blend_colors(background, get_accent_color(4), 0.3)
-                        },
-                        {
-                            "cursor": get_accent_color(2),
-                            "background": get_accent_color(2),
-                            "selection": blend_colors(background, get_accent_color(2), 0.3)
-                        },
-                        {
-                            "cursor": get_accent_color(3),
-                            "background": get_accent_color(3),
-                            "selection": blend_colors(background, get_accent_color(3), 0.3)
-                        },
-                        {
-                            "cursor": get_accent_color(5),
-                            "background": get_accent_color(5),
-                            "selection": blend_colors(background, get_accent_color(5), 0.3)
-                        }
-                    ]
-                }
+                "name": name,
+                "appearance": mode,
+                "style": styles[key]
             }
+            for name, mode, key in themes
         ]
     }
 
     return theme_family
 
+def serialize_theme_family(theme_family):
+    """Serialize a theme family exactly as it is written to disk"""
+    return json.dumps(theme_family, indent=2).encode('utf-8')
+
+def render_theme_family(palette):
+    """Derive and serialize a theme family"""
+    with stage("derive"):
+        theme_family = create_zed_theme_family(palette)
+    with stage("serialize"):
+        return serialize_theme_family(theme_family)
+
+def cached_theme_family(palette):
+    """Serialized theme family for a palette, served from the theme cache when possible"""
+    if not cache_enabled():
+        return render_theme_family(palette)
+
+    cache = ThemeCache()
+    with stage("cache"):
+        digest = palette_digest(palette)
+        data = cache.get(digest, zed_cache_name())
+    if data is not None:
+        print(f"⚡ Using cached theme {digest[:12]}")
+        return data
+
+    data = render_theme_family(palette)
+    cache.put(digest, zed_cache_name(), data, {"wallpaper": palette.data.get("wallpaper", "")})
+    return data
+
 def write_zed_theme_family(theme_family):
     """Write theme family to dotfiles and link to Zed config"""
+    return install_zed_theme_family(serialize_theme_family(theme_family))
+
+def install_zed_theme_family(data):
+    """Install serialized theme family bytes to dotfiles and link to Zed config"""
 
     # Dotfiles theme path
-    dotfiles_theme_dir = Path.home() / "dotfiles" / "config" / "zed" / "themes"
-    dotfiles_theme_file = dotfiles_theme_dir / "pywal.json"
+    dotfiles_theme_file = zed_theme_file()
 
     # Zed config paths
     zed_config_dir = Path.home() / ".config" / "zed"
     zed_themes_dir = zed_config_dir / "themes"
-    zed_theme_file = zed_themes_dir / "pywal.json"
+    zed_link = zed_themes_dir / "pywal.json"
+
+    # Write theme family to dotfiles (skipped when the bytes are unchanged)
+    with stage("write"):
+        written = write_artifact(dotfiles_theme_file, data)
+    if written:
+        print(f"✅ Theme family written to dotfiles: {dotfiles_theme_file}")
+    else:
+        print(f"✅ Theme family unchanged: {dotfiles_theme_file}")
 
-    # Create directories if they don't exist
-    dotfiles_theme_dir.mkdir(parents=True, exist_ok=True)
-    zed_themes_dir.mkdir(parents=True, exist_ok=True)
+    # Create symlink to Zed config (for immediate use)
+    with stage("symlink"):
+        status = ensure_symlink(zed_link, dotfiles_theme_file)
+    link_status(status, zed_link)
 
-    # Write theme family to dotfiles
-    with open(dotfiles_theme_file, 'w') as f:
-        json.dump(theme_family, f, indent=2)
+    return True
 
-    print(f"✅ Theme family written to dotfiles: {dotfiles_theme_file}")
+def link_status(status, path):
+    """Report the outcome of ensure_symlink()"""
+    if status == "linked":
+        print(f"🔗 Symlinked to Zed config: {path}")
+    elif status == "copied":
+        # Fallback: file was copied because symlinks failed
+        print(f"📋 Copied to Zed config: {path}")
+
+# Written only when there is no settings.json yet
+DEFAULT_SETTINGS = {
+    "theme": "Pywal",
+    "buffer_font_family": "Operator Mono Lig",
+    "ui_font_family": "MesloLGLDZ Nerd Font",
+    "buffer_font_size": 17,
+    "auto_update": False,
+    "telemetry": {
+        "diagnostics": False,
+        "metrics": False
+    },
+    "vim_mode": True,
+    "relative_line_numbers": True,
+    "show_whitespaces": "selection",
+    "tab_size": 4,
+    "soft_wrap": "editor_width",
+    "preview_tabs": {
+        "enabled": False
+    },
+    "scrollbar": {
+        "show": "auto"
+    },
+    "terminal": {
+        "shell": {
+            "program": "zsh"
+        },
+        "working_directory": "current_project_directory"
+    }
+}
 
-    # Create symlink to Zed config (for immediate use)
-    if zed_theme_file.exists() or zed_theme_file.is_symlink():
-        zed_theme_file.unlink()
+def zed_theme_setting():
+    """Value for Zed's "theme" setting
 
-    try:
-        zed_theme_file.symlink_to(dotfiles_theme_file)
-        print(f"🔗 Symlinked to Zed config: {zed_theme_file}")
-    except OSError as e:
-        # Fallback: copy file if symlink fails
-        import shutil
-        shutil.copy2(dotfiles_theme_file, zed_theme_file)
-        print(f"📋 Copied to Zed config: {zed_theme_file}")
+    "Pywal", or with PYWAL_ZED_THEME_MODE=system Zed's own switch between
+    the light and dark variants, following the system appearance.
+    """
+    if os.environ.get("PYWAL_ZED_THEME_MODE") == "system":
+        names = variant_names()
+        if "light" in names and "dark" in names:
+            return {"mode": "system", "light": VARIANTS["light"][0], "dark": VARIANTS["dark"][0]}
+    return "Pywal"
 
-    return True
+def update_zed_settings(theme=None):
+    """Update Zed settings to use the pywal theme
 
-def update_zed_settings():
-    """Update Zed settings to use the pywal theme"""
+    Only the top-level "theme" value is touched; comments and formatting
+    in the (JSONC) settings file are kept, and nothing is written when the
+    theme is already set.
+    """
+    theme = theme or zed_theme_setting()
 
     zed_settings_file = Path.home() / ".config" / "zed" / "settings.json"
     dotfiles_settings_file = Path.home() / "dotfiles" / "config" / "zed" / "settings.json"
 
     # Preserve existing settings if they exist
-    settings = {}
-
-    if dotfiles_settings_file.exists():
-        try:
-            with open(dotfiles_settings_file, 'r') as f:
-                settings = json.load(f)
-        except json.JSONDecodeError:
-            print("⚠️  Existing settings file has invalid JSON, starting fresh")
-    elif zed_settings_file.exists():
-        try:
-            with open(zed_settings_file, 'r') as f:
-                settings = json.load(f)
-        except json.JSONDecodeError:
-            print("⚠️  Existing Zed settings file has invalid JSON, starting fresh")
+    source = dotfiles_settings_file if dotfiles_settings_file.exists() else zed_settings_file
+    try:
+        with open(source, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        text = None
 
-    # Preserve user's font settings and other preferences
-    if not settings:
+    if text is None or not text.strip():
         # Default settings only if no existing settings found
-        settings = {
-            "buffer_font_family": "Operator Mono Lig",
-            "ui_font_family": "MesloLGLDZ Nerd Font",
-            "buffer_font_size": 17,
-            "auto_update": False,
-            "telemetry": {
-                "diagnostics": False,
-                "metrics": False
-            },
-            "vim_mode": True,
-            "relative_line_numbers": True,
-            "show_whitespaces": "selection",
-            "tab_size": 4,
-            "soft_wrap": "editor_width",
-            "preview_tabs": {
-                "enabled": False
-            },
-            "scrollbar": {
-                "show": "auto"
-            },
-            "terminal": {
-                "shell": {
-                    "program": "zsh"
-                },
-                "working_directory": "current_project_directory"
-            }
-        }
-
-    # Always set pywal theme
-    settings["theme"] = "Pywal"
+        patched = json.dumps(dict(DEFAULT_SETTINGS, theme=theme), indent=4)
+    else:
+        try:
+            patched = set_member(text, "theme", theme)
+        except JSONCError as e:
+            print(f"⚠️  Could not update {source} ({e}); leaving it unchanged")
+            return
+        if patched == text and source == dotfiles_settings_file:
+            print(f"✅ Settings unchanged: {dotfiles_settings_file}")
+            patched = None
 
     # Write to dotfiles
-    dotfiles_settings_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(dotfiles_settings_file, 'w') as f:
-        json.dump(settings, f, indent=4)
-
-    print(f"✅ Settings written to dotfiles: {dotfiles_settings_file}")
+    if patched is not None:
+        with stage("write"):
+            written = write_artifact(dotfiles_settings_file, patched.encode('utf-8'))
+        if written:
+            print(f"✅ Settings written to dotfiles: {dotfiles_settings_file}")
+        else:
+            print(f"✅ Settings unchanged: {dotfiles_settings_file}")
 
     # Create symlink to Zed config
-    zed_settings_file.parent.mkdir(parents=True, exist_ok=True)
-
-    if zed_settings_file.exists() or zed_settings_file.is_symlink():
-        zed_settings_file.unlink()
+    with stage("symlink"):
+        status = ensure_symlink(zed_settings_file, dotfiles_settings_file)
+    link_status(status, zed_settings_file)
 
-    try:
-        zed_settings_file.symlink_to(dotfiles_settings_file)
-        print(f"🔗 Symlinked to Zed config: {zed_settings_file}")
-    except OSError:
-        # Fallback: copy file if symlink fails
-        import shutil
-        shutil.copy2(dotfiles_settings_file, zed_settings_file)
-        print(f"📋 Copied to Zed config: {zed_settings_file}")
-
-def main():
+def generate_zed_theme():
     print("🎨 Zed Theme Generator for Pywal (Schema v0.2.0)")
     print("=================================================")
 
-    # Create theme family from pywal colors
-    theme_family = create_zed_theme_family()
-    if not theme_family:
+    # Create theme family from pywal colors (or reuse a cached render)
+    palette = load_palette()
+    if palette is None:
         return False
 
     # Write theme family files
-    if write_zed_theme_family(theme_family):
+    if install_zed_theme_family(cached_theme_family(palette)):
         print("✅ Zed theme family created successfully")
     else:
         print("❌ Failed to write theme family files")
@@ -609,5 +760,16 @@ def main():
 
     return True
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a Zed theme family from pywal colors")
+    parser.add_argument("--timings", action="store_true", help="print per-stage timings (PYWAL_TIMINGS=1 to only record them)")
+    args = parser.parse_args(argv)
+
+    with trace("zed", show=args.timings) as run:
+        ok = generate_zed_theme()
+        if run is not None:
+            run.ok = ok
+    return ok
+
 if __name__ == "__main__":
     main()
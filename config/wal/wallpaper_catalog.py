@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+# Wallpaper Catalog
+# Keeps an on-disk list of the images under a wallpaper directory
+# (~/.cache/wal/wallpapers/<dir hash>.json) and serves `setwal random` from
+# it. A rescan stats every directory and only lists (os.scandir) the ones
+# whose mtime changed, so adding an image costs one directory listing, not
+# a walk of the whole library. Random picks follow a persisted shuffle: no
+# image comes up twice until every image has had its turn, new images are
+# slotted into the rest of the current round, and a new round never starts
+# with the image that ended the last one.
+#
+# Usage: wallpaper_catalog.py pick [DIR]
+#        wallpaper_catalog.py scan [DIR]
+#        wallpaper_catalog.py status [DIR]
+
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+from artifact_writer import atomic_write
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+CATALOG_VERSION = 1
+
+def catalog_dir():
+    return os.path.expanduser("~/.cache/wal/wallpapers")
+
+def default_wallpaper_dir():
+    """~/Pictures/Wallpapers, or ~/Pictures without one (as setwal does)"""
+    wallpapers = os.path.expanduser("~/Pictures/Wallpapers")
+    return wallpapers if os.path.isdir(wallpapers) else os.path.expanduser("~/Pictures")
+
+def is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.')
+
+class WallpaperCatalog:
+    """Images below one directory plus the shuffle order picks are served from"""
+
+    def __init__(self, root=None, path=None, rng=None):
+        self.root = os.path.realpath(root or default_wallpaper_dir())
+        key = hashlib.sha1(self.root.encode('utf-8')).hexdigest()[:16]
+        self.path = path or os.path.join(catalog_dir(), f"{key}.json")
+        self.rng = rng or random.Random()
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != CATALOG_VERSION or data.get("root") != self.root:
+            data = {"version": CATALOG_VERSION, "root": self.root}
+        data.setdefault("dirs", {})
+        data.setdefault("order", [])
+        data.setdefault("position", 0)
+        data.setdefault("last", None)
+        return data
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write(self.path, json.dumps(self.data, separators=(',', ':')).encode('utf-8'))
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the catalog's lock file, so concurrent picks do not hand out the same image"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self.data = self._load()
+            yield self
+        finally:
+            os.close(fd)
+
+    def scan(self):
+        """Bring the directory records up to date; returns (directories, directories listed)"""
+        previous = self.data["dirs"]
+        dirs = {}
+        seen = set()
+        listed = 0
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                st = os.stat(directory)
+            except OSError:
+                continue
+            # Symlinked directories can loop back on themselves
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+
+            record = previous.get(directory)
+            if record is None or record["mtime_ns"] != st.st_mtime_ns:
+                images, subdirs = [], []
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.name.startswith('.'):
+                                continue
+                            try:
+                                if entry.is_dir():
+                                    subdirs.append(entry.name)
+                                elif is_image(entry.name) and entry.is_file():
+                                    images.append(entry.name)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+                record = {"mtime_ns": st.st_mtime_ns, "images": sorted(images), "subdirs": sorted(subdirs)}
+                listed += 1
+            dirs[directory] = record
+            stack.extend(os.path.join(directory, name) for name in reversed(record["subdirs"]))
+        self.data["dirs"] = dirs
+        return len(dirs), listed
+
+    def images(self):
+        """Every cataloged image path, as of the last scan"""
+        return [os.path.join(directory, name)
+                for directory, record in self.data["dirs"].items() for name in record["images"]]
+
+    def pick(self):
+        """Next image of the shuffle, or None if there are none"""
+        pool = set(self.images())
+        if not pool:
+            return None
+        order, position = self.data["order"], self.data["position"]
+
+        # This round's remaining images, with ones added since slotted in at random
+        remaining = [path for path in order[position:] if path in pool]
+        for path in sorted(pool - set(order)):
+            remaining.insert(self.rng.randint(0, len(remaining)), path)
+
+        if remaining:
+            order = [path for path in order[:position] if path in pool] + remaining
+            position = len(order) - len(remaining)
+        else:
+            # Round over: reshuffle, without repeating the last image back to back
+            order = sorted(pool)
+            self.rng.shuffle(order)
+            if len(order) > 1 and order[0] == self.data["last"]:
+                swap = self.rng.randint(1, len(order) - 1)
+                order[0], order[swap] = order[swap], order[0]
+            position = 0
+
+        choice = order[position]
+        self.data.update(order=order, position=position + 1, last=choice)
+        return choice
+
+def pick_wallpaper(root=None):
+    """Rescan and pick under the catalog lock; returns an image path or None"""
+    catalog = WallpaperCatalog(root)
+    with catalog.locked():
+        catalog.scan()
+        choice = catalog.pick()
+        catalog.save()
+    return choice
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catalog a wallpaper directory and pick from it at random")
+    parser.add_argument("command", choices=("pick", "scan", "status"))
+    parser.add_argument("directory", nargs="?", help="wallpaper directory (default: ~/Pictures/Wallpapers)")
+    args = parser.parse_args(argv)
+
+    if args.directory and not os.path.isdir(args.directory):
+        print(f"❌ Not a directory: {args.directory}", file=sys.stderr)
+        return 1
+
+    if args.command == "pick":
+        choice = pick_wallpaper(args.directory)
+        if choice is None:
+            print(f"❌ No images found in {WallpaperCatalog(args.directory).root}", file=sys.stderr)
+            return 1
+        print(choice)
+        return 0
+
+    catalog = WallpaperCatalog(args.directory)
+    if args.command == "scan":
+        start = time.monotonic()
+        with catalog.locked():
+            dirs, listed = catalog.scan()
+            catalog.save()
+        print(f"🗂  {len(catalog.images())} images in {dirs} directories ({listed} listed) "
+              f"in {(time.monotonic() - start) * 1000:.1f} ms")
+        return 0
+
+    total = len(catalog.images())
+    played = min(catalog.data["position"], len(catalog.data["order"]))
+    print(f"🗂  Wallpaper catalog: {catalog.root}")
+    print(f"   {total} images in {len(catalog.data['dirs'])} directories, "
+          f"{played}/{len(catalog.data['order'])} of this round shown")
+    if catalog.data["last"]:
+        print(f"   last: {catalog.data['last']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
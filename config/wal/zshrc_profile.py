@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+# Zsh Startup Profiler
+# Measures what each part of the zshrc costs a new shell. The zshrc is
+# copied into a throwaway HOME with a timestamp (EPOCHREALTIME, kept in
+# memory) before every top-level statement, its precmd/preexec/chpwd hooks
+# are wrapped to time each call, and `zsh -i` runs it up to the first
+# prompt (so the deferred _load_pywal_colors hook is measured too) and
+# exits. Lines are grouped into the sections their comment headers start.
+#
+# macOS-only tools the zshrc calls (osascript, sw_vers, brew, ...) get
+# stubs in the sandbox when they are not installed, so it runs on Linux.
+# Frameworks it sources (oh-my-zsh, p10k, fzf) are linked in from your
+# HOME when present; ~/.config/wal points at this checkout.
+#
+# Usage: zshrc_profile.py [--zshrc FILE] [-n RUNS] [--lines N] [--stub NAME ...]
+#                         [--save FILE] [--compare FILE] [--threshold PCT]
+#                         [--min-ms MS] [--show-output] [--json]
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import compare, git_revision, summarize, synthetic_palette
+
+WAL_DIR = os.path.dirname(os.path.realpath(__file__))
+DOTFILES_ZSHRC = os.path.normpath(os.path.join(WAL_DIR, "..", "..", "zsh", "zshrc"))
+
+# Stubbed in the sandbox when missing from PATH
+STUB_BINARIES = ("osascript", "defaults", "mdfind", "sw_vers", "scutil", "ipconfig", "pbcopy",
+                 "pbpaste", "open", "say", "brew", "fastfetch")
+
+# Linked into the sandbox from the real HOME when present
+LINKED_FILES = (".oh-my-zsh", ".p10k.zsh", ".fzf", ".fzf.zsh", ".zshrc.local", ".zshenv")
+
+HOOKS = ("precmd", "preexec", "chpwd")
+
+DEFAULT_RUNS = 10
+DEFAULT_THRESHOLD = 20.0
+# Smaller changes than this are noise, whatever the percentage
+DEFAULT_MIN_MS = 2.0
+RUN_TIMEOUT = 60
+
+PREAMBLE = """\
+# --- zshrc_profile.py: timestamps, not part of your zshrc ---
+zmodload zsh/datetime
+typeset -ga _zp
+_zp=("$EPOCHREALTIME start")
+"""
+
+EPILOGUE = """\
+# --- zshrc_profile.py: time every hook call, then dump at exit ---
+_zp+=("$EPOCHREALTIME end")
+_zp_wrap() {
+    # Once per function, even if it is registered for several hooks: wrapping
+    # a wrapper would make it call itself
+    (( $+functions[$2] )) && (( ! $+functions[_zp_orig_$2] )) || return
+    # An autoload stub's body only loads a function of its own name, so load
+    # the real definition before copying it
+    autoload +X $2 2>/dev/null
+    functions[_zp_orig_$2]=$functions[$2]
+    functions[$2]="local _zp_t=\\$EPOCHREALTIME
+_zp_orig_$2 \\"\\$@\\"
+local _zp_r=\\$?
+_zp+=(\\"\\$_zp_t hook:$1:$2 \\$EPOCHREALTIME\\")
+return \\$_zp_r"
+}
+for _zp_hook in %(hooks)s; do
+    _zp_wrap $_zp_hook $_zp_hook
+    for _zp_f in ${(P)${:-${_zp_hook}_functions}}; do
+        _zp_wrap $_zp_hook $_zp_f
+    done
+done
+unset _zp_hook _zp_f
+_zp_prompt() {
+    _zp+=("$EPOCHREALTIME prompt")
+    precmd_functions=(${precmd_functions:#_zp_prompt})
+}
+precmd_functions+=(_zp_prompt)
+_zp_dump() {
+    _zp+=("$EPOCHREALTIME exit")
+    print -rl -- $_zp >| %(log)s
+}
+zshexit_functions+=(_zp_dump)
+"""
+
+# Line scanning: just enough zsh syntax to find top-level statements
+
+OPENERS = re.compile(r'^(if|while|until|for|select|case|repeat)\b')
+CLOSERS = re.compile(r'^(fi|done|esac)\b')
+INLINE_CLOSE = re.compile(r';\s*(fi|done|esac)\s*$')
+CONTINUED = re.compile(r'(\\|&&|\|\||\|)\s*$')
+# Not <<< here-strings
+HEREDOC = re.compile(r'(?<!<)<<-?(?!<)\s*[\'"]?(\w+)')
+
+def strip_comment(line):
+    """line without a trailing ` # comment` (quotes are not tracked)"""
+    return re.sub(r'\s+#.*$', '', line).strip()
+
+def scan(lines):
+    """(line number, section label) for every top-level statement of a zsh script
+
+    Sections are named by their header text, so a baseline still matches
+    after lines move; a name that comes up again gets " (2)", " (3)", ...
+    """
+    statements = []
+    seen = {}
+
+    def section(name):
+        seen[name] = seen.get(name, 0) + 1
+        return name if seen[name] == 1 else f"{name} ({seen[name]})"
+
+    depth = 0
+    continued = False
+    heredoc = None
+    label = None
+    in_comment = False
+    for number, raw in enumerate(lines, 1):
+        stripped = raw.strip()
+        if heredoc is not None:
+            if stripped == heredoc:
+                heredoc = None
+            continue
+        if not stripped:
+            in_comment = False
+            continue
+        if stripped.startswith('#'):
+            # A top-level comment block names the section that follows it
+            text = stripped.lstrip('#').strip(' =-')
+            if depth == 0 and not raw[0].isspace() and not in_comment and re.search(r'[A-Za-z]', text):
+                # "# End of ..." closes a section instead of starting one
+                label = None if text.startswith("End of") else section(text)
+                in_comment = True
+            continue
+        in_comment = False
+
+        code = strip_comment(stripped)
+        if depth == 0 and not continued:
+            # Statements without a header are named after themselves
+            label = label or section(code[:40])
+            statements.append((number, label))
+
+        if code.startswith(('}', ')')) or CLOSERS.match(code):
+            depth -= 1
+        if (OPENERS.match(code) and not INLINE_CLOSE.search(code)) or code.endswith(('{', '(')):
+            depth += 1
+        depth = max(depth, 0)
+        continued = bool(CONTINUED.search(code))
+        match = HEREDOC.search(code)
+        if match:
+            heredoc = match.group(1)
+    return statements
+
+def instrument(source, log_path):
+    """The zshrc with a timestamp before each top-level statement; returns (text, statements)"""
+    lines = source.splitlines()
+    statements = scan(lines)
+    marked = {number for number, _ in statements}
+    out = [PREAMBLE]
+    for number, line in enumerate(lines, 1):
+        if number in marked:
+            out.append(f'_zp+=("$EPOCHREALTIME L{number}")')
+        out.append(line)
+    out.append(EPILOGUE % {"hooks": " ".join(HOOKS), "log": shell_quote(log_path)})
+    return "\n".join(out) + "\n", statements
+
+def shell_quote(value):
+    return "'" + value.replace("'", "'\\''") + "'"
+
+# The sandbox
+
+@contextlib.contextmanager
+def sandbox(zshrc, extra_stubs=()):
+    """Throwaway HOME holding the instrumented zshrc; yields (home, env, statements)"""
+    home = tempfile.mkdtemp(prefix="zshrc-profile-")
+    try:
+        real_home = os.path.expanduser("~")
+        bin_dir = os.path.join(home, ".profile-bin")
+        os.makedirs(bin_dir)
+        for name in STUB_BINARIES + tuple(extra_stubs):
+            if name in extra_stubs or shutil.which(name) is None:
+                stub = os.path.join(bin_dir, name)
+                with open(stub, 'w') as f:
+                    f.write("#!/bin/sh\nexit 0\n")
+                os.chmod(stub, 0o755)
+        for name in LINKED_FILES:
+            if os.path.exists(os.path.join(real_home, name)):
+                os.symlink(os.path.join(real_home, name), os.path.join(home, name))
+
+        # The pywal pieces come from this checkout, with a palette to load
+        os.makedirs(os.path.join(home, ".config"))
+        os.symlink(WAL_DIR, os.path.join(home, ".config", "wal"))
+        cache = os.path.join(home, ".cache", "wal")
+        os.makedirs(cache)
+        with open(os.path.join(cache, "colors.json"), 'w') as f:
+            json.dump(synthetic_palette("dark", 0), f, indent=4)
+
+        env = {
+            "HOME": home,
+            "ZDOTDIR": home,
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "TERM": "xterm-256color",
+            "LANG": os.environ.get("LANG", "en_US.UTF-8"),
+            "USER": os.environ.get("USER", "user"),
+            "LOGNAME": os.environ.get("LOGNAME", os.environ.get("USER", "user")),
+            "SHELL": shutil.which("zsh") or "/bin/zsh",
+            # oh-my-zsh keeps its update timestamp and completion cache here,
+            # not in the (linked) real installation
+            "ZSH_CACHE_DIR": os.path.join(home, ".cache", "oh-my-zsh"),
+        }
+        os.makedirs(env["ZSH_CACHE_DIR"])
+        # Marks oh-my-zsh as just updated, so no run stops to check
+        with open(os.path.join(env["ZSH_CACHE_DIR"], ".zsh-update"), 'w') as f:
+            f.write(f"LAST_EPOCH={int(time.time()) // 86400}\n")
+
+        subprocess.run([sys.executable, os.path.join(WAL_DIR, "shell_loader.py")], env=dict(os.environ, **env),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        with open(zshrc, 'r', encoding='utf-8') as f:
+            text, statements = instrument(f.read(), os.path.join(home, ".profile-log"))
+        with open(os.path.join(home, ".zshrc"), 'w', encoding='utf-8') as f:
+            f.write(text)
+        yield home, env, statements
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+def check_syntax(zsh, home, env):
+    """zsh -n on the instrumented zshrc; None if it parses, else the error"""
+    result = subprocess.run([zsh, "-n", os.path.join(home, ".zshrc")], env=env, capture_output=True, text=True)
+    return None if result.returncode == 0 else (result.stderr.strip() or f"exit {result.returncode}")
+
+def run_once(zsh, home, env):
+    """One shell up to its first prompt and out again; (marks, output)"""
+    log = os.path.join(home, ".profile-log")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(log)
+    start = time.time()
+    result = subprocess.run([zsh, "-i"], input="exit\n", env=env, cwd=home, capture_output=True, text=True,
+                            timeout=RUN_TIMEOUT)
+    finish = time.time()
+    if not os.path.exists(log):
+        tail = (result.stdout + result.stderr).strip().splitlines()[-3:]
+        raise RuntimeError(f"zsh exited ({result.returncode}) before its exit hooks ran: {' / '.join(tail)}")
+    marks = [("spawn", start, None)]
+    with open(log, 'r') as f:
+        for line in f:
+            parts = line.split()
+            marks.append((parts[1], float(parts[0]), float(parts[2]) if len(parts) > 2 else None))
+    marks.append(("reaped", finish, None))
+    return marks, result.stdout + result.stderr
+
+def attribute(marks, statements):
+    """Seconds per stage and per line for one run's marks"""
+    sections = dict(statements)
+    points = [(label, t) for label, t, end in marks if end is None]
+    times = dict(points)
+    stages = {"startup": times["start"] - times["spawn"]}
+    lines = {}
+    for (label, t), (_, following) in zip(points, points[1:]):
+        if label.startswith("L") and label[1:].isdigit():
+            number = int(label[1:])
+            lines[number] = following - t
+            section = f"section: {sections[number]}"
+            stages[section] = stages.get(section, 0.0) + following - t
+
+    for label, t, end in marks:
+        if end is not None:
+            # Hooks are timed on their first call, which is the first prompt's
+            _, kind, function = label.split(":", 2)
+            stages.setdefault(f"hook: {kind} {function}", end - t)
+    stages["zshrc"] = times["end"] - times["start"]
+    stages["first prompt"] = times.get("prompt", times["end"]) - times["end"]
+    stages["total"] = times["reaped"] - times["spawn"]
+    return stages, lines
+
+def profile(zshrc, runs=DEFAULT_RUNS, stubs=(), progress=None):
+    """Profile the zshrc; a benchmark.py-shaped result dict plus the last run's output"""
+    zsh = shutil.which("zsh")
+    if zsh is None:
+        raise FileNotFoundError("zsh is not installed")
+    with sandbox(zshrc, stubs) as (home, env, statements):
+        error = check_syntax(zsh, home, env)
+        if error:
+            raise ValueError(f"instrumented zshrc does not parse: {error}")
+        with open(zshrc, 'r', encoding='utf-8') as f:
+            source = f.read().splitlines()
+
+        # The first run builds completion dumps and caches; it is not counted
+        run_once(zsh, home, env)
+        stage_times, line_times = {}, {}
+        output = ""
+        for n in range(runs):
+            marks, output = run_once(zsh, home, env)
+            stages, lines = attribute(marks, statements)
+            for name, seconds in stages.items():
+                stage_times.setdefault(name, []).append(seconds)
+            for number, seconds in lines.items():
+                line_times.setdefault(number, []).append(seconds)
+            if progress:
+                progress(n + 1, runs)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "zsh": subprocess.run([zsh, "--version"], capture_output=True, text=True).stdout.strip(),
+            "platform": platform.platform(),
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "runs": runs,
+            "zshrc": os.path.abspath(zshrc),
+        },
+        "stages": {name: summarize(times) for name, times in stage_times.items()},
+        "lines": {f"L{number}": dict(summarize(times), code=source[number - 1].strip())
+                  for number, times in line_times.items()},
+    }, output
+
+def default_zshrc():
+    return DOTFILES_ZSHRC if os.path.exists(DOTFILES_ZSHRC) else os.path.expanduser("~/.zshrc")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile zshrc startup per section and hook")
+    parser.add_argument("--zshrc", default=default_zshrc(), help="zshrc to profile (default: this dotfiles' zshrc)")
+    parser.add_argument("-n", "--runs", type=int, default=DEFAULT_RUNS, help="timed shells (after one warm-up)")
+    parser.add_argument("--lines", type=int, default=10, help="slowest lines to list")
+    parser.add_argument("--stub", action="append", default=[],
+                        help="also replace this command with a no-op, e.g. fastfetch (repeatable)")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="regression threshold in percent (default: %(default)s)")
+    parser.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS,
+                        help="ignore changes smaller than this (default: %(default)s)")
+    parser.add_argument("--show-output", action="store_true", help="print what the last shell wrote")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read baseline: {e}")
+            return 1
+
+    if not args.json:
+        print(f"⏱  Profiling {args.zshrc} ({args.runs} shells)")
+    try:
+        results, output = profile(args.zshrc, args.runs, args.stub)
+    except (OSError, ValueError, RuntimeError, subprocess.SubprocessError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, stats in results["stages"].items():
+            print(f"{name[:48]:<48} median {stats['median_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms"
+                  f"  min {stats['min_ms']:9.3f} ms")
+        slowest = sorted(results["lines"].items(), key=lambda item: -item[1]["median_ms"])[:args.lines]
+        if slowest:
+            print("\n🐢 Slowest lines:")
+            for number, stats in slowest:
+                print(f"   {number:>5} {stats['median_ms']:9.3f} ms  {stats['code'][:60]}")
+        if args.show_output:
+            print("\n📄 Output of the last shell:")
+            print(output.rstrip())
+        if args.save:
+            print(f"💾 Baseline saved: {args.save}")
+
+    if baseline is None:
+        return 0
+
+    rows = compare(results, baseline, args.threshold, args.min_ms)
+    revision = baseline.get("meta", {}).get("revision") or "baseline"
+    if not args.json:
+        print(f"\n📊 Compared with {revision}:")
+        for name, old, new, change, regressed in rows:
+            mark = "❌" if regressed else "✅"
+            print(f"{mark} {name[:48]:<48} {old:9.3f} → {new:9.3f} ms  ({change:+.1f}%)")
+        # Renamed or removed sections and hooks would otherwise just drop out of the comparison
+        old_stages = baseline.get("stages", {})
+        for name, stats in old_stages.items():
+            if name not in results["stages"]:
+                print(f"⚠️  {name[:48]:<48} {stats.get('median_ms', 0.0):9.3f} → {'—':>9}     (no longer measured)")
+        for name, stats in results["stages"].items():
+            if name not in old_stages:
+                print(f"🆕 {name[:48]:<48} {'—':>9} → {stats['median_ms']:9.3f} ms  (not in baseline)")
+    return 1 if any(row[4] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())